@@ -0,0 +1,283 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_STORE_DIR = os.getenv("ATTACHMENT_STORE_DIR", "./attachments")
+REF_PREFIX = "sha256:"
+
+_DATA_URL = re.compile(r"^data:(?P<media_type>[\w.+-]+/[\w.+-]+);base64,(?P<payload>.*)$", re.DOTALL)
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+_blobs = models.AttachmentBlob.__table__
+_todos = models.Todo.__table__
+
+
+def is_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(REF_PREFIX) and bool(_DIGEST.match(value[len(REF_PREFIX):]))
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(ATTACHMENT_STORE_DIR, digest[:2], digest[2:4], digest)
+
+
+def _encode_value(value: str) -> bytes:
+    # 文件首行是 MIME 类型（非 data URL 时为空行），其后为内容；
+    # data URL 解码为二进制保存，比 base64 文本小约 25%
+    match = _DATA_URL.match(value)
+    if match:
+        try:
+            payload = base64.b64decode(match.group("payload"), validate=True)
+            return match.group("media_type").encode("ascii") + b"\n" + payload
+        except (binascii.Error, ValueError):
+            pass
+    return b"\n" + value.encode("utf-8")
+
+
+def _decode_value(data: bytes) -> str:
+    media_type, _, payload = data.partition(b"\n")
+    if media_type:
+        return f"data:{media_type.decode('ascii')};base64,{base64.b64encode(payload).decode('ascii')}"
+    return payload.decode("utf-8")
+
+
+def _write_blob(digest: str, data: bytes) -> None:
+    # 事务中调用时须先写入该 digest 的行：行锁保证 GC 不会在此期间删除文件。
+    # prepare 在事务外提前写入，store 加引用后会再经这里确认一次文件仍在
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # 先写临时文件再原子替换，并发写入同一内容也不会出现半个文件
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _insert_stmt(dialect_name: str, values: dict):
+    if dialect_name == "postgresql":
+        return postgresql.insert(_blobs).values(**values)
+    if dialect_name == "sqlite":
+        return sqlite.insert(_blobs).values(**values)
+    return None
+
+
+def _increment_stmt(dialect_name: str, digest: str, size: int):
+    stmt = _insert_stmt(dialect_name, {"digest": digest, "size": size, "ref_count": 1})
+    if stmt is None:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=[_blobs.c.digest],
+        set_={"ref_count": _blobs.c.ref_count + 1}
+    )
+
+
+def _add_reference(connection, digest: str, size: int) -> None:
+    stmt = _increment_stmt(connection.dialect.name, digest, size)
+    if stmt is not None:
+        connection.execute(stmt)
+        return
+    result = connection.execute(
+        update(_blobs).where(_blobs.c.digest == digest).values(ref_count=_blobs.c.ref_count + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            _blobs.insert().values(digest=digest, size=size, ref_count=1)
+        )
+
+
+def _encode(value: str) -> Tuple[str, bytes]:
+    data = _encode_value(value)
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def prepare(values: Optional[Iterable[str]]) -> Dict[str, Tuple[str, bytes]]:
+    # 异步路由在线程池中调用：编码、计算摘要并写入文件，结果放进 session.info 交给 store，
+    # 事件循环上只剩加引用和一次文件存在检查。请求失败时留下的文件由 GC 清理
+    prepared = {}
+    for value in values or []:
+        if value in prepared:
+            continue
+        digest, data = _encode(value)
+        _write_blob(digest, data)
+        prepared[value] = (digest, data)
+    return prepared
+
+
+def _store_values(
+    connection,
+    values: Optional[Iterable[str]],
+    prepared: Optional[Dict[str, Tuple[str, bytes]]] = None,
+    keep_refs: bool = False,
+) -> Optional[List[str]]:
+    # 客户端提交的值一律按内容保存：响应里的附件都已还原为 data URL，客户端拿不到引用，
+    # 若接受 "sha256:..." 形式的引用，知道摘要就能挂上并读出别人的文件。
+    # keep_refs 只给内部调用方（迁移）使用：行里已有的引用原样保留，计数不变
+    if values is None:
+        return None
+    refs = []
+    for value in values:
+        if keep_refs and is_ref(value):
+            refs.append(value)
+            continue
+        digest, data = prepared[value] if prepared and value in prepared else _encode(value)
+        # 先加引用再写文件：行锁一直持有到事务结束，GC 的条件删除会等待并重新判断
+        _add_reference(connection, digest, len(data))
+        _write_blob(digest, data)
+        refs.append(REF_PREFIX + digest)
+    return refs
+
+
+def store(db: Session, values: Optional[Iterable[str]]) -> Optional[List[str]]:
+    # 引用计数与 todo 行在同一个事务中提交
+    return _store_values(db.connection(), values, db.info.get("prepared_attachments"))
+
+
+def release(db: Session, refs: Optional[Iterable[str]]) -> None:
+    # 同一内容被引用多次时合并为一条 UPDATE
+    counts = Counter(ref[len(REF_PREFIX):] for ref in refs or [] if is_ref(ref))
+    for digest, count in counts.items():
+        db.execute(
+            update(_blobs)
+            .where(_blobs.c.digest == digest)
+            .values(ref_count=_blobs.c.ref_count - count)
+        )
+
+
+def read(digest: str) -> Optional[bytes]:
+    try:
+        with open(_blob_path(digest), "rb") as blob_file:
+            return blob_file.read()
+    except FileNotFoundError:
+        logger.error("Attachment blob missing on disk: %s", digest)
+        return None
+
+
+def resolve(values: Optional[List[str]]) -> Optional[List[str]]:
+    if values is None:
+        return None
+    resolved = []
+    for value in values:
+        if not is_ref(value):
+            # 尚未迁移的内联附件原样返回
+            resolved.append(value)
+            continue
+        data = read(value[len(REF_PREFIX):])
+        if data is not None:
+            resolved.append(_decode_value(data))
+    return resolved
+
+
+def _stored_digests() -> Iterable[str]:
+    # 跳过写入中的 .tmp- 临时文件
+    for directory, _, filenames in os.walk(ATTACHMENT_STORE_DIR):
+        for filename in filenames:
+            if _DIGEST.match(filename):
+                yield filename
+
+
+def _adopt_orphans(db: Session) -> None:
+    # 事务回滚后留下的文件没有对应的行，补一条 ref_count=0 的行交给下面的回收流程；
+    # 与写入方插入同一 digest 时由唯一键互斥，已有行（包括未提交的）保持不变
+    connection = db.connection()
+    for digest in _stored_digests():
+        try:
+            size = os.path.getsize(_blob_path(digest))
+        except FileNotFoundError:
+            continue
+        values = {"digest": digest, "size": size, "ref_count": 0}
+        stmt = _insert_stmt(connection.dialect.name, values)
+        if stmt is not None:
+            connection.execute(stmt.on_conflict_do_nothing(index_elements=[_blobs.c.digest]))
+            continue
+        exists = connection.execute(select(_blobs.c.digest).where(_blobs.c.digest == digest)).first()
+        if not exists:
+            connection.execute(_blobs.insert().values(**values))
+    db.commit()
+
+
+def collect_garbage(db: Session) -> int:
+    _adopt_orphans(db)
+    digests = db.execute(select(_blobs.c.digest).where(_blobs.c.ref_count <= 0)).scalars().all()
+    removed = 0
+    for digest in digests:
+        # 条件删除：若期间又被引用（ref_count 已回升），则保留。
+        # 删除文件后才提交，写入方对同一 digest 的加引用会等到提交之后再写文件
+        result = db.execute(
+            _blobs.delete().where(_blobs.c.digest == digest, _blobs.c.ref_count <= 0)
+        )
+        if result.rowcount == 0:
+            db.commit()
+            continue
+        try:
+            os.remove(_blob_path(digest))
+        except FileNotFoundError:
+            pass
+        db.commit()
+        removed += 1
+    return removed
+
+
+def migrate_inline_attachments(engine, batch_size: int = 100) -> int:
+    # 把旧数据中内联在 todos 行里的 base64 附件搬到附件存储，按 id 分批处理
+    migrated = 0
+    last_id = 0
+    with engine.begin() as connection:
+        while True:
+            rows = connection.execute(
+                select(_todos.c.id, _todos.c.attachments)
+                .where(_todos.c.id > last_id)
+                .order_by(_todos.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                values = row.attachments
+                if not values or all(is_ref(value) for value in values):
+                    continue
+                connection.execute(
+                    update(_todos)
+                    .where(_todos.c.id == row.id)
+                    .values(attachments=_store_values(connection, values, keep_refs=True))
+                )
+                migrated += 1
+    return migrated
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["gc"]:
+        print("Usage: python -m app.attachments gc")
+        sys.exit(1)
+
+    from .database import SessionLocal
+    from .logs import setup_logging
+
+    setup_logging()
+    session = SessionLocal()
+    try:
+        logger.info("Removed %s unreferenced attachment blobs", collect_garbage(session))
+    finally:
+        session.close()
@@ -4,23 +4,47 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import models, schemas
-from .database import get_db
+from .cache import LRUCache
+from .database import AppSession, get_async_db, get_db
+import hashlib
+import logging
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# 修复bcrypt兼容性问题
-try:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    # 测试bcrypt是否正常工作
-    pwd_context.hash("test")
-    print("[OK] Bcrypt initialized successfully")
-except Exception as e:
-    print(f"[ERROR] Bcrypt initialization error: {e}")
+# 已验证令牌缓存（按令牌摘要，至 exp 过期）和用户身份缓存（按令牌中的用户名、uid 和凭据标记），
+# 命中时认证不访问数据库。提交后的失效只发生在本进程，其他 worker 进程最多在
+# USER_CACHE_TTL_SECONDS 内仍认可已删除或已改密码的用户，过期后重新查库校验凭据标记
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+token_cache = LRUCache("tokens", TOKEN_CACHE_MAX_ENTRIES, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+user_cache = LRUCache("users", USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+def _create_pwd_context() -> CryptContext:
+    # 修复bcrypt兼容性问题
+    try:
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        # 测试bcrypt是否正常工作
+        pwd_context.hash("test")
+        logger.info("Bcrypt initialized successfully")
+        return pwd_context
+    except Exception as e:
+        logger.warning("Bcrypt initialization error: %s", e)
     # 如果bcrypt有问题，使用更兼容的配置
     try:
         pwd_context = CryptContext(
@@ -30,23 +54,33 @@ except Exception as e:
             bcrypt__ident="2b"
         )
         pwd_context.hash("test")
-        print("[OK] Bcrypt initialized with fallback config")
+        logger.info("Bcrypt initialized with fallback config")
+        return pwd_context
     except Exception as e2:
-        print(f"[ERROR] Bcrypt fallback also failed: {e2}")
-        # 最后的备用方案：使用pbkdf2_sha256
-        pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-        print("[OK] Using pbkdf2_sha256 as fallback")
+        logger.warning("Bcrypt fallback also failed: %s", e2)
+    # 最后的备用方案：使用pbkdf2_sha256
+    logger.info("Using pbkdf2_sha256 as fallback")
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+def get_pwd_context() -> CryptContext:
+    # 首次哈希/校验密码时才初始化，导入模块不做任何哈希计算
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                _pwd_context = _create_pwd_context()
+    return _pwd_context
+
 security = HTTPBearer()
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    print(f"Creating token with data: {to_encode}")
 
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -54,118 +88,155 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
 
     to_encode.update({"exp": expire})
-    print(f"Token payload before encoding: {to_encode}")
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    logger.debug("Token created for user '%s'", to_encode.get("sub"))
+    return encoded_jwt
 
-    try:
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        print(f"[OK] Token created successfully")
+def credential_stamp(user: models.User) -> str:
+    # 密码哈希带随机盐：删除后重新注册的同名用户（SQLite 还可能复用同一个 id）标记不同，
+    # 修改密码后旧令牌同样失效
+    return hashlib.sha256(user.hashed_password.encode()).hexdigest()[:16]
 
-        # 立即测试解码
-        test_decode = jwt.decode(encoded_jwt, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"[OK] Token decode test successful: {test_decode}")
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
-        return encoded_jwt
-    except Exception as e:
-        print(f"[ERROR] Error creating token: {e}")
-        raise
+def _credentials_exception(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    print(f"=== TOKEN VERIFICATION START ===")
     token = credentials.credentials
-    print(f"Received token: {token[:50]}...")
-    print(f"Token length: {len(token)}")
+    digest = _token_digest(token)
+    cached = token_cache.get(digest)
+    if cached is not None:
+        return cached
 
     try:
-        print(f"Attempting to decode with SECRET_KEY: {SECRET_KEY}")
-        print(f"Algorithm: {ALGORITHM}")
-
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"Decoded payload: {payload}")
-
-        username: str = payload.get("sub")
-        print(f"Extracted username: '{username}' (type: {type(username)})")
-
-        if username is None:
-            print(f"[ERROR] Token validation failed: no username in token payload: {payload}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials - no username",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        token_data = schemas.TokenData(username=username)
-        print(f"[OK] Token validated successfully for user: '{username}'")
-        print(f"=== TOKEN VERIFICATION SUCCESS ===")
-        return token_data
-
     except JWTError as e:
-        print(f"[ERROR] JWT decode error: {e}")
-        print(f"Token: {token}")
-        print(f"Secret key: {SECRET_KEY}")
-        print(f"=== TOKEN VERIFICATION FAILED ===")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Could not validate credentials - JWT error: {str(e)}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except Exception as e:
-        print(f"[ERROR] Unexpected error in token verification: {e}")
-        print(f"=== TOKEN VERIFICATION ERROR ===")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials - unexpected error",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        logger.info("JWT decode error: %s", e)
+        raise _credentials_exception(f"Could not validate credentials - JWT error: {str(e)}")
+    except Exception:
+        logger.exception("Unexpected error in token verification")
+        raise _credentials_exception("Could not validate credentials - unexpected error")
+
+    username: str = payload.get("sub")
+    if username is None:
+        logger.info("Token validation failed: no username in token payload")
+        raise _credentials_exception("Could not validate credentials - no username")
+
+    token_data = schemas.TokenData(username=username, user_id=payload.get("uid"), stamp=payload.get("stamp"))
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(digest, token_data, ttl_seconds=expires_in)
+    logger.debug("Token validated for user '%s'", username)
+    return token_data
 
 def get_current_user(token_data: schemas.TokenData = Depends(verify_token), db: Session = Depends(get_db)):
-    print(f"=== GET CURRENT USER START ===")
-    print(f"Looking for user with username: '{token_data.username}'")
+    cached = cached_user(token_data)
+    if cached is not None:
+        return cached
 
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    if token_data.user_id is not None:
+        user = db.get(models.User, token_data.user_id)
+    else:
+        user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    return _remember_user(token_data, user)
+
+async def get_current_user_async(
+    token_data: schemas.TokenData = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    cached = cached_user(token_data)
+    if cached is not None:
+        return cached
+
+    if token_data.user_id is not None:
+        user = await db.get(models.User, token_data.user_id)
+    else:
+        result = await db.execute(select(models.User).where(models.User.username == token_data.username))
+        user = result.scalars().first()
+    return _remember_user(token_data, user)
+
+def _user_cache_key(token_data: schemas.TokenData) -> tuple:
+    return token_data.username, token_data.user_id, token_data.stamp
+
+def cached_user(token_data: schemas.TokenData) -> Optional[models.User]:
+    return user_cache.get(_user_cache_key(token_data))
+
+def _remember_user(token_data: schemas.TokenData, user: Optional[models.User]) -> models.User:
+    if user is not None and user.username != token_data.username:
+        user = None
+    # 旧令牌不带标记，只校验用户名
+    if user is not None and token_data.stamp is not None and credential_stamp(user) != token_data.stamp:
+        user = None
     if user is None:
-        print(f"[ERROR] User '{token_data.username}' not found in database")
-
-        # 检查数据库中的所有用户
-        all_users = db.query(models.User).all()
-        print(f"Available users in database:")
-        for u in all_users:
-            print(f"  - '{u.username}' (id: {u.id})")
-
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        logger.info("User '%s' from token not found", token_data.username)
+        raise _credentials_exception("Could not validate credentials")
 
-    print(f"[OK] User found: '{user.username}' (id: {user.id})")
-    print(f"=== GET CURRENT USER SUCCESS ===")
+    logger.debug("User found: '%s' (id: %s)", user.username, user.id)
+    user_cache.set(_user_cache_key(token_data), _snapshot(user))
     return user
 
-def authenticate_user(db: Session, username: str, password: str):
-    print(f"Attempting to authenticate user: {username}")
-
+def _snapshot(user: models.User) -> models.User:
+    # 与会话无关的只读副本，可以跨请求复用；不包含密码哈希
+    return models.User(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        created_at=user.created_at,
+        updated_at=user.updated_at,
+    )
+
+def invalidate_user(username: str):
+    user_cache.discard_where(lambda key, user: key[0] == username)
+    token_cache.discard_where(lambda key, token_data: token_data.username == username)
+
+# 用户被创建、修改或删除时，在事务提交后清除该用户名的缓存；
+# 创建也要清除，避免同名旧用户的缓存留到重新注册之后
+@event.listens_for(AppSession, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault("changed_usernames", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User):
+            changed.add(obj.username)
+            changed.update(inspect(obj).attrs.username.history.deleted or ())
+
+@event.listens_for(AppSession, "after_commit")
+def _invalidate_changed_users(session):
+    for username in session.info.pop("changed_usernames", ()):
+        invalidate_user(username)
+
+@event.listens_for(AppSession, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_usernames", None)
+
+def find_login_user(db: Session, username: str) -> Optional[models.User]:
     # 先尝试精确匹配
     user = db.query(models.User).filter(models.User.username == username).first()
 
     # 如果精确匹配失败，尝试不区分大小写匹配
     if not user:
-        print(f"Exact match failed, trying case-insensitive match...")
         user = db.query(models.User).filter(models.User.username.ilike(username)).first()
         if user:
-            print(f"Found user with case-insensitive match: '{user.username}' for input '{username}'")
+            logger.debug("Found user with case-insensitive match: '%s' for input '%s'", user.username, username)
 
     if not user:
-        print(f"User {username} not found in database (tried both exact and case-insensitive)")
-        # 显示数据库中的所有用户名供调试
-        all_users = db.query(models.User).all()
-        print(f"Available users: {[u.username for u in all_users]}")
-        return False
+        logger.info("Login failed: user '%s' not found", username)
+    return user
 
-    print(f"User found: {user.username}, checking password...")
-    password_valid = verify_password(password, user.hashed_password)
-    print(f"Password verification result: {password_valid}")
+def check_login_password(user: models.User, password: str) -> bool:
+    if not verify_password(password, user.hashed_password):
+        logger.info("Login failed: wrong password for user '%s'", user.username)
+        return False
+    logger.debug("Authentication successful for user: %s", user.username)
+    return True
 
-    if not password_valid:
+def authenticate_user(db: Session, username: str, password: str):
+    user = find_login_user(db, username)
+    if not user or not check_login_password(user, password):
         return False
-    print(f"Authentication successful for user: {user.username}")
-    return user
\ No newline at end of file
+    return user
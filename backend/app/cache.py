@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "10000"))
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "60"))
+
+_MISSING = object()
+_registry = []
+
+
+class LRUCache:
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _registry.append(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+LAST_WRITE_MAX_ENTRIES = int(os.getenv("LAST_WRITE_MAX_ENTRIES", "10000"))
+LAST_WRITE_TTL_SECONDS = float(os.getenv("LAST_WRITE_TTL_SECONDS", "60"))
+
+# 每个用户最近一次写操作提交的时间（monotonic），读请求据此决定是否留在主库；
+# 有上限和过期时间，不会随用户数无限增长
+_last_writes = LRUCache("last_writes", LAST_WRITE_MAX_ENTRIES, LAST_WRITE_TTL_SECONDS)
+
+
+def record_write(user_id: int) -> None:
+    _last_writes.set(user_id, time.monotonic())
+
+
+def last_write(user_id: int) -> Optional[float]:
+    return _last_writes.get(user_id)
+
+
+def cache_key(user_id: int, endpoint: str, version: int, *params: Hashable) -> tuple:
+    # version 是持久化的 todo_counters.version，每次写操作都会递增：
+    # 任何一个进程里的写入都会让所有进程的旧条目失效，旧条目随 LRU/TTL 淘汰
+    return (user_id, endpoint, version, params)
+
+
+def _normalize(value: Any) -> Hashable:
+    return getattr(value, "value", value)
+
+
+def normalize_params(params: Dict[str, Any]) -> tuple:
+    # 按参数名排序、枚举取值、忽略空参数，使等价的请求命中同一条目
+    return tuple(sorted(
+        (name, _normalize(value))
+        for name, value in params.items()
+        if value is not None and value != ""
+    ))
+
+
+response_cache = LRUCache("responses", RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+count_cache = LRUCache("counts", COUNT_CACHE_MAX_ENTRIES, COUNT_CACHE_TTL_SECONDS)
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {cache.name: cache.stats() for cache in _registry}
@@ -0,0 +1,292 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import etags
+from .cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时不提供 br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时不提供 zstd
+    zstandard = None
+
+# 小于该字节数的响应不压缩：压缩收益抵不过 CPU 开销和额外的头部
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# 大于该字节数的响应放到线程池压缩，不阻塞事件循环
+COMPRESSION_THREADPOOL_MIN_SIZE = int(os.getenv("COMPRESSION_THREADPOOL_MIN_SIZE", "65536"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# 流式响应缓冲到这么多字节后开始边压缩边发送
+STREAM_BUFFER_SIZE = int(os.getenv("COMPRESSION_STREAM_BUFFER_SIZE", "65536"))
+COMPRESSED_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSED_CACHE_MAX_ENTRIES", "1024"))
+COMPRESSED_CACHE_TTL_SECONDS = float(os.getenv("COMPRESSED_CACHE_TTL_SECONDS", "300"))
+
+# 客户端权重相同时按此顺序优先选择
+_PREFERENCE = [
+    encoding for encoding, available in (
+        ("zstd", zstandard is not None),
+        ("br", brotli is not None),
+        ("gzip", True),
+        ("deflate", True),
+    ) if available
+]
+
+_COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+# 带 ETag 的响应（内容不变时会被重复请求）压缩结果按 (原始内容摘要, 编码) 缓存，
+# 内容不变时直接复用，不再重复压缩。不用 ETag 做键：不同用户或删除后重建的条目
+# 可能得到相同的 ETag，以内容为键才不会把别人的响应体发出去
+compressed_cache = LRUCache("compressed", COMPRESSED_CACHE_MAX_ENTRIES, COMPRESSED_CACHE_TTL_SECONDS)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                continue
+        weights[name] = weight
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [
+        (weights.get(encoding, wildcard), -index, encoding)
+        for index, encoding in enumerate(_PREFERENCE)
+    ]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
+
+
+def _compressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.compressobj(GZIP_LEVEL)
+    if encoding == "br":
+        return brotli.Compressor(quality=BROTLI_QUALITY)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(body, GZIP_LEVEL)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+def _process(encoding: str, compressor, body: bytes) -> bytes:
+    if encoding == "br":
+        return compressor.process(body)
+    return compressor.compress(body)
+
+
+def _flush(encoding: str, compressor, final: bool) -> bytes:
+    # 流式响应每个分块都刷新，客户端可以边收边解压
+    if encoding in ("gzip", "deflate"):
+        return compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+    if encoding == "br":
+        return compressor.finish() if final else compressor.flush()
+    return compressor.flush() if final else compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encodings: Dict[str, Dict[str, Any]] = {}
+        self.skipped_small = 0
+
+    def record(
+        self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float,
+        cached: bool = False, new_response: bool = True,
+    ) -> None:
+        with self._lock:
+            entry = self._encodings.setdefault(encoding, {
+                "responses": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0,
+            })
+            entry["responses"] += int(new_response)
+            entry["cache_hits"] += int(cached)
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu_seconds"] += cpu_seconds
+
+    def record_skipped(self) -> None:
+        with self._lock:
+            self.skipped_small += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {encoding: dict(entry) for encoding, entry in self._encodings.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        encodings = {}
+        for encoding, entry in self.snapshot().items():
+            compressed = entry["responses"] - entry["cache_hits"]
+            encodings[encoding] = {
+                **entry,
+                "cpu_seconds": round(entry["cpu_seconds"], 6),
+                "ratio": round(entry["bytes_out"] / entry["bytes_in"], 4) if entry["bytes_in"] else None,
+                "avg_cpu_ms": round(entry["cpu_seconds"] / compressed * 1000, 3) if compressed else None,
+            }
+        with self._lock:
+            skipped_small = self.skipped_small
+        return {
+            "min_size": COMPRESSION_MIN_SIZE,
+            "available": list(_PREFERENCE),
+            "skipped_small": skipped_small,
+            "encodings": encodings,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+def _timed(func, *args) -> Tuple[bytes, float]:
+    # 线程 CPU 时间：不包含在线程池中排队或等待 GIL 的时间
+    started = time.thread_time()
+    result = func(*args)
+    return result, time.thread_time() - started
+
+
+def _compressible(message: Message, headers: MutableHeaders) -> bool:
+    if message["status"] < 200 or message["status"] in (204, 304):
+        return False
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.minimum_size).send)
+
+
+class _CompressingSender:
+    # 响应体可能分多条消息到达（流式响应，或经过 BaseHTTPMiddleware 转发），
+    # 先缓冲到结束或超过 STREAM_BUFFER_SIZE，再决定整体压缩还是流式压缩
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.headers: Optional[MutableHeaders] = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.passthrough = False
+        self.compressor = None
+        self.chunks = 0
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.headers = MutableHeaders(raw=message["headers"])
+            self.passthrough = not _compressible(message, self.headers)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send_start()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            await self._send_chunk(body, more_body)
+            return
+
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if more_body and self.buffered < max(self.minimum_size, STREAM_BUFFER_SIZE):
+            return
+        body, self.buffer = b"".join(self.buffer), []
+
+        if not more_body and len(body) < self.minimum_size:
+            compression_stats.record_skipped()
+            self.passthrough = True
+            await self._send_start()
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        self.headers["Content-Encoding"] = self.encoding
+        self.headers.add_vary_header("Accept-Encoding")
+        etag = self.headers.get("etag")
+        if etag is not None:
+            self.headers["ETag"] = etags.encoded(etag, self.encoding)
+        if more_body:
+            # 流式响应（如导出）：长度未知，边压缩边发送
+            del self.headers["Content-Length"]
+            self.compressor = _compressor(self.encoding)
+            await self._send_start()
+            await self._send_chunk(body, more_body)
+            return
+
+        compressed = await self._compress_body(body, etag)
+        self.headers["Content-Length"] = str(len(compressed))
+        await self._send_start()
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _send_start(self) -> None:
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self._send(start)
+
+    async def _compress_body(self, body: bytes, etag: Optional[str]) -> bytes:
+        key = (hashlib.sha256(body).digest(), self.encoding) if etag else None
+        if key is not None:
+            compressed = compressed_cache.get(key)
+            if compressed is not None:
+                compression_stats.record(self.encoding, len(body), len(compressed), 0.0, cached=True)
+                return compressed
+
+        if len(body) >= COMPRESSION_THREADPOOL_MIN_SIZE:
+            compressed, cpu_seconds = await run_in_threadpool(_timed, _compress, self.encoding, body)
+        else:
+            compressed, cpu_seconds = _timed(_compress, self.encoding, body)
+        compression_stats.record(self.encoding, len(body), len(compressed), cpu_seconds)
+        if key is not None:
+            compressed_cache.set(key, compressed)
+        return compressed
+
+    async def _send_chunk(self, body: bytes, more_body: bool) -> None:
+        started = time.thread_time()
+        chunk = _process(self.encoding, self.compressor, body) if body else b""
+        chunk += _flush(self.encoding, self.compressor, final=not more_body)
+        compression_stats.record(
+            self.encoding, len(body), len(chunk), time.thread_time() - started, new_response=self.chunks == 0
+        )
+        self.chunks += 1
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -1,18 +1,65 @@
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+import logging
 import os
 
+from . import metrics, profiler, sqlite_profile
+
+logger = logging.getLogger(__name__)
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./todo.db")
+# 异步模式：路由使用 async def + 异步引擎，等待数据库时不占用线程池线程
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "20"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+# 只读副本，多个用逗号分隔；为空时所有读请求都走主库。SQLite 副本建议以只读方式打开：
+# sqlite:///file:./todo-replica.db?mode=ro&uri=true
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URL", "").split(",") if url.strip()]
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
 connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
 
+
+class AppSession(Session):
+    # 同步会话与异步会话内部的同步会话共用此类，会话事件监听对两种模式都生效
+    pass
+
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args=connect_args,
+    connect_args={**connect_args, **sqlite_profile.connect_args(SQLALCHEMY_DATABASE_URL)},
     pool_pre_ping=not SQLALCHEMY_DATABASE_URL.startswith("sqlite"),
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SQLITE_PROFILE=production 时设置 WAL 等 PRAGMA，并让写事务排队进入写锁
+sqlite_profile.configure(engine)
+# 语句计数/耗时和连接池等待时间，见 /metrics
+metrics.instrument_engine(engine)
+# SQL_PROFILE=true 时逐条记录请求内的语句，检查 N+1 并记录慢查询的执行计划
+profiler.instrument_engine(engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AppSession)
+
+
+def _engine_args(url: str) -> dict:
+    return {
+        "connect_args": {"check_same_thread": False} if url.startswith("sqlite") else {},
+        "pool_pre_ping": not url.startswith("sqlite"),
+    }
+
+
+def _instrument_read_engine(read_engine, name: str) -> None:
+    sqlite_profile.configure(read_engine, writer_lane_enabled=False, read_only=True)
+    metrics.instrument_engine(read_engine, name)
+    profiler.instrument_engine(read_engine)
+
+
+# 副本引擎按需连接，创建时不访问数据库；会话通过 SessionLocal(bind=...) 绑定到副本
+read_engines = []
+for index, read_url in enumerate(DATABASE_READ_URLS, 1):
+    read_engines.append(create_engine(read_url, **_engine_args(read_url)))
+    _instrument_read_engine(read_engines[-1], f"replica{index}")
 
 Base = declarative_base()
 
@@ -23,23 +70,49 @@ def get_db():
     finally:
         db.close()
 
-def create_tables():
-    from . import models
-    models.Base.metadata.create_all(bind=engine)
-    _ensure_schema()
-
-
-def _ensure_schema():
-    inspector = inspect(engine)
-    if "todos" not in inspector.get_table_names():
-        return
-
-    columns = {column["name"] for column in inspector.get_columns("todos")}
-    if "attachments" not in columns:
-        with engine.begin() as connection:
-            try:
-                connection.execute(text("ALTER TABLE todos ADD COLUMN attachments JSON"))
-                print("[INFO] Added 'attachments' column to todos table")
-            except Exception:
-                connection.execute(text("ALTER TABLE todos ADD COLUMN attachments TEXT"))
-                print("[INFO] Added 'attachments' column to todos table as TEXT")
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"DATABASE_ASYNC is not supported for '{backend}' databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+async_read_engines = []
+
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    pool_args = {} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_MAX_OVERFLOW,
+    }
+    async_engine = create_async_engine(
+        async_database_url(SQLALCHEMY_DATABASE_URL),
+        connect_args=connect_args,
+        pool_pre_ping=not SQLALCHEMY_DATABASE_URL.startswith("sqlite"),
+        **pool_args,
+    )
+    sqlite_profile.configure(async_engine.sync_engine, writer_lane_enabled=False)
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+    profiler.instrument_engine(async_engine.sync_engine)
+    # 提交后不过期对象：响应序列化发生在会话之外，不能再触发隐式 IO
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+        sync_session_class=AppSession,
+    )
+    for index, read_url in enumerate(DATABASE_READ_URLS, 1):
+        async_read_engines.append(
+            create_async_engine(async_database_url(read_url), **_engine_args(read_url), **pool_args)
+        )
+        _instrument_read_engine(async_read_engines[-1].sync_engine, f"async-replica{index}")
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,80 @@
+import hashlib
+import time
+from typing import Hashable, Optional
+
+from fastapi import Response, status
+
+# 逾期状态随时间变化，与逾期相关的响应在 ETag 中带上时间窗口，最多延迟这么久刷新
+OVERDUE_ETAG_WINDOW_SECONDS = 60
+
+# 要求浏览器每次都带 If-None-Match 重新验证，而不是直接使用本地缓存
+CACHE_CONTROL = "private, no-cache"
+
+# 压缩中间件可能使用的编码，压缩后的 ETag 带这些后缀
+CONTENT_ENCODINGS = ("gzip", "br", "zstd", "deflate")
+
+
+def make_etag(kind: str, *parts: Hashable) -> str:
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+    return f'"{kind}-{digest}"'
+
+
+def item_etag(todo) -> str:
+    # 只用 id 和 version 的话，删除后重建的 todo 会得到相同的 ETag（SQLite 复用 rowid，
+    # version 从 1 重新开始）；加上所属用户、创建时间和本次改动的 change_seq，不同的行不会重复。
+    # todo 可以是 ORM 对象，也可以是带这些列的 Row
+    return make_etag("todo", todo.user_id, todo.id, todo.created_at, todo.version, todo.change_seq)
+
+
+def overdue_window() -> int:
+    return int(time.time() // OVERDUE_ETAG_WINDOW_SECONDS)
+
+
+def encoded(etag: str, encoding: str) -> str:
+    # 压缩后的字节与原始内容不同，强校验器必须随编码区分，否则缓存和 If-Match
+    # 会把 gzip、br 与未压缩的响应体混为一谈；在引号内加上编码后缀
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(tag: str) -> str:
+    for encoding in CONTENT_ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def _candidates(header: str):
+    # 客户端回传的可能是压缩响应上带编码后缀的 ETag，比较时去掉后缀
+    return [_strip_encoding(value.strip()) for value in header.split(",") if value.strip()]
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match 使用弱比较：忽略 W/ 前缀
+    if not if_none_match:
+        return False
+    for candidate in _candidates(if_none_match):
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def match(if_match: Optional[str], etag: str) -> bool:
+    # If-Match 使用强比较；未携带 If-Match 视为无条件
+    if if_match is None:
+        return True
+    return any(candidate in ("*", etag) for candidate in _candidates(if_match))
+
+
+def set_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, Iterable, Iterator, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models, projections, schemas
+
+# 每批从数据库取出并序列化的行数；内存占用只与批大小有关，与总行数无关
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+MEDIA_TYPES = {
+    schemas.ExportFormat.NDJSON: "application/x-ndjson",
+    schemas.ExportFormat.CSV: "text/csv; charset=utf-8",
+    schemas.ExportFormat.JSON: "application/json",
+}
+
+
+def export_fields(include_attachments: bool) -> Sequence[str]:
+    if include_attachments:
+        return projections.FULL_FIELDS
+    return tuple(field for field in projections.FULL_FIELDS if field != "attachments")
+
+
+def _statement(user_id: int, fields: Sequence[str]):
+    # 只查询列而不加载 ORM 对象，行不会堆积在会话的 identity map 中；
+    # yield_per 在 PostgreSQL 上使用服务端游标，按批从数据库拉取
+    columns = [getattr(models.Todo, field) for field in fields]
+    return (
+        select(*columns)
+        .where(models.Todo.user_id == user_id)
+        .order_by(models.Todo.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def _records(rows: Iterable, fields: Sequence[str]) -> Iterator[dict]:
+    # 与 GET /todos/{id} 的序列化保持一致（附件引用还原为 data URL）
+    for row in rows:
+        todo = schemas.Todo.model_validate(dict(row._mapping))
+        yield todo.model_dump(mode="json", include=set(fields))
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class _Encoder:
+    def __init__(self, fmt: schemas.ExportFormat, fields: Sequence[str]):
+        self.fmt = fmt
+        self.fields = fields
+        self.first = True
+
+    def header(self) -> bytes:
+        if self.fmt == schemas.ExportFormat.CSV:
+            return self._csv_lines([list(self.fields)])
+        if self.fmt == schemas.ExportFormat.JSON:
+            return b"["
+        return b""
+
+    def footer(self) -> bytes:
+        return b"]\n" if self.fmt == schemas.ExportFormat.JSON else b""
+
+    def encode(self, rows: Iterable) -> bytes:
+        records = _records(rows, self.fields)
+        if self.fmt == schemas.ExportFormat.CSV:
+            return self._csv_lines([_csv_value(record[field]) for field in self.fields] for record in records)
+        lines = [json.dumps(record, ensure_ascii=False) for record in records]
+        if self.fmt == schemas.ExportFormat.NDJSON:
+            return "".join(f"{line}\n" for line in lines).encode("utf-8")
+        if not lines:
+            return b""
+        chunk = ",\n".join(lines)
+        if not self.first:
+            chunk = ",\n" + chunk
+        self.first = False
+        return chunk.encode("utf-8")
+
+    @staticmethod
+    def _csv_lines(rows: Iterable[list]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+
+def stream(db: Session, user_id: int, fmt: schemas.ExportFormat, include_attachments: bool) -> Iterator[bytes]:
+    fields = export_fields(include_attachments)
+    encoder = _Encoder(fmt, fields)
+    yield encoder.header()
+    result = db.execute(_statement(user_id, fields))
+    for partition in result.partitions():
+        yield encoder.encode(partition)
+    yield encoder.footer()
+
+
+async def stream_async(
+    db: AsyncSession, user_id: int, fmt: schemas.ExportFormat, include_attachments: bool
+) -> AsyncIterator[bytes]:
+    fields = export_fields(include_attachments)
+    encoder = _Encoder(fmt, fields)
+    yield encoder.header()
+    result = await db.stream(_statement(user_id, fields))
+    async for partition in result.partitions():
+        # 序列化和读取附件文件放到线程池，不阻塞事件循环
+        yield await run_in_threadpool(encoder.encode, partition)
+    yield encoder.footer()
+
+
+def response(body, fmt: schemas.ExportFormat) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="todos.{fmt.value}"'},
+    )
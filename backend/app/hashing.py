@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# 密码哈希专用线程池：bcrypt/pbkdf2 计算时释放 GIL，线程即可并行占满 CPU；
+# 与请求线程池隔离，登录洪峰不会拖慢其他接口
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_POOL_MAX_QUEUE = int(os.getenv("HASH_POOL_MAX_QUEUE", "32"))
+HASH_POOL_RETRY_AFTER_SECONDS = int(os.getenv("HASH_POOL_RETRY_AFTER_SECONDS", "1"))
+
+
+class HashPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash")
+        # 正在执行 + 排队中的任务总数上限，超过时直接拒绝
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    async def run(self, func: Callable, *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Hash pool saturated, rejecting request")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry",
+                headers={"Retry-After": str(HASH_POOL_RETRY_AFTER_SECONDS)},
+            )
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._executor.submit(self._execute, func, args, time.perf_counter())
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+        return await asyncio.wrap_future(future)
+
+    def _execute(self, func: Callable, args: tuple, submitted_at: float) -> Any:
+        started_at = time.perf_counter()
+        with self._lock:
+            self.pending -= 1
+            self.active += 1
+            self.wait_seconds += started_at - submitted_at
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.run_seconds += elapsed
+                self.max_run_seconds = max(self.max_run_seconds, elapsed)
+            self._slots.release()
+            logger.debug("Hash task finished in %.1f ms", elapsed * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": self.pending,
+                "utilization": round(self.active / self.workers, 4),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else None,
+                "avg_hash_ms": round(self.run_seconds / self.completed * 1000, 2) if self.completed else None,
+                "max_hash_ms": round(self.max_run_seconds * 1000, 2),
+            }
+
+
+hash_pool = HashPool(HASH_POOL_WORKERS, HASH_POOL_MAX_QUEUE)
@@ -0,0 +1,233 @@
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import attachments, cache, models, schemas, stats
+
+logger = logging.getLogger(__name__)
+
+# 每个分块在一个事务中写入；内存占用只与分块大小有关，与文件大小无关
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+MAX_IMPORT_CHUNK_SIZE = 5000
+# 响应中最多列出的错误行数，超出的只计数
+MAX_IMPORT_ERRORS = 100
+
+# (起始行号, NDJSON 的原始文本或 CSV 解析出的各列)；CSV 行无法解析时为 csv.Error
+Record = Tuple[int, Union[str, List[str], csv.Error]]
+
+
+def detect_format(content_type: Optional[str]) -> schemas.ImportFormat:
+    if content_type and "csv" in content_type.lower():
+        return schemas.ImportFormat.CSV
+    return schemas.ImportFormat.NDJSON
+
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    # 只按 \n 切分：JSON 字符串里可能出现 U+2028 等 splitlines 也会切开的字符
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parts: List[str] = []
+    line_no = 0
+    try:
+        async for chunk in body:
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if "\n" not in text:
+                continue
+            *lines, tail = "".join(parts).split("\n")
+            parts = [tail]
+            for line in lines:
+                line_no += 1
+                yield line_no, line.removesuffix("\r")
+        parts.append(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request body is not valid UTF-8 (after line {line_no})"
+        )
+    pending = "".join(parts)
+    if pending:
+        yield line_no + 1, pending.removesuffix("\r")
+
+
+class _LineFeed:
+    # csv.reader 的输入：异步读到的行放进队列，reader 逐行取走。队列取空时本次读取结束，
+    # 之后放入的行同一个 reader 还能继续读
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self) -> "_LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+def _drain(reader, feed: _LineFeed) -> Iterator[Record]:
+    while feed.lines:
+        start = reader.line_num + 1
+        try:
+            values = next(reader)
+        except csv.Error as e:
+            yield start, e
+            continue
+        if len(values) > 1 or (values and values[0].strip()):
+            yield start, values
+
+
+async def _records(body: AsyncIterator[bytes], fmt: schemas.ImportFormat) -> AsyncIterator[Record]:
+    if fmt == schemas.ImportFormat.NDJSON:
+        async for line_no, line in _lines(body):
+            if line.strip():
+                yield line_no, line
+        return
+    # 整个文件由同一个 csv.reader 解析。引号内允许换行：累计的引号个数为奇数时记录尚未结束，
+    # 先攒着，凑齐后再交给 reader，reader 不会在记录中途读空
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    quotes = 0
+    async for _, line in _lines(body):
+        feed.lines.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            quotes = 0
+            for record in _drain(reader, feed):
+                yield record
+    # 末尾引号没有闭合的记录
+    for record in _drain(reader, feed):
+        yield record
+
+
+def _parse_header(values: Union[List[str], csv.Error]) -> List[str]:
+    header = [] if isinstance(values, csv.Error) else [name.strip() for name in values]
+    if "title" not in header:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV header must contain a 'title' column"
+        )
+    return header
+
+
+def _parse_record(
+    fmt: schemas.ImportFormat, header: Sequence[str], record: Union[str, List[str], csv.Error]
+) -> schemas.TodoCreate:
+    if fmt == schemas.ImportFormat.NDJSON:
+        data = json.loads(record)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        return schemas.TodoCreate(**data)
+
+    if isinstance(record, csv.Error):
+        raise ValueError(f"Invalid CSV: {record}")
+    values = record
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    # 空单元格视为未提供，使用默认值；附件列与导出一致，为 JSON 数组
+    data = {name: value for name, value in zip(header, values) if value != ""}
+    if "attachments" in data:
+        data["attachments"] = json.loads(data["attachments"])
+    return schemas.TodoCreate(**data)
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+            for item in error.errors()
+        )
+    return str(error)
+
+
+def parse_chunk(
+    fmt: schemas.ImportFormat, header: Sequence[str], records: List[Record]
+) -> Tuple[List[schemas.TodoCreate], List[schemas.TodoImportError]]:
+    items, errors = [], []
+    for line_no, record in records:
+        try:
+            items.append(_parse_record(fmt, header, record))
+        except (ValueError, TypeError) as e:
+            # ValidationError 与 JSONDecodeError 都是 ValueError 的子类
+            errors.append(schemas.TodoImportError(line=line_no, error=_error_message(e)))
+    return items, errors
+
+
+def insert_items(db: Session, user_id: int, items: List[schemas.TodoCreate]) -> int:
+    if not items:
+        return 0
+    rows = []
+    groups = defaultdict(int)
+    for item in items:
+        todo_data = item.dict()
+        todo_data["attachments"] = attachments.store(db, todo_data["attachments"])
+        todo_data["user_id"] = user_id
+        rows.append(todo_data)
+        groups[(item.status, item.type)] += 1
+
+    change_seq = stats.record_groups(db, user_id, groups)
+    for todo_data in rows:
+        todo_data["change_seq"] = change_seq
+    # 不需要返回 id，不带 RETURNING 的 executemany 在各驱动上都是真正的批量插入
+    db.execute(insert(models.Todo), rows)
+    db.commit()
+    cache.record_write(user_id)
+    return len(rows)
+
+
+async def run_import(
+    body: AsyncIterator[bytes],
+    fmt: schemas.ImportFormat,
+    chunk_size: int,
+    insert_chunk: Callable[[List[schemas.TodoCreate]], Awaitable[int]],
+) -> schemas.TodoImportResponse:
+    # 事件循环只负责切分记录；解析校验放到线程池，写库由 insert_chunk 决定在哪执行。
+    # 每个分块单独提交：中途失败时，已提交的分块会保留
+    started = time.perf_counter()
+    header: Optional[List[str]] = None
+    inserted = failed = chunks = 0
+    errors: List[schemas.TodoImportError] = []
+    batch: List[Record] = []
+
+    async def flush() -> None:
+        nonlocal inserted, failed, chunks
+        items, chunk_errors = await run_in_threadpool(parse_chunk, fmt, header, batch)
+        inserted += await insert_chunk(items)
+        failed += len(chunk_errors)
+        errors.extend(chunk_errors[:MAX_IMPORT_ERRORS - len(errors)])
+        chunks += 1
+        batch.clear()
+
+    async for line_no, record in _records(body, fmt):
+        if fmt == schemas.ImportFormat.CSV and header is None:
+            header = _parse_header(record)
+            continue
+        batch.append((line_no, record))
+        if len(batch) >= chunk_size:
+            await flush()
+    if batch:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Imported %d todos in %.2f s (%d failed rows, %d chunks)", inserted, elapsed, failed, chunks
+    )
+    return schemas.TodoImportResponse(
+        format=fmt,
+        inserted=inserted,
+        failed=failed,
+        errors=errors,
+        chunks=chunks,
+        elapsed_ms=round(elapsed * 1000, 2),
+        rows_per_second=round(inserted / elapsed, 1) if elapsed > 0 else None,
+    )
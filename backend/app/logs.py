@@ -0,0 +1,115 @@
+import atexit
+import copy
+import datetime
+import decimal
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from collections.abc import Mapping
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text 或 json
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# LogRecord 自带的属性，其余通过 extra= 传入的字段作为结构化字段输出
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in vars(record).items() if key not in _RESERVED}
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+        timestamp = f"{timestamp}.{int(record.msecs):03d}Z"
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+
+        if self.fmt == "json":
+            payload = {"ts": timestamp, "level": record.levelname, "logger": record.name, "msg": message}
+            payload.update(fields)
+            return json.dumps(payload, ensure_ascii=False, default=str)
+
+        extras = " ".join(f"{key}={value}" for key, value in fields.items())
+        line = f"{timestamp} {record.levelname:<5} {record.name} {message}"
+        return f"{line} {extras}" if extras else line
+
+
+# 入队后不会再被修改的参数类型，可以留到后台线程再格式化
+_IMMUTABLE_ARGS = (
+    str, bytes, int, float, type(None),
+    datetime.date, datetime.time, datetime.timedelta, decimal.Decimal, uuid.UUID,
+)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    # 队列满时丢弃日志而不是阻塞请求线程
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 标准实现在请求线程里合成消息并格式化异常；这里原样入队，由后台线程的 handler 格式化。
+        # 参数中有可变对象时，它可能在格式化之前被修改，只对这种记录在当前线程合成消息
+        args = record.args or ()
+        values = args.values() if isinstance(args, Mapping) else args
+        if isinstance(record.msg, str) and all(isinstance(value, _IMMUTABLE_ARGS) for value in values):
+            return record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging() -> None:
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+
+    # 请求线程只负责入队，格式化和写 stdout 在后台线程完成
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    # 以 python -m app.xxx 运行命令行工具时，模块的日志器名为 __main__
+    for name in ("app", "__main__"):
+        logger = logging.getLogger(name)
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+access_logger = logging.getLogger("app.access")
+
+
+def log_access(method: str, path: str, status_code: int, duration_ms: float, client: str = None) -> None:
+    # 错误响应总是记录，成功请求按采样率记录
+    if status_code < 400 and ACCESS_LOG_SAMPLE_RATE < 1.0 and random.random() >= ACCESS_LOG_SAMPLE_RATE:
+        return
+    if not access_logger.isEnabledFor(logging.INFO):
+        return
+    access_logger.info(
+        "%s %s",
+        method,
+        path,
+        extra={"status": status_code, "duration_ms": round(duration_ms, 2), "client": client},
+    )
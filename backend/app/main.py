@@ -1,31 +1,63 @@
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from typing import List
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, todos
-from .database import create_tables
+from .database import DATABASE_ASYNC, async_engine, async_read_engines, engine
+from . import cache, compression, hashing, logs, metrics, migrations, profiler, replicas, sqlite_profile
+
+logger = logging.getLogger(__name__)
+
+# 导入模块没有副作用；日志、迁移等初始化在应用启动时执行一次
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logs.setup_logging()
+    logger.info("Allowed CORS origins: %s", allowed_origins)
+    logger.info("Allowed CORS origin regex: %s", allow_origin_regex)
+    if DATABASE_ASYNC:
+        logger.info("Database async mode enabled")
+    if replicas.DATABASE_READ_URLS:
+        logger.info("Routing reads to %d replicas", len(replicas.DATABASE_READ_URLS))
+    if migrations.RUN_MIGRATIONS_ON_STARTUP:
+        await run_in_threadpool(migrations.migrate, engine)
+    maintenance = sqlite_profile.start_maintenance(engine)
+    yield
+    if maintenance is not None:
+        maintenance.cancel()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for read_engine in async_read_engines:
+        await read_engine.dispose()
 
 app = FastAPI(
     title="Todo List API",
     description="A simple todo list application API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# 添加请求日志中间件
+# 访问日志中间件：每个请求一行，包含状态码和耗时
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    print(f"=== REQUEST: {request.method} {request.url.path} ===")
-    print(f"Headers: {dict(request.headers)}")
-    if "authorization" in request.headers:
-        auth_header = request.headers["authorization"]
-        print(f"[OK] Authorization header found: {auth_header[:50]}...")
-    else:
-        print(f"[INFO] No Authorization header found")
-
-    response = await call_next(request)
-    print(f"=== RESPONSE: {response.status_code} ===")
-    return response
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        logs.log_access(
+            request.method,
+            request.url.path,
+            status_code,
+            (time.perf_counter() - start) * 1000,
+            request.client.host if request.client else None,
+        )
 
 def _build_allowed_origins() -> List[str]:
     default_origins = [
@@ -60,8 +92,9 @@ def _build_allowed_origins() -> List[str]:
 
 allowed_origins = _build_allowed_origins()
 allow_origin_regex = os.getenv("CORS_ORIGIN_REGEX", r"https://.*\.gitee\.io")
-print(f"[INIT] Allowed CORS origins: {allowed_origins}")
-print(f"[INIT] Allowed CORS origin regex: {allow_origin_regex}")
+
+# 按 Accept-Encoding 协商压缩，小响应不压缩
+app.add_middleware(compression.CompressionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -70,12 +103,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
 )
 
-create_tables()
+# 配置了读副本时，写请求的响应带上粘滞 cookie，保证多进程部署下也能读到自己的写入
+if replicas.enabled():
+    app.add_middleware(replicas.StickyWriteMiddleware)
 
-app.include_router(auth.router)
-app.include_router(todos.router)
+# 开发时的 SQL 分析：Server-Timing 响应头、N+1 检测
+if profiler.SQL_PROFILE:
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+# 最外层：按路由模板统计请求数、耗时和每个请求的 SQL 语句数/耗时
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if DATABASE_ASYNC:
+    from .routers import async_auth, async_todos
+
+    app.include_router(async_auth.router)
+    app.include_router(async_todos.router)
+else:
+    app.include_router(auth.router)
+    app.include_router(todos.router)
 
 @app.get("/")
 def read_root():
@@ -84,3 +134,35 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/cache")
+def cache_health():
+    return cache.stats()
+
+@app.get("/health/hashing")
+def hashing_health():
+    return hashing.hash_pool.stats()
+
+@app.get("/health/sqlite")
+def sqlite_health():
+    return sqlite_profile.stats()
+
+@app.get("/health/compression")
+def compression_health():
+    return compression.compression_stats.stats()
+
+@app.get("/health/replicas")
+def replicas_health():
+    return replicas.stats()
+
+@app.get("/health/sql")
+def sql_profile_health():
+    return profiler.stats()
+
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    # 路由全部注册之后再包装，正在处理的请求数按路由模板计入
+    metrics.instrument_routes(app.routes)
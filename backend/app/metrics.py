@@ -0,0 +1,349 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import cache, compression, hashing, sqlite_profile
+
+# Prometheus 文本格式的 /metrics；请求路径上只做计数和直方图分桶，渲染在抓取时完成
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # 每个标签组合：各桶计数（非累计，最后一个是 +Inf）+ 观测值之和
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        lines = self.header()
+        bucket_names = self.labelnames + ("le",)
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_names, labels + (_format_value(bound),))} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+# 抓取时调用，把现有模块的统计（缓存、哈希线程池、压缩、SQLite 写锁、连接池）转成指标行
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def collector(func: Callable[[], Iterable[str]]) -> Callable[[], Iterable[str]]:
+    _collectors.append(func)
+    return func
+
+
+requests_total = Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")
+)
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency including middleware.", ("method", "route"), REQUEST_BUCKETS
+)
+requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled by a route.", ("method", "route")
+)
+request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+request_db_duration = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request.", ("method", "route"), REQUEST_BUCKETS
+)
+db_queries_total = Counter("db_queries_total", "SQL statements executed.", ("engine", "operation"))
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time.", ("engine", "operation"), QUERY_BUCKETS
+)
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("engine",), QUERY_BUCKETS
+)
+
+# 当前请求的 [SQL 语句数, SQL 耗时]；线程池和 greenlet 都会复制上下文，引用的是同一个列表
+_request_sql: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_sql", default=None)
+
+_UNMATCHED = "unmatched"
+
+
+def _operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].lower()
+    return operation if operation in ("select", "insert", "update", "delete") else "other"
+
+
+class MetricsMiddleware:
+    # 纯 ASGI 中间件，放在最外层：耗时包含压缩、CORS 等中间件；路由模板在路由匹配后从 scope 读取，
+    # 未匹配的路径统一记为 unmatched，避免标签基数随 404 路径增长
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_sql.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", _UNMATCHED))
+            requests_total.inc(labels + (str(status_code),))
+            request_duration.observe(elapsed, labels)
+            request_db_queries.observe(sql[0], labels)
+            request_db_duration.observe(sql[1], labels)
+
+
+def _track_in_flight(path: str, app: ASGIApp) -> ASGIApp:
+    async def tracked(scope: Scope, receive: Receive, send: Send) -> None:
+        labels = (scope["method"], path)
+        requests_in_flight.inc(labels)
+        try:
+            await app(scope, receive, send)
+        finally:
+            requests_in_flight.dec(labels)
+
+    return tracked
+
+
+def instrument_routes(routes: Iterable) -> None:
+    # 在路由的 ASGI 应用外包一层计数，只有路由匹配之后才知道按哪个模板计入
+    for route in routes:
+        if hasattr(route, "path") and hasattr(route, "app") and getattr(route, "methods", None):
+            route.app = _track_in_flight(route.path, route.app)
+
+
+_engines: List[Tuple[str, Engine]] = []
+
+
+def _instrument_pool(engine: Engine, name: str) -> None:
+    # 连接池没有“开始等待”事件，包装 Pool.connect 计时；dispose 重建连接池后重新包装
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, (name,))
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(engine: Engine, name: str = "primary") -> None:
+    if not METRICS_ENABLED:
+        return
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        context.metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - context.metrics_started
+        operation = _operation(statement)
+        db_queries_total.inc((name, operation))
+        db_query_duration.observe(elapsed, (name, operation))
+        sql = _request_sql.get()
+        if sql is not None:
+            sql[0] += 1
+            sql[1] += elapsed
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "engine_disposed", lambda disposed: _instrument_pool(disposed, name))
+    _instrument_pool(engine, name)
+    _engines.append((name, engine))
+
+
+def sample_lines(name: str, kind: str, documentation: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return lines
+
+
+@collector
+def _pool_metrics() -> Iterable[str]:
+    checked_out, idle = [], []
+    for name, engine in _engines:
+        pool = engine.pool
+        # 只有 QueuePool 一类的连接池提供这些计数
+        if hasattr(pool, "checkedout") and hasattr(pool, "checkedin"):
+            checked_out.append(({"engine": name}, pool.checkedout()))
+            idle.append(({"engine": name}, pool.checkedin()))
+    yield from sample_lines("db_pool_connections_in_use", "gauge", "Pooled connections checked out.", checked_out)
+    yield from sample_lines("db_pool_connections_idle", "gauge", "Pooled connections idle in the pool.", idle)
+
+
+@collector
+def _cache_metrics() -> Iterable[str]:
+    caches = cache.stats()
+    for metric, key, kind in (
+        ("cache_hits_total", "hits", "counter"),
+        ("cache_misses_total", "misses", "counter"),
+        ("cache_evictions_total", "evictions", "counter"),
+        ("cache_entries", "entries", "gauge"),
+    ):
+        yield from sample_lines(
+            metric, kind, f"LRU cache {key}.", [({"cache": name}, values[key]) for name, values in caches.items()]
+        )
+
+
+@collector
+def _hash_pool_metrics() -> Iterable[str]:
+    pool = hashing.hash_pool
+    yield from sample_lines("hash_pool_active", "gauge", "Password hashes running.", [({}, pool.active)])
+    yield from sample_lines("hash_pool_queued", "gauge", "Password hashes waiting for a worker.", [({}, pool.pending)])
+    yield from sample_lines("hash_pool_completed_total", "counter", "Password hashes completed.", [({}, pool.completed)])
+    yield from sample_lines("hash_pool_rejected_total", "counter", "Password hashes rejected.", [({}, pool.rejected)])
+    yield from sample_lines(
+        "hash_pool_wait_seconds_total", "counter", "Time hashes spent queued.", [({}, pool.wait_seconds)]
+    )
+
+
+@collector
+def _compression_metrics() -> Iterable[str]:
+    encodings = compression.compression_stats.snapshot()
+    for metric, key, documentation in (
+        ("compression_responses_total", "responses", "Responses compressed."),
+        ("compression_cache_hits_total", "cache_hits", "Compressed bodies served from cache."),
+        ("compression_bytes_in_total", "bytes_in", "Uncompressed bytes."),
+        ("compression_bytes_out_total", "bytes_out", "Compressed bytes."),
+        ("compression_cpu_seconds_total", "cpu_seconds", "CPU time spent compressing."),
+    ):
+        yield from sample_lines(
+            metric, "counter", documentation,
+            [({"encoding": encoding}, values[key]) for encoding, values in encodings.items()],
+        )
+    yield from sample_lines(
+        "compression_skipped_total", "counter", "Responses below the minimum size.",
+        [({}, compression.compression_stats.skipped_small)],
+    )
+
+
+@collector
+def _sqlite_metrics() -> Iterable[str]:
+    if not sqlite_profile.is_production():
+        return
+    lane = sqlite_profile.writer_lane
+    yield from sample_lines("sqlite_writer_lane_acquired_total", "counter", "Write transactions admitted.", [({}, lane.acquired)])
+    yield from sample_lines("sqlite_writer_lane_timeouts_total", "counter", "Writer lane wait timeouts.", [({}, lane.timeouts)])
+    yield from sample_lines(
+        "sqlite_writer_lane_wait_seconds_total", "counter", "Time spent waiting for the writer lane.",
+        [({}, lane.wait_seconds)],
+    )
+    yield from sample_lines(
+        "sqlite_writer_lane_hold_seconds_total", "counter", "Time the writer lane was held.", [({}, lane.hold_seconds)]
+    )
+
+
+def render() -> bytes:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return ("\n".join(lines) + "\n").encode("utf-8")
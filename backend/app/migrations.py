@@ -0,0 +1,256 @@
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.schema import CreateIndex
+
+from . import attachments, models, search
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，SQLite 迁移不加进程间锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 进程启动时（lifespan）是否自动执行迁移；多 worker 部署可关闭后改为发布前执行
+# python -m app.migrations
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
+# PostgreSQL 咨询锁的键，保证多个进程同时启动时只有一个在执行迁移
+_ADVISORY_LOCK_KEY = 7_316_042
+
+_versions = models.SchemaVersion.__table__
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    # 返回 False 表示本次没有完成：不记录版本，下次迁移时重试
+    apply: Callable[[Engine], Optional[bool]]
+
+
+def _create_tables(engine: Engine) -> None:
+    models.Base.metadata.create_all(bind=engine)
+
+
+def _add_attachments_column(engine: Engine) -> None:
+    columns = {column["name"] for column in inspect(engine).get_columns("todos")}
+    if "attachments" in columns:
+        return
+    with engine.begin() as connection:
+        try:
+            connection.execute(text("ALTER TABLE todos ADD COLUMN attachments JSON"))
+            logger.info("Added 'attachments' column to todos table")
+        except Exception:
+            connection.execute(text("ALTER TABLE todos ADD COLUMN attachments TEXT"))
+            logger.info("Added 'attachments' column to todos table as TEXT")
+
+
+def _create_index(engine: Engine, index) -> None:
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as connection:
+            index.create(bind=connection, checkfirst=True)
+        return
+    # 普通 CREATE INDEX 会在建索引期间阻塞表上的写入；CONCURRENTLY 不阻塞，但不能在事务中执行。
+    # 中途失败会留下无效索引，IF NOT EXISTS 会跳过它，所以先删掉再重建
+    statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    statement = statement.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        invalid = connection.execute(text(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+        ), {"name": index.name}).first()
+        if invalid:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+        connection.execute(text(statement))
+
+
+def _drop_index(engine: Engine, name: str) -> None:
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    else:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _create_todo_indexes(engine: Engine) -> None:
+    # create_all 不会给已存在的表补建索引，这里按名字补齐缺失的索引
+    table = models.Todo.__table__
+    inspector = inspect(engine)
+    existing = {index["name"] for index in inspector.get_indexes(table.name)}
+    columns = {column["name"] for column in inspector.get_columns(table.name)}
+    for index in table.indexes:
+        # 依赖后续迁移才添加的列的索引，由那个迁移负责创建
+        if index.name in existing or not {column.name for column in index.columns} <= columns:
+            continue
+        _create_index(engine, index)
+        logger.info("Created index '%s' on %s table", index.name, table.name)
+
+
+def _replace_list_indexes(engine: Engine) -> None:
+    # (user_id, created_at, id) 与 (user_id, due_date) 合并为一个覆盖逾期筛选的列表索引：
+    # 两者同时存在时 SQLite 总是选 due_date 索引再临时排序
+    _create_todo_indexes(engine)
+    existing = {index["name"] for index in inspect(engine).get_indexes("todos")}
+    for name in ("ix_todos_user_created", "ix_todos_user_due_date"):
+        if name in existing:
+            _drop_index(engine, name)
+            logger.info("Dropped index '%s' on todos table", name)
+
+
+def _create_search_index(engine: Engine) -> bool:
+    return search.ensure_search_index(engine)
+
+
+def _move_inline_attachments(engine: Engine) -> None:
+    migrated = attachments.migrate_inline_attachments(engine)
+    if migrated:
+        logger.info("Moved inline attachments of %s todos to the attachment store", migrated)
+
+
+def _add_column(engine: Engine, table: str, column: str, ddl: str) -> None:
+    columns = {existing["name"] for existing in inspect(engine).get_columns(table)}
+    if column in columns:
+        return
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    logger.info("Added '%s' column to %s table", column, table)
+
+
+def _add_version_columns(engine: Engine) -> None:
+    _add_column(engine, "todos", "version", "INTEGER NOT NULL DEFAULT 1")
+    _add_column(engine, "todo_counters", "version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_change_seq(engine: Engine) -> None:
+    # 已有的 todo 保持 change_seq = 0，首次同步（since 为空）时全部返回
+    _add_column(engine, "todos", "change_seq", "INTEGER NOT NULL DEFAULT 0")
+    models.TodoTombstone.__table__.create(bind=engine, checkfirst=True)
+    _create_todo_indexes(engine)
+
+
+# 只能在末尾追加新迁移；每个迁移都要可重复执行，兼容引入版本表之前已部分升级的数据库
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables", _create_tables),
+    Migration(2, "add todos.attachments column", _add_attachments_column),
+    Migration(3, "add todo list indexes", _create_todo_indexes),
+    Migration(4, "add full-text search index", _create_search_index),
+    Migration(5, "move inline attachments to the attachment store", _move_inline_attachments),
+    Migration(6, "add todo and per-user change versions", _add_version_columns),
+    Migration(7, "add change sequence and tombstones for delta sync", _add_change_seq),
+    Migration(8, "replace todo list and due date indexes with a covering index", _replace_list_indexes),
+]
+
+
+def _sqlite_lock_path(engine: Engine) -> Optional[str]:
+    database = make_url(str(engine.url)).database
+    if not database or database == ":memory:" or "mode=memory" in database:
+        return None
+    if database.startswith("file:"):
+        database = database[len("file:"):].split("?", 1)[0]
+    return f"{database}.migrate-lock"
+
+
+@contextmanager
+def _sqlite_migration_lock(engine: Engine):
+    # SQLite 没有咨询锁；迁移要用多个连接分别提交，BEGIN IMMEDIATE 会把自己也锁住，
+    # 所以在数据库文件旁边的锁文件上加排他锁
+    path = _sqlite_lock_path(engine)
+    if path is None or fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    if engine.dialect.name == "sqlite":
+        with _sqlite_migration_lock(engine):
+            yield
+        return
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            connection.commit()
+
+
+def applied_versions(engine: Engine) -> Set[int]:
+    if not inspect(engine).has_table(_versions.name):
+        return set()
+    with engine.connect() as connection:
+        return set(connection.execute(select(_versions.c.version)).scalars())
+
+
+def current_version(engine: Engine) -> int:
+    return max(applied_versions(engine), default=0)
+
+
+def pending_versions(engine: Engine) -> List[int]:
+    # 按集合判断而不是只比较最大版本：没有完成的迁移即使排在已记录的版本之前也会重试
+    done = applied_versions(engine)
+    return [migration.version for migration in MIGRATIONS if migration.version not in done]
+
+
+def migrate(engine: Engine) -> List[int]:
+    with _migration_lock(engine):
+        _versions.create(bind=engine, checkfirst=True)
+        done = applied_versions(engine)
+        version = max(done, default=0)
+        applied = []
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            logger.info("Applying migration %s: %s", migration.version, migration.description)
+            if migration.apply(engine) is False:
+                logger.warning(
+                    "Migration %s did not complete, will retry on next run: %s",
+                    migration.version, migration.description,
+                )
+                continue
+            with engine.begin() as connection:
+                connection.execute(
+                    _versions.insert().values(version=migration.version, description=migration.description)
+                )
+            applied.append(migration.version)
+    if not applied:
+        logger.debug("Database schema is up to date (version %s)", version)
+    return applied
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args not in ([], ["status"]):
+        print("Usage: python -m app.migrations [status]")
+        sys.exit(1)
+
+    from .database import engine
+    from .logs import setup_logging
+
+    setup_logging()
+    if args == ["status"]:
+        latest = MIGRATIONS[-1].version
+        logger.info("Schema version %s, latest %s", current_version(engine), latest)
+        pending = pending_versions(engine)
+        if pending:
+            logger.info("Pending migrations: %s", ", ".join(map(str, pending)))
+    else:
+        applied = migrate(engine)
+        logger.info("Applied %s migrations", len(applied))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -47,9 +47,73 @@ class Todo(Base):
     tags = Column(String(500), nullable=True)  # 存储为逗号分隔的字符串
     type = Column(Enum(ItemType), default=ItemType.TASK, nullable=False)
     content = Column(Text, nullable=True)  # 用于笔记和日记的正文内容
-    attachments = Column(JSON, nullable=True)  # 存储图片的 base64 列表
+    attachments = Column(JSON, nullable=True)  # 附件引用列表（sha256:<digest>），内容存放在附件存储中
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # 每次修改递增，作为单条 todo 的 ETag；ORM 更新时带上版本条件，并发修改会被检测到
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # 最近一次写入时用户的版本号（见 TodoCounter.version），增量同步按它定位改动
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
 
-    owner = relationship("User", back_populates="todos")
\ No newline at end of file
+    owner = relationship("User", back_populates="todos")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    # 列表、筛选和统计查询都以 user_id 开头，索引按这些查询的形状设计
+    __table_args__ = (
+        # 默认列表按 (created_at, id) 倒序；带上 due_date 和 status，逾期筛选在索引内判断，
+        # 仍按索引顺序取前几条，不需要临时排序
+        Index("ix_todos_user_created_due", "user_id", "created_at", "id", "due_date", "status"),
+        Index("ix_todos_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_todos_user_priority_created", "user_id", "priority", "created_at"),
+        Index("ix_todos_user_type_created", "user_id", "type", "created_at"),
+        Index("ix_todos_user_change_seq", "user_id", "change_seq", "id"),
+    )
+
+class TodoTombstone(Base):
+    __tablename__ = "todo_tombstones"
+
+    # 删除记录，增量同步时告知客户端哪些 todo 已被删除
+    id = Column(Integer, primary_key=True)
+    todo_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_todo_tombstones_user_change_seq", "user_id", "change_seq", "todo_id"),
+    )
+
+class AttachmentBlob(Base):
+    __tablename__ = "attachment_blobs"
+
+    digest = Column(String(64), primary_key=True)  # 内容的 sha256，也是磁盘上的文件名
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class TodoCounter(Base):
+    __tablename__ = "todo_counters"
+
+    # 每个用户一行，由写接口在同一事务内增量维护，统计接口直接读取
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    todo_count = Column(Integer, nullable=False, default=0)
+    doing_count = Column(Integer, nullable=False, default=0)
+    done_count = Column(Integer, nullable=False, default=0)
+    task_count = Column(Integer, nullable=False, default=0)
+    note_count = Column(Integer, nullable=False, default=0)
+    diary_count = Column(Integer, nullable=False, default=0)
+    # 用户的任意 todo 发生写操作都会递增，用作列表和统计的 ETag
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    # 每条已执行的迁移一行，见 migrations.py
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
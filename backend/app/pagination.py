@@ -0,0 +1,148 @@
+import base64
+import json
+import logging
+import math
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import String, tuple_, type_coerce
+from sqlalchemy.orm import Query, Session
+
+from . import cache, models, schemas, stats
+
+logger = logging.getLogger(__name__)
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def sort_key(db: Session):
+    # SQLite 中 created_at 以文本存储，且新旧数据的格式不一致（有无微秒），
+    # 游标必须按原始文本比较，才能与 ORDER BY 的顺序保持一致
+    if _is_sqlite(db):
+        return type_coerce(models.Todo.created_at, String)
+    return models.Todo.created_at
+
+
+def _encode(payload) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+
+
+def encode_cursor(key_value, todo_id: int) -> str:
+    if isinstance(key_value, datetime):
+        key_value = key_value.isoformat()
+    return _encode([key_value, todo_id])
+
+
+def decode_cursor(db: Session, cursor: str) -> Tuple[object, int]:
+    try:
+        key_value, todo_id = _decode(cursor)
+        if not isinstance(key_value, str) or not isinstance(todo_id, int):
+            raise ValueError("malformed cursor")
+        if not _is_sqlite(db):
+            key_value = datetime.fromisoformat(key_value)
+        return key_value, todo_id
+    except (ValueError, TypeError):
+        raise _invalid_cursor()
+
+
+# 按相关度排序的搜索结果无法做 keyset 定位，游标中记录偏移量
+def encode_offset_cursor(offset: int) -> str:
+    return _encode({"offset": offset})
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        offset = _decode(cursor)["offset"]
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("malformed cursor")
+        return offset
+    except (ValueError, TypeError, KeyError):
+        raise _invalid_cursor()
+
+
+# 增量同步游标：(change_seq, id)，空游标表示从头同步
+def encode_change_cursor(change_seq: int, todo_id: int) -> str:
+    return _encode([change_seq, todo_id])
+
+
+def decode_change_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    if not cursor:
+        return 0, 0
+    try:
+        change_seq, todo_id = _decode(cursor)
+        if not isinstance(change_seq, int) or not isinstance(todo_id, int):
+            raise ValueError("malformed cursor")
+        return change_seq, todo_id
+    except (ValueError, TypeError):
+        raise _invalid_cursor()
+
+
+def apply_cursor(query: Query, db: Session, cursor: str) -> Query:
+    key_value, todo_id = decode_cursor(db, cursor)
+    return query.filter(tuple_(sort_key(db), models.Todo.id) < tuple_(key_value, todo_id))
+
+
+def count_items(
+    db: Session,
+    query: Query,
+    user_id: int,
+    filters_key: tuple,
+    strategy: schemas.CountStrategy,
+) -> Optional[int]:
+    if strategy == schemas.CountStrategy.NONE:
+        return None
+    if strategy == schemas.CountStrategy.EXACT:
+        return query.count()
+    if strategy == schemas.CountStrategy.ESTIMATED and not _is_sqlite(db):
+        estimate = _estimate_count(db, query)
+        if estimate is not None:
+            return estimate
+    # SQLite 没有可用的行数估算，估算模式退化为缓存的精确计数
+    return _cached_count(query, user_id, filters_key)
+
+
+def _cached_count(query: Query, user_id: int, filters_key: tuple) -> int:
+    key = cache.cache_key(user_id, "count", stats.user_version(query.session, user_id), filters_key)
+    total = cache.count_cache.get(key)
+    if total is None:
+        total = query.count()
+        cache.count_cache.set(key, total)
+    return total
+
+
+def _estimate_count(db: Session, query: Query) -> Optional[int]:
+    try:
+        # JSON、自定义类型等参数没有字面量渲染，编译失败同样回退到精确计数
+        compiled = query.statement.compile(
+            dialect=db.get_bind().dialect,
+            compile_kwargs={"literal_binds": True}
+        )
+        plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}").scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning("Row estimate failed, falling back to cached count: %s", e)
+        return None
+
+
+def total_pages(total: Optional[int], limit: int) -> Optional[int]:
+    if total is None:
+        return None
+    return math.ceil(total / limit) if total > 0 else 1
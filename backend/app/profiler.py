@@ -0,0 +1,208 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import ExecuteStyle
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# 开发/排查用的 SQL 分析模式，默认关闭；关闭时不注册任何事件监听，没有额外开销
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# 超过该毫秒数的语句连同执行计划记入慢查询日志
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+# 同一形状的语句在一个请求中执行达到该次数时视为 N+1
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+SQL_PROFILE_SERVER_TIMING = os.getenv("SQL_PROFILE_SERVER_TIMING", "true").lower() == "true"
+# /health/sql 保留最近多少个请求的分析结果
+SQL_PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "50"))
+
+_EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+_EXPLAINABLE = ("select", "update", "delete", "with")
+
+# 语句形状：参数列表和字面量归一化，IN (?, ?, ?) 不论长短都算同一形状
+_PLACEHOLDER_LIST = re.compile(r"(\?|\$\d+|%\(\w+\)s)(\s*,\s*(\?|\$\d+|%\(\w+\)s))+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _LITERAL.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?, ...", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.started = time.perf_counter()
+        # (语句, 耗时, 是否为 executemany/批量 INSERT 的一批)
+        self.statements: List[Tuple[str, float, bool]] = []
+
+    @property
+    def path(self) -> str:
+        # 路由匹配之后用路由模板，同一接口的不同 id 归为一类
+        route = self.scope.get("route")
+        return getattr(route, "path", self.scope["path"])
+
+    @property
+    def db_seconds(self) -> float:
+        return sum(duration for _, duration, _ in self.statements)
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        # 批量 INSERT 会被拆成多批同样的语句执行，不算 N+1
+        shapes = Counter(statement_shape(statement) for statement, _, batched in self.statements if not batched)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= SQL_REPEAT_THRESHOLD]
+
+    def server_timing(self) -> str:
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        metrics = [
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{len(self.statements)} queries"',
+            f"app;dur={elapsed_ms:.2f}",
+        ]
+        repeated = self.repeated()
+        if repeated:
+            metrics.append(f'db-repeat;desc="{repeated[0][1]}x same statement"')
+        return ", ".join(metrics)
+
+    def summary(self, status_code: int) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "route": self.path,
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "queries": len(self.statements),
+            "repeated": [{"statement": shape, "count": count} for shape, count in self.repeated()],
+            "statements": [
+                {"statement": statement, "duration_ms": round(duration * 1000, 3), "batched": batched}
+                for statement, duration, batched in self.statements
+            ],
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("sql_profile", default=None)
+_recent: "deque[Dict[str, Any]]" = deque(maxlen=SQL_PROFILE_HISTORY)
+_recent_lock = threading.Lock()
+
+
+class ProfilerMiddleware:
+    # 记录请求内执行的每条语句；响应头中加 Server-Timing，结束后检查 N+1 并留存到 /health/sql
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+        token = _current.set(profile)
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SQL_PROFILE_SERVER_TIMING:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", profile.server_timing())
+                    # 跨域的前端也能在开发者工具里看到 Server-Timing
+                    headers["Timing-Allow-Origin"] = "*"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _finish(profile, status_code)
+
+
+def _finish(profile: RequestProfile, status_code: int) -> None:
+    summary = profile.summary(status_code)
+    with _recent_lock:
+        _recent.append(summary)
+    for shape, count in profile.repeated():
+        logger.warning(
+            "Possible N+1: statement executed %d times in %s %s: %s",
+            count, profile.method, profile.path, shape,
+            extra={"route": profile.path, "repeat": count},
+        )
+    if logger.isEnabledFor(logging.DEBUG):
+        lines = "\n".join(
+            f"  {item['duration_ms']:8.3f} ms  {_WHITESPACE.sub(' ', item['statement'])}"
+            for item in summary["statements"]
+        )
+        logger.debug(
+            "%s %s ran %d statements in %.2f ms\n%s",
+            profile.method, profile.path, summary["queries"], summary["db_ms"], lines,
+        )
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[List[str]]:
+    prefix = _EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip()[:6].lower().startswith(_EXPLAINABLE):
+        return None
+    # 用同一连接上的新游标执行，不触发引擎事件，也不影响原游标的结果集
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [str(row[-1]) for row in rows]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context.profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    duration = time.perf_counter() - context.profile_started
+    profile = _current.get()
+    if profile is not None:
+        batched = executemany or context.execute_style is not ExecuteStyle.EXECUTE
+        profile.statements.append((statement, duration, batched))
+    if duration * 1000 < SQL_SLOW_QUERY_MS:
+        return
+    plan = None
+    if not executemany:
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as exc:
+            plan = [f"EXPLAIN failed: {exc}"]
+    logger.warning(
+        "Slow query (%.1f ms) in %s: %s%s",
+        duration * 1000,
+        f"{profile.method} {profile.path}" if profile is not None else "background task",
+        _WHITESPACE.sub(" ", statement).strip(),
+        "\n  plan: " + "\n        ".join(plan) if plan else "",
+        extra={"duration_ms": round(duration * 1000, 2)},
+    )
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not SQL_PROFILE:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def stats() -> Dict[str, Any]:
+    with _recent_lock:
+        recent = list(_recent)
+    return {
+        "enabled": SQL_PROFILE,
+        "slow_query_ms": SQL_SLOW_QUERY_MS,
+        "repeat_threshold": SQL_REPEAT_THRESHOLD,
+        "recent": recent[::-1],
+    }
@@ -0,0 +1,69 @@
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+
+from . import attachments, models, schemas, serialization
+
+PREVIEW_LENGTH = 100
+
+FULL_FIELDS = (
+    "title", "description", "status", "priority", "due_date", "tags",
+    "type", "content", "attachments", "id", "user_id", "created_at", "updated_at",
+)
+# 列表默认只返回渲染列表需要的字段，正文和附件用 preview 代替
+SUMMARY_FIELDS = (
+    "title", "status", "priority", "due_date", "tags", "type",
+    "id", "user_id", "created_at", "updated_at", "preview",
+)
+ALLOWED_FIELDS = set(FULL_FIELDS) | {"preview"}
+# 响应中的字段顺序与 schemas.TodoListItem 的声明顺序一致
+ITEM_FIELDS = tuple(schemas.TodoListItem.model_fields)
+DATETIME_FIELDS = {"due_date", "created_at", "updated_at"}
+ENUM_FIELDS = {"status", "priority", "type"}
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if fields is None or fields == "summary":
+        return SUMMARY_FIELDS
+    if fields == "full":
+        return FULL_FIELDS
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in ALLOWED_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    if "id" not in selected:
+        selected.insert(0, "id")
+    return tuple(dict.fromkeys(selected))
+
+
+def preview_column():
+    body = func.coalesce(func.nullif(models.Todo.content, ""), models.Todo.description)
+    return func.substr(body, 1, PREVIEW_LENGTH).label("preview")
+
+
+def columns(selected: Tuple[str, ...]) -> list:
+    # 直接查询列而不是 ORM 实体：未选中的列不会出现在 SELECT 中，也不会构造 Todo 对象
+    selected_columns = [getattr(models.Todo, field) for field in selected if field in FULL_FIELDS]
+    if "preview" in selected:
+        selected_columns.append(preview_column())
+    return selected_columns
+
+
+def _value(field: str, value):
+    if field in DATETIME_FIELDS:
+        return serialization.datetime_value(value)
+    if field in ENUM_FIELDS:
+        return serialization.enum_value(value)
+    if field == "attachments":
+        return attachments.resolve(value)
+    return value
+
+
+def to_dict(row, selected: Tuple[str, ...]) -> dict:
+    # 输出与 TodoListItem（exclude_unset）序列化后的 JSON 完全一致：按模型字段顺序，只含选中字段
+    return {field: _value(field, getattr(row, field)) for field in ITEM_FIELDS if field in selected}
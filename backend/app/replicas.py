@@ -0,0 +1,314 @@
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import auth, cache, metrics, models, schemas
+from .database import DATABASE_READ_URLS, AsyncSessionLocal, SessionLocal, async_read_engines, read_engines
+
+logger = logging.getLogger(__name__)
+
+# 用户写入后的这段时间内，读请求仍走主库，保证读到自己刚写入的数据；应大于副本的复制延迟
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# 副本连接或查询失败后，这段时间内不再使用，读请求回退到主库
+REPLICA_COOLDOWN_SECONDS = float(os.getenv("REPLICA_COOLDOWN_SECONDS", "30"))
+# 写操作响应设置的 cookie，记录写入时间；任何一个进程收到后续读请求都能据此留在主库
+STICKY_COOKIE = "todo_last_write"
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class Replica:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.unhealthy_until = 0.0
+        self.reads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def available(self, now: float) -> bool:
+        return self.unhealthy_until <= now
+
+    def record_read(self) -> None:
+        with self._lock:
+            self.reads += 1
+
+    def mark_failed(self, exc: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(exc).splitlines()[0][:200]
+            self.unhealthy_until = time.monotonic() + REPLICA_COOLDOWN_SECONDS
+        logger.warning(
+            "Read replica %s failed, using the primary for %.0f s: %s",
+            self.name, REPLICA_COOLDOWN_SECONDS, self.last_error,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "healthy": self.available(time.monotonic()),
+                "reads": self.reads,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+class ReadRouter:
+    # 在健康的副本之间轮询；用户刚写入过、或没有可用副本时返回 None，由调用方使用主库
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.primary_reads = {"sticky": 0, "unhealthy": 0}
+
+    def record_fallback(self, reason: str) -> None:
+        with self._lock:
+            self.primary_reads[reason] += 1
+
+    def pick(self, token_data: schemas.TokenData, last_write_cookie: Optional[str] = None) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        if _wrote_recently(token_data, last_write_cookie):
+            self.record_fallback("sticky")
+            return None
+        now = time.monotonic()
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.available(now):
+                return replica
+        self.record_fallback("unhealthy")
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            primary_reads = dict(self.primary_reads)
+        return {
+            "sticky_seconds": REPLICA_STICKY_SECONDS,
+            "cooldown_seconds": REPLICA_COOLDOWN_SECONDS,
+            "primary_reads": primary_reads,
+            "replicas": {replica.name: replica.stats() for replica in self.replicas},
+        }
+
+
+def _cookie_is_fresh(value: Optional[str]) -> bool:
+    try:
+        written_at = float(value)
+    except (TypeError, ValueError):
+        return False
+    return 0 <= time.time() - written_at < REPLICA_STICKY_SECONDS
+
+
+def _wrote_recently(token_data: schemas.TokenData, last_write_cookie: Optional[str] = None) -> bool:
+    # cookie 由处理写请求的进程设置，跨进程有效；本进程的记录用于不带 cookie 的客户端
+    if _cookie_is_fresh(last_write_cookie):
+        return True
+    user_id = token_data.user_id
+    if user_id is None:
+        # 旧令牌不带 uid，从用户缓存取；取不到时无法判断，保守地走主库
+        cached = auth.cached_user(token_data)
+        if cached is None:
+            return True
+        user_id = cached.id
+    last_write = cache.last_write(user_id)
+    return last_write is not None and time.monotonic() - last_write < REPLICA_STICKY_SECONDS
+
+
+class StickyWriteMiddleware:
+    # 成功的写请求在响应上设置短期 cookie；同一客户端随后的读请求不论落到哪个进程都走主库
+    def __init__(self, app: ASGIApp, sticky_seconds: float = REPLICA_STICKY_SECONDS):
+        self.app = app
+        self.max_age = math.ceil(sticky_seconds)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        # https 下前端可能跨站调用，需要 SameSite=None 才会随请求带上
+        secure = scope.get("scheme") == "https"
+        authorized = "authorization" in Headers(scope=scope)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and authorized and message["status"] < 400:
+                attributes = f"Max-Age={self.max_age}; Path=/; HttpOnly"
+                attributes += "; SameSite=None; Secure" if secure else "; SameSite=Lax"
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie", f"{STICKY_COOKIE}={time.time():.3f}; {attributes}"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def enabled() -> bool:
+    return bool(read_router.replicas or async_read_router.replicas)
+
+
+read_router = ReadRouter([Replica(f"replica{index}", engine) for index, engine in enumerate(read_engines, 1)])
+async_read_router = ReadRouter([
+    Replica(f"replica{index}", engine) for index, engine in enumerate(async_read_engines, 1)
+])
+
+
+def get_read_db(request: Request, token_data: schemas.TokenData = Depends(auth.verify_token)):
+    # 只读路由使用的会话：优先副本，连接失败时当场回退到主库，请求本身不受影响
+    replica = read_router.pick(token_data, request.cookies.get(STICKY_COOKIE))
+    db = None
+    if replica is not None:
+        db = SessionLocal(bind=replica.engine)
+        try:
+            db.connection()
+        except DBAPIError as exc:
+            db.close()
+            db = None
+            replica.mark_failed(exc)
+            read_router.record_fallback("unhealthy")
+            replica = None
+    if db is None:
+        db = SessionLocal()
+    else:
+        db.info["replica"] = replica.name
+        replica.record_read()
+    try:
+        yield db
+    except DBAPIError as exc:
+        # 查询过程中出错：本次请求仍然失败，之后的请求在冷却期内改走主库
+        if replica is not None:
+            replica.mark_failed(exc)
+        raise
+    finally:
+        db.close()
+
+
+def get_read_user(
+    token_data: schemas.TokenData = Depends(auth.verify_token),
+    db: Session = Depends(get_read_db),
+) -> models.User:
+    try:
+        return auth.get_current_user(token_data, db)
+    except HTTPException:
+        if "replica" not in db.info:
+            raise
+    # 刚注册的用户可能还没有复制到副本，回主库确认
+    with SessionLocal() as primary:
+        return auth.get_current_user(token_data, primary)
+
+
+async def get_async_read_db(request: Request, token_data: schemas.TokenData = Depends(auth.verify_token)):
+    replica = async_read_router.pick(token_data, request.cookies.get(STICKY_COOKIE))
+    db = None
+    if replica is not None:
+        db = AsyncSessionLocal(bind=replica.engine)
+        try:
+            await db.connection()
+        except DBAPIError as exc:
+            await db.close()
+            db = None
+            replica.mark_failed(exc)
+            async_read_router.record_fallback("unhealthy")
+            replica = None
+    if db is None:
+        db = AsyncSessionLocal()
+    else:
+        db.info["replica"] = replica.name
+        replica.record_read()
+    try:
+        yield db
+    except DBAPIError as exc:
+        if replica is not None:
+            replica.mark_failed(exc)
+        raise
+    finally:
+        await db.close()
+
+
+async def get_async_read_user(
+    token_data: schemas.TokenData = Depends(auth.verify_token),
+    db=Depends(get_async_read_db),
+) -> models.User:
+    try:
+        return await auth.get_current_user_async(token_data, db)
+    except HTTPException:
+        if "replica" not in db.info:
+            raise
+    async with AsyncSessionLocal() as primary:
+        return await auth.get_current_user_async(token_data, primary)
+
+
+def stats() -> Dict[str, Any]:
+    router = async_read_router if async_read_router.replicas else read_router
+    return router.stats()
+
+
+@metrics.collector
+def _replica_metrics() -> Iterable[str]:
+    router = async_read_router if async_read_router.replicas else read_router
+    if not router.replicas:
+        return
+    now = time.monotonic()
+    yield from metrics.sample_lines(
+        "db_replica_up", "gauge", "Whether a read replica is currently used.",
+        [({"replica": replica.name}, int(replica.available(now))) for replica in router.replicas],
+    )
+    yield from metrics.sample_lines(
+        "db_replica_reads_total", "counter", "Read requests served by a replica.",
+        [({"replica": replica.name}, replica.reads) for replica in router.replicas],
+    )
+    yield from metrics.sample_lines(
+        "db_replica_fallback_reads_total", "counter", "Read requests sent to the primary although replicas exist.",
+        [({"reason": reason}, count) for reason, count in router.stats()["primary_reads"].items()],
+    )
+
+
+def copy_sqlite(primary_url: str, replica_urls: List[str]) -> None:
+    # 本地开发用的“复制”：用 SQLite 在线备份把主库整体拷贝到各个副本文件
+    source = sqlite3.connect(make_url(primary_url).database)
+    try:
+        for url in replica_urls:
+            path = make_url(url).database
+            if path.startswith("file:"):
+                path = path[len("file:"):]
+            target = sqlite3.connect(path)
+            try:
+                source.backup(target)
+                # 副本以只读方式打开，不能创建 WAL 所需的 -shm 文件
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "sync-sqlite" or len(args) not in (1, 3) or (len(args) == 3 and args[1] != "--interval"):
+        print("Usage: python -m app.replicas sync-sqlite [--interval SECONDS]")
+        sys.exit(1)
+
+    from .database import SQLALCHEMY_DATABASE_URL
+    from .logs import setup_logging
+
+    setup_logging()
+    if not SQLALCHEMY_DATABASE_URL.startswith("sqlite") or not DATABASE_READ_URLS:
+        logger.error("sync-sqlite needs a SQLite DATABASE_URL and at least one DATABASE_READ_URL")
+        sys.exit(1)
+    interval = float(args[2]) if len(args) == 3 else 0
+    while True:
+        copy_sqlite(SQLALCHEMY_DATABASE_URL, DATABASE_READ_URLS)
+        logger.info("Copied primary database to %d replicas", len(DATABASE_READ_URLS))
+        if interval <= 0:
+            break
+        time.sleep(interval)
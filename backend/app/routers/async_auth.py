@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, auth, replicas
+from ..database import get_async_db
+from ..hashing import hash_pool
+from . import auth as sync_auth
+
+# 异步模式下的认证路由：数据库访问走异步会话，密码哈希交给专用的哈希线程池
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+@router.post("/register", response_model=schemas.User)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    await db.run_sync(sync_auth.check_registration, user)
+    hashed_password = await hash_pool.run(auth.get_password_hash, user.password)
+    return await db.run_sync(sync_auth.create_user, user, hashed_password)
+
+@router.post("/login", response_model=schemas.Token)
+async def login_for_access_token(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await db.run_sync(auth.find_login_user, user_credentials.username)
+    if not user or not await hash_pool.run(auth.check_login_password, user, user_credentials.password):
+        raise sync_auth.login_failed()
+    return sync_auth.issue_token(user)
+
+@router.get("/me", response_model=schemas.User)
+async def read_users_me(current_user: models.User = Depends(replicas.get_async_read_user)):
+    return current_user
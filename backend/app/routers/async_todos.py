@@ -0,0 +1,192 @@
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Iterable, List, Optional
+from .. import models, schemas, auth, attachments, cache, etags, exports, imports, projections, replicas, serialization
+from ..database import get_async_db
+from . import todos
+
+# 异步模式下的 todo 路由：与同步路由共用同一套处理逻辑，
+# 通过 AsyncSession.run_sync 在异步连接上执行，等待数据库时让出事件循环。
+# run_sync 里的代码跑在事件循环线程上，附件文件读写和响应序列化放到线程池
+router = APIRouter(prefix="/todos", tags=["todos"])
+
+async def _prepare_attachments(db: AsyncSession, values: Iterable[str]) -> None:
+    # 提前在线程池中写好附件文件，run_sync 中的 attachments.store 只需加引用
+    values = list(values)
+    if values:
+        prepared = await run_in_threadpool(attachments.prepare, values)
+        db.info.setdefault("prepared_attachments", {}).update(prepared)
+
+async def _respond(model: Any, value: Any, response: Optional[Response] = None) -> Response:
+    # 校验、还原附件（读文件）和 JSON 编码在线程池中完成，不交给 FastAPI 在事件循环上序列化
+    if isinstance(value, Response):
+        return value
+    result = serialization.json_response(await run_in_threadpool(serialization.model_body, model, value))
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
+
+def _item_attachments(items: List[schemas.TodoCreate]) -> List[str]:
+    return [value for item in items for value in item.attachments or []]
+
+@router.post("/", response_model=schemas.Todo)
+async def create_todo(
+    todo: schemas.TodoCreate,
+    response: Response,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _prepare_attachments(db, todo.attachments or [])
+    created = await db.run_sync(
+        lambda session: todos.create_todo(todo=todo, response=response, current_user=current_user, db=session)
+    )
+    return await _respond(schemas.Todo, created, response)
+
+@router.get("/", response_model=schemas.TodoListResponse, response_model_exclude_unset=True)
+async def read_todos(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.EXACT,
+    status: Optional[schemas.TaskStatus] = None,
+    priority: Optional[schemas.Priority] = None,
+    search: Optional[str] = None,
+    overdue_only: bool = False,
+    type: Optional[schemas.ItemType] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(replicas.get_async_read_user),
+    db: AsyncSession = Depends(replicas.get_async_read_db)
+):
+    # 与 todos.read_todos 相同的流程，查询在 run_sync 中执行，编码放到线程池
+    selected = projections.parse_fields(fields)
+    filters = schemas.TodoFilter(
+        status=status, priority=priority, type=type, search=search, overdue_only=overdue_only
+    )
+    etag, key, body = await db.run_sync(
+        todos.list_lookup, current_user.id, selected, skip, limit, cursor, count, filters
+    )
+    if etags.none_match(if_none_match, etag):
+        return etags.not_modified(etag)
+    if body is None:
+        page = await db.run_sync(todos.list_page, current_user.id, selected, skip, limit, cursor, count, filters)
+        body = await run_in_threadpool(todos.encode_list, page)
+        cache.response_cache.set(key, body)
+    return todos.list_response(body, etag)
+
+@router.get("/stats", response_model=schemas.TodoStats)
+async def get_todo_stats(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(replicas.get_async_read_user),
+    db: AsyncSession = Depends(replicas.get_async_read_db)
+):
+    return await db.run_sync(lambda session: todos.get_todo_stats(
+        response=response, if_none_match=if_none_match, current_user=current_user, db=session
+    ))
+
+@router.get("/export")
+async def export_todos(
+    format: schemas.ExportFormat = schemas.ExportFormat.NDJSON,
+    include_attachments: bool = False,
+    current_user: models.User = Depends(replicas.get_async_read_user),
+    db: AsyncSession = Depends(replicas.get_async_read_db)
+):
+    return exports.response(exports.stream_async(db, current_user.id, format, include_attachments), format)
+
+@router.post("/import", response_model=schemas.TodoImportResponse)
+async def import_todos(
+    request: Request,
+    format: Optional[schemas.ImportFormat] = None,
+    chunk_size: int = Query(imports.IMPORT_CHUNK_SIZE, ge=1, le=imports.MAX_IMPORT_CHUNK_SIZE),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    fmt = format or imports.detect_format(request.headers.get("content-type"))
+    async def insert_chunk(items: List[schemas.TodoCreate]) -> int:
+        await _prepare_attachments(db, _item_attachments(items))
+        return await db.run_sync(imports.insert_items, current_user.id, items)
+
+    return await imports.run_import(request.stream(), fmt, chunk_size, insert_chunk)
+
+@router.get("/changes", response_model=schemas.TodoChangesResponse)
+async def read_todo_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    page = await db.run_sync(todos.changes_page, current_user.id, since, limit)
+    return await _respond(schemas.TodoChangesResponse, page)
+
+@router.post("/batch", response_model=schemas.TodoBatchResponse)
+async def create_todos_batch(
+    batch: schemas.TodoBatchCreate,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _prepare_attachments(db, _item_attachments(batch.items))
+    return await db.run_sync(
+        lambda session: todos.create_todos_batch(batch=batch, current_user=current_user, db=session)
+    )
+
+@router.patch("/batch", response_model=schemas.TodoBatchResponse)
+async def update_todos_batch(
+    batch: schemas.TodoBatchUpdate,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(
+        lambda session: todos.update_todos_batch(batch=batch, current_user=current_user, db=session)
+    )
+
+@router.delete("/batch", response_model=schemas.TodoBatchResponse)
+async def delete_todos_batch(
+    batch: schemas.TodoBatchDelete,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(
+        lambda session: todos.delete_todos_batch(batch=batch, current_user=current_user, db=session)
+    )
+
+@router.get("/{todo_id}", response_model=schemas.Todo)
+async def read_todo(
+    todo_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(replicas.get_async_read_user),
+    db: AsyncSession = Depends(replicas.get_async_read_db)
+):
+    todo = await db.run_sync(lambda session: todos.read_todo(
+        todo_id=todo_id, response=response, if_none_match=if_none_match,
+        current_user=current_user, db=session
+    ))
+    return await _respond(schemas.Todo, todo, response)
+
+@router.put("/{todo_id}", response_model=schemas.Todo)
+async def update_todo(
+    todo_id: int,
+    todo_update: schemas.TodoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _prepare_attachments(db, todo_update.attachments or [])
+    todo = await db.run_sync(lambda session: todos.update_todo(
+        todo_id=todo_id, todo_update=todo_update, response=response, if_match=if_match,
+        current_user=current_user, db=session
+    ))
+    return await _respond(schemas.Todo, todo, response)
+
+@router.delete("/{todo_id}")
+async def delete_todo(
+    todo_id: int,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(
+        lambda session: todos.delete_todo(todo_id=todo_id, current_user=current_user, db=session)
+    )
@@ -1,22 +1,22 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from .. import models, schemas, auth
+from .. import models, schemas, auth, replicas
+from ..hashing import hash_pool
 from ..database import get_db
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+logger = logging.getLogger(__name__)
 
-@router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    print(f"=== REGISTRATION ATTEMPT ===")
-    print(f"Username: '{user.username}'")
-    print(f"Email: '{user.email}'")
-    print(f"Password length: {len(user.password)}")
+router = APIRouter(prefix="/auth", tags=["auth"])
 
+def check_registration(db: Session, user: schemas.UserCreate) -> None:
     # 检查用户名是否已存在
     existing_username = db.query(models.User).filter(models.User.username == user.username).first()
     if existing_username:
-        print(f"[ERROR] Username '{user.username}' already exists")
+        logger.info("Registration rejected: username '%s' already exists", user.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
@@ -25,16 +25,14 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # 检查邮箱是否已存在
     existing_email = db.query(models.User).filter(models.User.email == user.email).first()
     if existing_email:
-        print(f"[ERROR] Email '{user.email}' already exists")
+        logger.info("Registration rejected: email already registered")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str) -> models.User:
     try:
-        hashed_password = auth.get_password_hash(user.password)
-        print(f"[OK] Password hashed successfully")
-
         db_user = models.User(
             username=user.username,
             email=user.email,
@@ -44,39 +42,47 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(db_user)
 
-        print(f"[OK] User '{user.username}' registered successfully with ID: {db_user.id}")
+        logger.info("User '%s' registered with ID %s", db_user.username, db_user.id)
         return db_user
 
     except Exception as e:
-        print(f"[ERROR] Registration error: {e}")
+        logger.exception("Registration failed for username '%s'", user.username)
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
         )
 
-@router.post("/login", response_model=schemas.Token)
-def login_for_access_token(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
-    print(f"Login attempt for username: {user_credentials.username}")
-    user = auth.authenticate_user(db, user_credentials.username, user_credentials.password)
-    if not user:
-        print(f"Authentication failed for user: {user_credentials.username}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    print(f"Authentication successful, creating token for: {user.username}")
+def issue_token(user: models.User) -> dict:
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id, "stamp": auth.credential_stamp(user)}, expires_delta=access_token_expires
     )
-    print(f"Token created: {access_token[:50]}...")
     return {"access_token": access_token, "token_type": "bearer"}
 
+def login_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect username or password",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+# 注册和登录是 async 路由：数据库访问放到请求线程池，密码哈希交给专用的哈希线程池，
+# 等待哈希时不占用请求线程
+@router.post("/register", response_model=schemas.User)
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    logger.debug("Registration attempt for username '%s'", user.username)
+    await run_in_threadpool(check_registration, db, user)
+    hashed_password = await hash_pool.run(auth.get_password_hash, user.password)
+    return await run_in_threadpool(create_user, db, user, hashed_password)
+
+@router.post("/login", response_model=schemas.Token)
+async def login_for_access_token(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(auth.find_login_user, db, user_credentials.username)
+    if not user or not await hash_pool.run(auth.check_login_password, user, user_credentials.password):
+        raise login_failed()
+    return issue_token(user)
+
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
-    print(f"=== /auth/me ENDPOINT CALLED ===")
-    print(f"Current user: {current_user.username} (ID: {current_user.id})")
-    print(f"=== RETURNING USER DATA ===")
+def read_users_me(current_user: models.User = Depends(replicas.get_read_user)):
     return current_user
\ No newline at end of file
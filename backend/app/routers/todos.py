@@ -1,125 +1,464 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, delete, insert, select, tuple_, update
 from typing import Optional, List
+from collections import defaultdict
 from datetime import datetime
-from .. import models, schemas, auth
+from .. import models, schemas, auth, attachments, cache, etags, exports, imports, pagination, projections, replicas, search as fulltext, serialization, stats
 from ..database import get_db
-import math
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
+# 批量写入时 IN 列表按块拆分，避免超出数据库的参数个数限制
+BATCH_CHUNK_SIZE = 500
+
+def apply_filters(query, db: Session, filters: schemas.TodoFilter):
+    # 返回 (query, 相关度排序表达式, 数据库端摘要列)，后两者仅在全文搜索时存在
+    if filters.status:
+        query = query.filter(models.Todo.status == filters.status)
+
+    if filters.priority:
+        query = query.filter(models.Todo.priority == filters.priority)
+
+    if filters.type:
+        query = query.filter(models.Todo.type == filters.type)
+
+    rank = snippet = None
+    if filters.search:
+        query, rank, snippet = fulltext.apply_search(db, query, filters.search)
+
+    if filters.overdue_only:
+        query = query.filter(
+            and_(
+                models.Todo.due_date < datetime.utcnow(),
+                models.Todo.status != schemas.TaskStatus.DONE
+            )
+        )
+    return query, rank, snippet
+
+def _user_version(db: Session, user_id: int) -> int:
+    # 版本号每次都从当前会话的库读取（按主键查一行），不在进程内缓存：其他 worker 的写入
+    # 同样会让它递增；副本上读到的版本号也与随后从副本读出的内容一致
+    return stats.user_version(db, user_id)
+
+def _flush_or_conflict(db: Session, if_match: Optional[str]) -> None:
+    # 读取与写入之间若被其他请求修改，版本条件不满足，ORM 抛出 StaleDataError
+    try:
+        db.flush()
+    except StaleDataError:
+        db.rollback()
+        if if_match is not None:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Todo has been modified")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Todo was modified concurrently, please retry")
+
+def _chunks(values: list):
+    for start in range(0, len(values), BATCH_CHUNK_SIZE):
+        yield values[start:start + BATCH_CHUNK_SIZE]
+
+def _select_batch_targets(db: Session, user_id: int, selection: schemas.TodoBatchSelection, *columns):
+    if (selection.ids is None) == (selection.filter is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either ids or filter"
+        )
+    query = db.query(models.Todo.id, *columns).filter(models.Todo.user_id == user_id)
+    if selection.ids is not None:
+        query = query.filter(models.Todo.id.in_(selection.ids))
+    else:
+        query, _, _ = apply_filters(query, db, selection.filter)
+    # 锁定目标行，计数器增量与实际改动的行保持一致
+    return query.order_by(models.Todo.id).with_for_update(of=models.Todo).all()
+
+def _batch_results(selection: schemas.TodoBatchSelection, found_ids: List[int], result: str):
+    if selection.ids is None:
+        return [schemas.TodoBatchResult(id=todo_id, result=result) for todo_id in found_ids]
+    found = set(found_ids)
+    return [
+        schemas.TodoBatchResult(id=todo_id, result=result if todo_id in found else "not_found")
+        for todo_id in dict.fromkeys(selection.ids)
+    ]
+
 @router.post("/", response_model=schemas.Todo)
 def create_todo(
     todo: schemas.TodoCreate,
+    response: Response,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_todo = models.Todo(**todo.dict(), user_id=current_user.id)
+    todo_data = todo.dict()
+    todo_data["attachments"] = attachments.store(db, todo_data["attachments"])
+    change_seq = stats.record_create(db, current_user.id, todo.status, todo.type)
+    db_todo = models.Todo(**todo_data, user_id=current_user.id, change_seq=change_seq)
     db.add(db_todo)
     db.commit()
     db.refresh(db_todo)
+    cache.record_write(current_user.id)
+    etags.set_headers(response, etags.item_etag(db_todo))
     return db_todo
 
-@router.get("/", response_model=schemas.TodoListResponse)
+@router.get("/", response_model=schemas.TodoListResponse, response_model_exclude_unset=True)
 def read_todos(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.EXACT,
     status: Optional[schemas.TaskStatus] = None,
     priority: Optional[schemas.Priority] = None,
     search: Optional[str] = None,
     overdue_only: bool = False,
     type: Optional[schemas.ItemType] = None,
+    fields: Optional[str] = None,  # summary（默认）、full，或逗号分隔的字段名
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(replicas.get_read_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    selected = projections.parse_fields(fields)
+    filters = schemas.TodoFilter(
+        status=status, priority=priority, type=type, search=search, overdue_only=overdue_only
+    )
+    etag, key, body = list_lookup(db, current_user.id, selected, skip, limit, cursor, count, filters)
+    if etags.none_match(if_none_match, etag):
+        return etags.not_modified(etag)
+    if body is None:
+        body = encode_list(list_page(db, current_user.id, selected, skip, limit, cursor, count, filters))
+        cache.response_cache.set(key, body)
+    return list_response(body, etag)
+
+def list_lookup(
+    db: Session,
+    user_id: int,
+    selected: tuple,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    count: schemas.CountStrategy,
+    filters: schemas.TodoFilter,
+) -> tuple:
+    # 返回 (ETag, 缓存键, 缓存中编码好的响应体或 None)
+    params = cache.normalize_params({
+        "skip": skip, "limit": limit, "cursor": cursor, "count": count, "status": filters.status,
+        "priority": filters.priority, "search": filters.search, "overdue_only": filters.overdue_only,
+        "type": filters.type, "fields": selected,
+    })
+    version = _user_version(db, user_id)
+    etag = etags.make_etag(
+        "list", user_id, version, params, etags.overdue_window() if filters.overdue_only else None
+    )
+    # 缓存编码好的响应体，命中时不再序列化；键中带上读到的版本号，
+    # 落后的副本读出的旧内容不会顶替主库上的新内容
+    key = cache.cache_key(user_id, "list", version, params)
+    return etag, key, cache.response_cache.get(key)
+
+def list_response(body: bytes, etag: str) -> Response:
+    response = serialization.json_response(body)
+    etags.set_headers(response, etag)
+    return response
+
+def list_page(
+    db: Session,
+    user_id: int,
+    selected: tuple,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    count: schemas.CountStrategy,
+    filters: schemas.TodoFilter,
+) -> dict:
+    # 只做查询；编码（还原附件、生成高亮、JSON 序列化）由 encode_list 完成，
+    # 异步路由把它放到线程池
+    query = db.query(models.Todo).filter(models.Todo.user_id == user_id)
+    query, rank, snippet = apply_filters(query, db, filters)
+
+    filters_key = (filters.status, filters.priority, filters.type, filters.search, filters.overdue_only)
+    total = pagination.count_items(db, query, user_id, filters_key, count)
+
+    # 按 (created_at, id) 排序，传入 cursor 时直接定位到下一页，不再使用 OFFSET
+    sort_key = pagination.sort_key(db)
+    # 只查询选中的列，结果是普通的 Row，不构造 ORM 对象，也不经过 pydantic
+    query = query.with_entities(*projections.columns(selected), sort_key.label("cursor_key"))
+    if snippet is not None:
+        query = query.add_columns(snippet.label("search_snippet"))
+    if rank is not None:
+        offset = pagination.decode_offset_cursor(cursor) if cursor else skip
+        query = query.order_by(rank, sort_key.desc(), models.Todo.id.desc()).offset(offset)
+    else:
+        query = query.order_by(sort_key.desc(), models.Todo.id.desc())
+        if cursor:
+            query = pagination.apply_cursor(query, db, cursor)
+        else:
+            query = query.offset(skip)
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rank is not None:
+            next_cursor = pagination.encode_offset_cursor(offset + limit)
+        else:
+            next_cursor = pagination.encode_cursor(rows[-1].cursor_key, rows[-1].id)
+
+    return {
+        "rows": rows,
+        "selected": selected,
+        "search": filters.search,
+        "snippets": {row.id: row.search_snippet for row in rows} if snippet is not None else None,
+        "total": total,
+        "page": None if cursor else (skip // limit) + 1,
+        "per_page": limit,
+        "total_pages": pagination.total_pages(total, limit),
+        "next_cursor": next_cursor,
+    }
+
+def encode_list(page: dict) -> bytes:
+    rows, selected, search = page["rows"], page["selected"], page["search"]
+    # 字段与顺序和 schemas.TodoListResponse 的序列化结果一致
+    return serialization.dumps({
+        "todos": [projections.to_dict(row, selected) for row in rows],
+        "total": page["total"],
+        "page": page["page"],
+        "per_page": page["per_page"],
+        "total_pages": page["total_pages"],
+        "next_cursor": page["next_cursor"],
+        "highlights": fulltext.build_highlights(rows, selected, search, page["snippets"]) if search else None,
+    })
+
+@router.get("/stats", response_model=schemas.TodoStats)
+def get_todo_stats(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(replicas.get_read_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    version = _user_version(db, current_user.id)
+    etag = etags.make_etag("stats", current_user.id, version, etags.overdue_window())
+    if etags.none_match(if_none_match, etag):
+        return etags.not_modified(etag)
+    etags.set_headers(response, etag)
+
+    key = cache.cache_key(current_user.id, "stats", version)
+    body = cache.response_cache.get(key)
+    if body is None:
+        body = stats.get_stats(db, current_user.id)
+        cache.response_cache.set(key, body)
+    return body
+
+@router.get("/export")
+def export_todos(
+    format: schemas.ExportFormat = schemas.ExportFormat.NDJSON,
+    include_attachments: bool = False,
+    current_user: models.User = Depends(replicas.get_read_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    # 边查边写：按批读取并序列化，不把全部 todo 读进内存
+    return exports.response(exports.stream(db, current_user.id, format, include_attachments), format)
+
+@router.post("/import", response_model=schemas.TodoImportResponse)
+async def import_todos(
+    request: Request,
+    format: Optional[schemas.ImportFormat] = None,
+    chunk_size: int = Query(imports.IMPORT_CHUNK_SIZE, ge=1, le=imports.MAX_IMPORT_CHUNK_SIZE),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Todo).filter(models.Todo.user_id == current_user.id)
+    # 请求体边读边解析，每 chunk_size 条在线程池中批量写入一次
+    fmt = format or imports.detect_format(request.headers.get("content-type"))
+    return await imports.run_import(
+        request.stream(), fmt, chunk_size,
+        lambda items: run_in_threadpool(imports.insert_items, db, current_user.id, items)
+    )
 
-    if status:
-        query = query.filter(models.Todo.status == status)
+@router.get("/changes", response_model=schemas.TodoChangesResponse)
+def read_todo_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return schemas.TodoChangesResponse(**changes_page(db, current_user.id, since, limit))
 
-    if priority:
-        query = query.filter(models.Todo.priority == priority)
+def changes_page(db: Session, user_id: int, since: Optional[str], limit: int) -> dict:
+    change_seq, last_id = pagination.decode_change_cursor(since)
 
-    if type:
-        query = query.filter(models.Todo.type == type)
+    # 修改和删除各自按 (change_seq, id) 做 keyset 查询，合并后取前 limit 条
+    todos = db.query(models.Todo).filter(
+        models.Todo.user_id == user_id,
+        tuple_(models.Todo.change_seq, models.Todo.id) > tuple_(change_seq, last_id)
+    ).order_by(models.Todo.change_seq, models.Todo.id).limit(limit + 1).all()
 
-    if search:
-        search_filter = or_(
-            models.Todo.title.contains(search),
-            models.Todo.description.contains(search),
-            models.Todo.tags.contains(search),
-            models.Todo.content.contains(search)
+    tombstone = models.TodoTombstone
+    # SQLite 可能复用已删除的 id，重新出现的 id 以现存的 todo 为准
+    revived = select(models.Todo.id).where(
+        models.Todo.user_id == user_id,
+        models.Todo.id == tombstone.todo_id
+    ).exists()
+    deleted = db.execute(
+        select(tombstone.change_seq, tombstone.todo_id)
+        .where(
+            tombstone.user_id == user_id,
+            tuple_(tombstone.change_seq, tombstone.todo_id) > tuple_(change_seq, last_id),
+            ~revived
         )
-        query = query.filter(search_filter)
+        .order_by(tombstone.change_seq, tombstone.todo_id)
+        .limit(limit + 1)
+    ).all()
 
-    if overdue_only:
-        query = query.filter(
-            and_(
-                models.Todo.due_date < datetime.utcnow(),
-                models.Todo.status != schemas.TaskStatus.DONE
-            )
-        )
+    changes = sorted(
+        [((todo.change_seq, todo.id), todo) for todo in todos]
+        + [((row.change_seq, row.todo_id), None) for row in deleted],
+        key=lambda change: change[0]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        change_seq, last_id = changes[-1][0]
 
-    total = query.count()
-    todos = query.order_by(models.Todo.created_at.desc()).offset(skip).limit(limit).all()
+    # todos 仍是 ORM 对象，还原附件在构造 schemas.TodoChangesResponse 时进行
+    return {
+        "todos": [todo for _, todo in changes if todo is not None],
+        "deleted": [todo_id for (_, todo_id), todo in changes if todo is None],
+        "next_cursor": pagination.encode_change_cursor(change_seq, last_id),
+        "has_more": has_more,
+    }
 
-    total_pages = math.ceil(total / limit) if total > 0 else 1
-    page = (skip // limit) + 1
+@router.post("/batch", response_model=schemas.TodoBatchResponse)
+def create_todos_batch(
+    batch: schemas.TodoBatchCreate,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    rows = []
+    groups = defaultdict(int)
+    for item in batch.items:
+        todo_data = item.dict()
+        todo_data["attachments"] = attachments.store(db, todo_data["attachments"])
+        todo_data["user_id"] = current_user.id
+        rows.append(todo_data)
+        groups[(item.status, item.type)] += 1
 
-    return schemas.TodoListResponse(
-        todos=todos,
-        total=total,
-        page=page,
-        per_page=limit,
-        total_pages=total_pages
+    change_seq = stats.record_groups(db, current_user.id, groups)
+    for todo_data in rows:
+        todo_data["change_seq"] = change_seq
+    # 一条 executemany INSERT 写入全部行，RETURNING 按参数顺序返回 id
+    ids = db.execute(
+        insert(models.Todo).returning(models.Todo.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+    db.commit()
+    cache.record_write(current_user.id)
+    return schemas.TodoBatchResponse(
+        results=[
+            schemas.TodoBatchResult(index=index, id=todo_id, result="created")
+            for index, todo_id in enumerate(ids)
+        ],
+        affected=len(ids)
     )
 
-@router.get("/stats", response_model=schemas.TodoStats)
-def get_todo_stats(
+@router.patch("/batch", response_model=schemas.TodoBatchResponse)
+def update_todos_batch(
+    batch: schemas.TodoBatchUpdate,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    base_query = db.query(models.Todo).filter(models.Todo.user_id == current_user.id)
+    changes = batch.changes.dict(exclude_unset=True)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+    if "attachments" in changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attachments cannot be changed in a batch update"
+        )
 
-    total = base_query.count()
-    todo_count = base_query.filter(models.Todo.status == schemas.TaskStatus.TODO).count()
-    doing_count = base_query.filter(models.Todo.status == schemas.TaskStatus.DOING).count()
-    done_count = base_query.filter(models.Todo.status == schemas.TaskStatus.DONE).count()
+    targets = _select_batch_targets(db, current_user.id, batch, models.Todo.status, models.Todo.type)
+    ids = [row.id for row in targets]
+    groups = defaultdict(int)
+    if "status" in changes or "type" in changes:
+        for row in targets:
+            groups[(row.status, row.type)] -= 1
+            groups[(changes.get("status", row.status), changes.get("type", row.type))] += 1
+    change_seq = stats.record_groups(db, current_user.id, groups)
 
-    overdue_count = base_query.filter(
-        and_(
-            models.Todo.due_date < datetime.utcnow(),
-            models.Todo.status != schemas.TaskStatus.DONE
+    for chunk in _chunks(ids):
+        db.execute(
+            update(models.Todo)
+            .where(models.Todo.user_id == current_user.id, models.Todo.id.in_(chunk))
+            .values(**changes, version=models.Todo.version + 1, change_seq=change_seq),
+            execution_options={"synchronize_session": False}
         )
-    ).count()
-
-    return schemas.TodoStats(
-        total=total,
-        todo_count=todo_count,
-        doing_count=doing_count,
-        done_count=done_count,
-        overdue_count=overdue_count
+    db.commit()
+    cache.record_write(current_user.id)
+    return schemas.TodoBatchResponse(results=_batch_results(batch, ids, "updated"), affected=len(ids))
+
+@router.delete("/batch", response_model=schemas.TodoBatchResponse)
+def delete_todos_batch(
+    batch: schemas.TodoBatchDelete,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    targets = _select_batch_targets(
+        db, current_user.id, batch, models.Todo.status, models.Todo.type, models.Todo.attachments
     )
+    ids = [row.id for row in targets]
+    groups = defaultdict(int)
+    for row in targets:
+        groups[(row.status, row.type)] -= 1
+    change_seq = stats.record_groups(db, current_user.id, groups)
+
+    attachments.release(db, [ref for row in targets for ref in row.attachments or []])
+    if ids:
+        db.execute(insert(models.TodoTombstone), [
+            {"todo_id": todo_id, "user_id": current_user.id, "change_seq": change_seq} for todo_id in ids
+        ])
+    for chunk in _chunks(ids):
+        db.execute(
+            delete(models.Todo).where(models.Todo.user_id == current_user.id, models.Todo.id.in_(chunk)),
+            execution_options={"synchronize_session": False}
+        )
+    db.commit()
+    cache.record_write(current_user.id)
+    return schemas.TodoBatchResponse(results=_batch_results(batch, ids, "deleted"), affected=len(ids))
 
 @router.get("/{todo_id}", response_model=schemas.Todo)
 def read_todo(
     todo_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(replicas.get_read_user),
+    db: Session = Depends(replicas.get_read_db)
 ):
+    if if_none_match:
+        # 只查计算 ETag 所需的列，未修改时不读取正文和附件
+        row = db.execute(
+            select(
+                models.Todo.id, models.Todo.user_id, models.Todo.created_at,
+                models.Todo.version, models.Todo.change_seq
+            ).where(
+                models.Todo.id == todo_id,
+                models.Todo.user_id == current_user.id
+            )
+        ).first()
+        if row is not None and etags.none_match(if_none_match, etags.item_etag(row)):
+            return etags.not_modified(etags.item_etag(row))
+
     todo = db.query(models.Todo).filter(
         models.Todo.id == todo_id,
         models.Todo.user_id == current_user.id
     ).first()
     if todo is None:
         raise HTTPException(status_code=404, detail="Todo not found")
+    etags.set_headers(response, etags.item_etag(todo))
     return todo
 
 @router.put("/{todo_id}", response_model=schemas.Todo)
 def update_todo(
     todo_id: int,
     todo_update: schemas.TodoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -129,13 +468,24 @@ def update_todo(
     ).first()
     if todo is None:
         raise HTTPException(status_code=404, detail="Todo not found")
+    if not etags.match(if_match, etags.item_etag(todo)):
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Todo has been modified")
 
     update_data = todo_update.dict(exclude_unset=True)
+    old_status, old_type = todo.status, todo.type
+    if "attachments" in update_data:
+        new_refs = attachments.store(db, update_data["attachments"])
+        attachments.release(db, todo.attachments)
+        update_data["attachments"] = new_refs
     for field, value in update_data.items():
         setattr(todo, field, value)
 
+    todo.change_seq = stats.record_update(db, current_user.id, old_status, old_type, todo.status, todo.type)
+    _flush_or_conflict(db, if_match)
     db.commit()
     db.refresh(todo)
+    cache.record_write(current_user.id)
+    etags.set_headers(response, etags.item_etag(todo))
     return todo
 
 @router.delete("/{todo_id}")
@@ -151,6 +501,11 @@ def delete_todo(
     if todo is None:
         raise HTTPException(status_code=404, detail="Todo not found")
 
+    change_seq = stats.record_delete(db, current_user.id, todo.status, todo.type)
+    attachments.release(db, todo.attachments)
+    db.add(models.TodoTombstone(todo_id=todo.id, user_id=current_user.id, change_seq=change_seq))
     db.delete(todo)
+    _flush_or_conflict(db, None)
     db.commit()
+    cache.record_write(current_user.id)
     return {"message": "Todo deleted successfully"}
\ No newline at end of file
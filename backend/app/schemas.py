@@ -1,7 +1,8 @@
 from pydantic import BaseModel, EmailStr, validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from enum import Enum
+from . import attachments
 
 class TaskStatus(str, Enum):
     TODO = "TODO"
@@ -19,6 +20,21 @@ class ItemType(str, Enum):
     NOTE = "NOTE"
     DIARY = "DIARY"
 
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    CACHED = "cached"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    JSON = "json"
+
+class ImportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
 # User schemas
 class UserBase(BaseModel):
     username: str
@@ -95,6 +111,35 @@ class Todo(TodoBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    @validator('attachments')
+    def resolve_attachments(cls, v):
+        # 数据库中只保存附件引用，返回给客户端时还原为 data URL
+        return attachments.resolve(v)
+
+    class Config:
+        from_attributes = True
+
+class TodoListItem(BaseModel):
+    # 列表项按 fields 参数投影，未选择的字段不会出现在响应中
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[TaskStatus] = None
+    priority: Optional[Priority] = None
+    due_date: Optional[datetime] = None
+    tags: Optional[str] = None
+    type: Optional[ItemType] = None
+    content: Optional[str] = None
+    attachments: Optional[List[str]] = None
+    id: int
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    preview: Optional[str] = None
+
+    @validator('attachments')
+    def resolve_attachments(cls, v):
+        return attachments.resolve(v)
+
     class Config:
         from_attributes = True
 
@@ -105,14 +150,95 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
+    stamp: Optional[str] = None
 
 # Response schemas
+class TodoHighlights(BaseModel):
+    # 偏移量为 UTF-16 码元下标，可直接用于前端字符串切分
+    title: List[Tuple[int, int]] = []
+    tags: List[Tuple[int, int]] = []
+    description: List[Tuple[int, int]] = []
+    content: List[Tuple[int, int]] = []
+    snippet: Optional[str] = None
+    snippet_ranges: List[Tuple[int, int]] = []
+
 class TodoListResponse(BaseModel):
-    todos: List[Todo]
-    total: int
-    page: int
+    todos: List[TodoListItem]
+    total: Optional[int] = None  # count=none 时不统计总数
+    page: Optional[int] = None  # 游标分页时没有页码
     per_page: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    highlights: Optional[Dict[int, TodoHighlights]] = None
+
+class TodoChangesResponse(BaseModel):
+    todos: List[Todo]  # 游标之后新建或修改过的 todo
+    deleted: List[int]  # 游标之后删除的 todo id
+    next_cursor: str  # 下次同步时作为 since 传入
+    has_more: bool
+
+# Batch schemas
+MAX_BATCH_SIZE = 500
+
+class TodoFilter(BaseModel):
+    # 与列表接口的筛选参数一致
+    status: Optional[TaskStatus] = None
+    priority: Optional[Priority] = None
+    type: Optional[ItemType] = None
+    search: Optional[str] = None
+    overdue_only: bool = False
+
+class TodoBatchCreate(BaseModel):
+    items: List[TodoCreate]
+
+    @validator('items')
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError('At least one item is required')
+        if len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f'At most {MAX_BATCH_SIZE} items per batch')
+        return v
+
+class TodoBatchSelection(BaseModel):
+    # ids 和 filter 二选一
+    ids: Optional[List[int]] = None
+    filter: Optional[TodoFilter] = None
+
+    @validator('ids')
+    def validate_ids(cls, v):
+        if v is not None and len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f'At most {MAX_BATCH_SIZE} ids per batch')
+        return v
+
+class TodoBatchUpdate(TodoBatchSelection):
+    changes: TodoUpdate
+
+class TodoBatchDelete(TodoBatchSelection):
+    pass
+
+class TodoBatchResult(BaseModel):
+    id: Optional[int] = None
+    index: Optional[int] = None  # 批量创建时对应 items 中的位置
+    result: str  # created / updated / deleted / not_found
+
+class TodoBatchResponse(BaseModel):
+    results: List[TodoBatchResult]
+    affected: int
+
+# Import schemas
+class TodoImportError(BaseModel):
+    line: int  # 记录起始行号（从 1 开始，CSV 含表头行）
+    error: str
+
+class TodoImportResponse(BaseModel):
+    format: ImportFormat
+    inserted: int
+    failed: int
+    errors: List[TodoImportError]  # 最多列出前 100 条
+    chunks: int
+    elapsed_ms: float
+    rows_per_second: Optional[float] = None
 
 class TodoStats(BaseModel):
     total: int
@@ -0,0 +1,247 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, literal_column, or_, select, text
+from sqlalchemy.orm import Query, Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# 字段权重：标题 > 标签 > 描述/正文
+TITLE_WEIGHT = 10.0
+TAGS_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+SNIPPET_CONTEXT = 40
+SNIPPET_TOKENS = 24
+# 数据库生成摘要时用于标记命中区间的控制字符
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+MAX_RANGES_PER_FIELD = 20
+HIGHLIGHT_FIELDS = ("title", "tags", "description", "content")
+
+# trigram 分词器支持中文子串匹配，但查询串至少需要 3 个字符
+SQLITE_MIN_QUERY_LENGTH = 3
+
+# 各方言的全文索引是否可用，首次搜索时检测并缓存
+_fts_ready = {}
+
+_SQLITE_FTS_STATEMENTS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, tags, description, content)
+        VALUES (new.id, new.title, new.tags, new.description, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, tags, description, content)
+        VALUES ('delete', old.id, old.title, old.tags, old.description, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_au AFTER UPDATE OF title, tags, description, content ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, tags, description, content)
+        VALUES ('delete', old.id, old.title, old.tags, old.description, old.content);
+        INSERT INTO todos_fts(rowid, title, tags, description, content)
+        VALUES (new.id, new.title, new.tags, new.description, new.content);
+    END
+    """,
+)
+
+_POSTGRES_FTS_STATEMENTS = (
+    """
+    ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(tags, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(content, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_todos_search_vector ON todos USING GIN (search_vector)",
+)
+
+
+def ensure_search_index(engine) -> bool:
+    # 返回全文索引是否可用；不可用时搜索退化为 LIKE
+    dialect = engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            _ensure_sqlite_index(engine)
+        elif dialect == "postgresql":
+            with engine.begin() as connection:
+                for statement in _POSTGRES_FTS_STATEMENTS:
+                    connection.execute(text(statement))
+        else:
+            return False
+        _fts_ready[dialect] = True
+        return True
+    except Exception as e:
+        logger.warning("Full-text index unavailable, search falls back to LIKE: %s", e)
+        return False
+
+
+def _ensure_sqlite_index(engine) -> None:
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'")
+        ).first()
+        if not exists:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE todos_fts USING fts5("
+                "title, tags, description, content, "
+                "content='todos', content_rowid='id', tokenize='trigram')"
+            ))
+        for statement in _SQLITE_FTS_STATEMENTS:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')"))
+            logger.info("Created full-text index 'todos_fts' and indexed existing todos")
+
+
+def _fts_available(db: Session, dialect: str) -> bool:
+    ready = _fts_ready.get(dialect)
+    if ready is None:
+        if dialect == "sqlite":
+            ready = db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'")
+            ).first() is not None
+        elif dialect == "postgresql":
+            ready = db.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'todos' AND column_name = 'search_vector'"
+            )).first() is not None
+        else:
+            ready = False
+        _fts_ready[dialect] = ready
+    return ready
+
+
+def apply_search(db: Session, query: Query, search: str) -> Tuple[Query, Optional[object], Optional[object]]:
+    # 返回 (query, 相关度排序表达式, 数据库端摘要列)；退化为 LIKE 时后两者为 None
+    dialect = db.get_bind().dialect.name
+    if not _fts_available(db, dialect):
+        return _apply_like(query, search), None, None
+
+    if dialect == "sqlite":
+        if len(search) < SQLITE_MIN_QUERY_LENGTH:
+            return _apply_like(query, search), None, None
+        # 整个查询串作为短语，保持与原来 contains() 一致的子串语义
+        phrase = '"' + search.replace('"', '""') + '"'
+        matches = (
+            select(
+                literal_column("rowid").label("todo_id"),
+                literal_column(
+                    f"bm25(todos_fts, {TITLE_WEIGHT}, {TAGS_WEIGHT}, {BODY_WEIGHT}, {BODY_WEIGHT})"
+                ).label("rank"),
+                literal_column(
+                    f"snippet(todos_fts, -1, char(2), char(3), '…', {SNIPPET_TOKENS})"
+                ).label("snippet"),
+            )
+            .select_from(text("todos_fts"))
+            .where(text("todos_fts MATCH :fts_query").bindparams(fts_query=phrase))
+            .subquery("fts_matches")
+        )
+        query = query.join(matches, matches.c.todo_id == models.Todo.id)
+        # bm25 越小越相关
+        return query, matches.c.rank.asc(), matches.c.snippet
+
+    ts_query = func.websearch_to_tsquery("simple", search)
+    search_vector = literal_column("todos.search_vector")
+    query = query.filter(search_vector.op("@@")(ts_query))
+    snippet = func.ts_headline(
+        "simple",
+        func.coalesce(func.nullif(models.Todo.content, ""), models.Todo.description, ""),
+        ts_query,
+        f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords={SNIPPET_TOKENS}"
+    )
+    return query, func.ts_rank(search_vector, ts_query).desc(), snippet
+
+
+def _apply_like(query: Query, search: str) -> Query:
+    return query.filter(or_(
+        models.Todo.title.contains(search),
+        models.Todo.description.contains(search),
+        models.Todo.tags.contains(search),
+        models.Todo.content.contains(search)
+    ))
+
+
+def _utf16_len(value: str) -> int:
+    return len(value.encode("utf-16-le")) // 2
+
+
+def _find_ranges(value: str, terms: List[str]) -> List[Tuple[int, int]]:
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    ranges = []
+    for match in pattern.finditer(value):
+        ranges.append((match.start(), match.end()))
+        if len(ranges) >= MAX_RANGES_PER_FIELD:
+            break
+    return ranges
+
+
+def _to_utf16(value: str, ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # 前端按 UTF-16 码元切分字符串，偏移量需与 JS 的 String 下标一致
+    return [(_utf16_len(value[:start]), _utf16_len(value[:end])) for start, end in ranges]
+
+
+def _snippet(value: str, ranges: List[Tuple[int, int]]) -> Tuple[str, List[Tuple[int, int]]]:
+    first_start, first_end = ranges[0]
+    start = max(0, first_start - SNIPPET_CONTEXT)
+    end = min(len(value), first_end + SNIPPET_CONTEXT)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(value) else ""
+    snippet = prefix + value[start:end] + suffix
+    shift = len(prefix) - start
+    local = [(s + shift, e + shift) for s, e in ranges if s >= start and e <= end]
+    return snippet, _to_utf16(snippet, local)
+
+
+def _parse_marked(marked: str) -> Tuple[str, List[Tuple[int, int]]]:
+    parts = []
+    ranges = []
+    length = 0
+    start = None
+    for char in marked:
+        if char == _MARK_START:
+            start = length
+        elif char == _MARK_END:
+            if start is not None:
+                ranges.append((start, length))
+            start = None
+        else:
+            parts.append(char)
+            length += 1
+    snippet = "".join(parts)
+    return snippet, _to_utf16(snippet, ranges)
+
+
+def build_highlights(rows, fields, search: str, snippets: Optional[Dict[int, str]] = None) -> Dict[str, dict]:
+    # 返回可直接编码的 JSON：键为 id 字符串，字段顺序与 schemas.TodoHighlights 一致
+    # 整串优先，其次是各个词（PostgreSQL 按词匹配）
+    terms = sorted({search.strip(), *search.split()} - {""}, key=len, reverse=True)
+    highlights = {}
+    for row in rows:
+        entry = {}
+        snippet_source = None
+        # 只处理查询出的字段，避免为了高亮再把被投影掉的正文读出来
+        for field in HIGHLIGHT_FIELDS:
+            if field not in fields:
+                entry[field] = []
+                continue
+            value = getattr(row, field) or ""
+            ranges = _find_ranges(value, terms) if terms else []
+            entry[field] = _to_utf16(value, ranges)
+            if ranges and snippet_source is None and field in ("content", "description"):
+                snippet_source = (value, ranges)
+        entry["snippet"], entry["snippet_ranges"] = None, []
+        if snippet_source is not None:
+            entry["snippet"], entry["snippet_ranges"] = _snippet(*snippet_source)
+        elif snippets and snippets.get(row.id):
+            # 正文未查询时使用数据库生成的摘要
+            entry["snippet"], entry["snippet_ranges"] = _parse_marked(snippets[row.id])
+        highlights[str(row.id)] = entry
+    return highlights
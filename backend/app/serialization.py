@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # 未安装时退回标准库，输出完全相同，只是慢一些
+    orjson = None
+
+_UTC_OFFSET = timedelta(0)
+
+
+def dumps(content: Any) -> bytes:
+    # 与 Starlette JSONResponse 的输出逐字节一致：紧凑分隔符，非 ASCII 字符不转义
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except orjson.JSONEncodeError:
+            # 例如字符串中含有孤立的代理码元，交给标准库处理
+            pass
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def datetime_value(value: Optional[datetime]) -> Optional[str]:
+    # 与 pydantic 的 JSON 序列化一致：UTC 偏移写作 Z
+    if value is None:
+        return None
+    text = value.isoformat()
+    if value.utcoffset() == _UTC_OFFSET:
+        text = text[:-6] + "Z"
+    return text
+
+
+def enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def model_body(model: Any, value: Any) -> bytes:
+    # 按 response_model 校验后编码，输出与 FastAPI 序列化 response_model 的结果一致
+    return dumps(model.model_validate(value).model_dump(mode="json"))
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# default 保持 SQLite 的默认设置；production 启用 WAL、调优的 PRAGMA、写入串行化和定期维护
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default").lower()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("SQLITE_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+# ANALYZE 每个索引最多扫描的行数，大表上也能很快完成
+SQLITE_ANALYSIS_LIMIT = int(os.getenv("SQLITE_ANALYSIS_LIMIT", "1000"))
+# 每次维护最多回收的空闲页数
+SQLITE_VACUUM_PAGES = int(os.getenv("SQLITE_VACUUM_PAGES", "1000"))
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER", "ANALYZE", "VACUUM")
+
+
+def is_production() -> bool:
+    return SQLITE_PROFILE == "production"
+
+
+class WriterLane:
+    # 进程内所有写事务排成一队：拿到写锁的连接一直持有到提交或回滚，
+    # 其他写入者在这里排队，而不是在 SQLite 里反复重试直到 "database is locked"
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0
+        self._acquired_at = 0.0
+
+    def acquire(self) -> bool:
+        started = time.perf_counter()
+        # 超时后不再排队，交给 SQLite 的 busy_timeout 处理，避免异常路径下永久阻塞
+        acquired = self._lock.acquire(timeout=self.timeout_seconds)
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if acquired:
+                self.acquired += 1
+                self._acquired_at = time.perf_counter()
+            else:
+                self.timeouts += 1
+        if not acquired:
+            logger.warning("SQLite writer lane wait timed out after %.1f s", waited)
+        return acquired
+
+    def release(self) -> None:
+        with self._stats_lock:
+            self.hold_seconds += time.perf_counter() - self._acquired_at
+        self._lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "held": self._lock.locked(),
+                "avg_wait_ms": round(self.wait_seconds / self.acquired * 1000, 3) if self.acquired else None,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+                "avg_hold_ms": round(self.hold_seconds / self.acquired * 1000, 3) if self.acquired else None,
+            }
+
+
+writer_lane = WriterLane(SQLITE_BUSY_TIMEOUT_MS / 1000)
+
+
+class LaneConnection(sqlite3.Connection):
+    # 写锁在 DBAPI 提交/回滚完成之后才释放，下一个写入者不会撞上尚未结束的事务
+    holds_lane = False
+
+    def _release_lane(self) -> None:
+        if self.holds_lane:
+            self.holds_lane = False
+            writer_lane.release()
+
+    def commit(self) -> None:
+        try:
+            super().commit()
+        finally:
+            self._release_lane()
+
+    def rollback(self) -> None:
+        try:
+            super().rollback()
+        finally:
+            self._release_lane()
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._release_lane()
+
+
+def connect_args(database_url: str) -> Dict[str, Any]:
+    return {"factory": LaneConnection} if database_url.startswith("sqlite") and is_production() else {}
+
+
+def _apply_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        # 新建的数据库文件使用增量 auto_vacuum；已有数据库需要一次完整 VACUUM 才会切换
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cursor.close()
+    _apply_read_pragmas(dbapi_connection, connection_record)
+
+
+def _apply_read_pragmas(dbapi_connection, connection_record) -> None:
+    # 只影响本连接的设置，只读打开（mode=ro）的副本也可以使用
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def _enter_lane(conn, cursor, statement, parameters, context, executemany) -> None:
+    if not statement.lstrip()[:8].upper().startswith(_WRITE_PREFIXES):
+        return
+    dbapi_connection = conn.connection.dbapi_connection
+    if isinstance(dbapi_connection, LaneConnection) and not dbapi_connection.holds_lane:
+        dbapi_connection.holds_lane = writer_lane.acquire()
+
+
+def configure(engine: Engine, writer_lane_enabled: bool = True, read_only: bool = False) -> None:
+    if engine.dialect.name != "sqlite" or not is_production():
+        return
+    if read_only:
+        # 只读副本不能切换日志模式，也不写入
+        event.listen(engine, "connect", _apply_read_pragmas)
+        return
+    event.listen(engine, "connect", _apply_pragmas)
+    # 异步引擎的连接在 aiosqlite 的线程中执行，等待由 busy_timeout 完成，不阻塞事件循环
+    if writer_lane_enabled:
+        event.listen(engine, "before_cursor_execute", _enter_lane)
+
+
+_last_maintenance: Dict[str, Any] = {}
+
+
+def run_maintenance(engine: Engine) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        connection.exec_driver_sql(f"PRAGMA analysis_limit={SQLITE_ANALYSIS_LIMIT}")
+        connection.exec_driver_sql("ANALYZE")
+        connection.exec_driver_sql("PRAGMA optimize")
+        connection.commit()
+        freed = 0
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            before = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+            connection.exec_driver_sql(f"PRAGMA incremental_vacuum({SQLITE_VACUUM_PAGES})")
+            connection.commit()
+            freed = before - connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        checkpoint = connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    result = {
+        "finished_at": time.time(),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "freed_pages": freed,
+        "wal_checkpointed_pages": checkpoint[2] if checkpoint else None,
+    }
+    _last_maintenance.clear()
+    _last_maintenance.update(result)
+    logger.info("SQLite maintenance finished in %.1f ms, freed %d pages", result["duration_ms"], freed)
+    return result
+
+
+async def maintenance_loop(engine: Engine) -> None:
+    while True:
+        await asyncio.sleep(SQLITE_MAINTENANCE_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(run_maintenance, engine)
+        except Exception:
+            logger.exception("SQLite maintenance failed")
+
+
+def start_maintenance(engine: Engine) -> Optional[asyncio.Task]:
+    if engine.dialect.name != "sqlite" or not is_production() or SQLITE_MAINTENANCE_INTERVAL_SECONDS <= 0:
+        return None
+    return asyncio.create_task(maintenance_loop(engine))
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "profile": SQLITE_PROFILE,
+        "writer_lane": writer_lane.stats(),
+        "maintenance_interval_seconds": SQLITE_MAINTENANCE_INTERVAL_SECONDS,
+        "last_maintenance": dict(_last_maintenance) or None,
+    }
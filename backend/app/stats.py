@@ -0,0 +1,225 @@
+import logging
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+logger = logging.getLogger(__name__)
+
+COUNTER_COLUMNS = (
+    "total", "todo_count", "doing_count", "done_count",
+    "task_count", "note_count", "diary_count",
+)
+
+_counters = models.TodoCounter.__table__
+_todos = models.Todo.__table__
+
+
+def _value(enum_value) -> str:
+    return getattr(enum_value, "value", enum_value)
+
+
+def _columns_for(status, item_type):
+    return (f"{_value(status).lower()}_count", f"{_value(item_type).lower()}_count")
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {column: 0 for column in COUNTER_COLUMNS}
+
+
+def _add_group(counts: Dict[str, int], status, item_type, count: int) -> None:
+    counts["total"] += count
+    for column in _columns_for(status, item_type):
+        counts[column] += count
+
+
+def _overdue_filter(now: datetime):
+    return and_(
+        models.Todo.due_date < now,
+        models.Todo.status != schemas.TaskStatus.DONE
+    )
+
+
+def aggregate(db: Session, user_id: int) -> Dict[str, int]:
+    # 单次扫描：按 (status, type) 分组，同时统计逾期数
+    overdue = func.sum(case((_overdue_filter(datetime.utcnow()), 1), else_=0))
+    rows = db.query(
+        models.Todo.status, models.Todo.type, func.count(), overdue
+    ).filter(models.Todo.user_id == user_id).group_by(models.Todo.status, models.Todo.type).all()
+
+    counts = _empty_counts()
+    counts["overdue_count"] = 0
+    for status, item_type, count, overdue_count in rows:
+        _add_group(counts, status, item_type, count)
+        counts["overdue_count"] += overdue_count or 0
+    return counts
+
+
+def _insert_counters(db: Session, user_id: int, counts: Dict[str, int], version: int = 0) -> bool:
+    values = {column: counts[column] for column in COUNTER_COLUMNS}
+    values["version"] = version
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(_counters).values(user_id=user_id, **values).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(_counters).values(user_id=user_id, **values).on_conflict_do_nothing()
+    else:
+        stmt = _counters.insert().values(user_id=user_id, **values)
+    return db.execute(stmt).rowcount == 1
+
+
+def _adjust(db: Session, user_id: int, deltas: Dict[str, int]) -> int:
+    # 在写入 todo 之前调用（读到的是改动前的数据）；每次写操作都递增用户的版本号，
+    # 即使计数没有变化。返回新版本号，作为本次改动的 change_seq
+    values = {column: getattr(_counters.c, column) + delta for column, delta in deltas.items() if delta}
+    values["version"] = _counters.c.version + 1
+    stmt = update(_counters).where(_counters.c.user_id == user_id).values(values)
+    version = _execute_returning_version(db, stmt)
+    if version is not None:
+        return version
+    # 计数行不存在：按当前数据初始化后再应用增量；
+    # 若并发请求抢先插入了计数行，同样只需应用增量
+    _insert_counters(db, user_id, aggregate(db, user_id))
+    return _execute_returning_version(db, stmt)
+
+
+def _execute_returning_version(db: Session, stmt) -> Optional[int]:
+    # UPDATE 会锁住计数行，同一用户的写事务按版本号顺序提交
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(_counters.c.version)).scalar()
+    if not db.execute(stmt).rowcount:
+        return None
+    return db.execute(select(_counters.c.version).where(stmt.whereclause)).scalar()
+
+
+def record_create(db: Session, user_id: int, status, item_type) -> int:
+    deltas = defaultdict(int, total=1)
+    for column in _columns_for(status, item_type):
+        deltas[column] += 1
+    return _adjust(db, user_id, deltas)
+
+
+def record_update(db: Session, user_id: int, old_status, old_type, new_status, new_type) -> int:
+    deltas = defaultdict(int)
+    for column in _columns_for(old_status, old_type):
+        deltas[column] -= 1
+    for column in _columns_for(new_status, new_type):
+        deltas[column] += 1
+    return _adjust(db, user_id, deltas)
+
+
+def record_delete(db: Session, user_id: int, status, item_type) -> int:
+    deltas = defaultdict(int, total=-1)
+    for column in _columns_for(status, item_type):
+        deltas[column] -= 1
+    return _adjust(db, user_id, deltas)
+
+
+def record_groups(db: Session, user_id: int, groups: Dict[tuple, int]) -> int:
+    # 批量写入：groups 为 {(status, type): 数量变化}，一次 UPDATE 应用全部增量
+    deltas = defaultdict(int)
+    for (status, item_type), count in groups.items():
+        deltas["total"] += count
+        for column in _columns_for(status, item_type):
+            deltas[column] += count
+    return _adjust(db, user_id, deltas)
+
+
+def user_version(db: Session, user_id: int) -> int:
+    version = db.execute(
+        select(_counters.c.version).where(_counters.c.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+
+def get_stats(db: Session, user_id: int) -> schemas.TodoStats:
+    counter = db.get(models.TodoCounter, user_id)
+    if counter is None:
+        counts = aggregate(db, user_id)
+        # 副本会话（replicas 设置了 info["replica"]）只读，直接返回现算的结果，
+        # 计数行留给主库上的下一次写入初始化
+        if "replica" not in db.info:
+            _insert_counters(db, user_id, counts)
+            db.commit()
+    else:
+        counts = {column: getattr(counter, column) for column in COUNTER_COLUMNS}
+        # 逾期数随时间变化，不能增量维护；在 ix_todos_user_created_due 上只扫索引现算
+        counts["overdue_count"] = db.query(func.count(models.Todo.id)).filter(
+            models.Todo.user_id == user_id,
+            _overdue_filter(datetime.utcnow())
+        ).scalar()
+
+    return schemas.TodoStats(
+        total=counts["total"],
+        todo_count=counts["todo_count"],
+        doing_count=counts["doing_count"],
+        done_count=counts["done_count"],
+        overdue_count=counts["overdue_count"]
+    )
+
+
+def reconcile(db: Session, fix: bool = True) -> int:
+    # 全表单次分组扫描重建所有用户的计数，返回存在偏差的用户数
+    actual = defaultdict(_empty_counts)
+    rows = db.execute(
+        select(_todos.c.user_id, _todos.c.status, _todos.c.type, func.count())
+        .group_by(_todos.c.user_id, _todos.c.status, _todos.c.type)
+    ).all()
+    for user_id, status, item_type, count in rows:
+        _add_group(actual[user_id], status, item_type, count)
+
+    stored = {row.user_id: row for row in db.execute(select(_counters)).all()}
+    drifted = 0
+    for user_id in sorted(set(actual) | set(stored)):
+        expected = actual.get(user_id, _empty_counts())
+        row = stored.get(user_id)
+        current = {column: getattr(row, column) for column in COUNTER_COLUMNS} if row else None
+        if current == expected:
+            continue
+        drifted += 1
+        if current is None:
+            logger.warning("user %s: counters missing, expected %s", user_id, expected)
+        else:
+            diff = {column: current[column] - expected[column] for column in COUNTER_COLUMNS
+                    if current[column] != expected[column]}
+            logger.warning("user %s: drift %s", user_id, diff)
+        if fix:
+            if current is None:
+                _insert_counters(db, user_id, expected, version=1)
+            else:
+                db.execute(
+                    update(_counters)
+                    .where(_counters.c.user_id == user_id)
+                    .values(**expected, version=_counters.c.version + 1)
+                )
+    if fix:
+        db.commit()
+    return drifted
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "reconcile" or set(args[1:]) - {"--dry-run"}:
+        print("Usage: python -m app.stats reconcile [--dry-run]")
+        sys.exit(1)
+
+    from .database import SessionLocal, engine
+    from .logs import setup_logging
+    from .migrations import migrate
+
+    setup_logging()
+    migrate(engine)
+    session = SessionLocal()
+    try:
+        dry_run = "--dry-run" in args
+        drifted = reconcile(session, fix=not dry_run)
+        action = "found" if dry_run else "rebuilt"
+        logger.info("Counter reconciliation %s drift for %s users", action, drifted)
+    finally:
+        session.close()
@@ -0,0 +1,431 @@
+"""API benchmark suite.
+
+Drives the real FastAPI app over datasets seeded by ``datagen.py`` and reports, per scenario,
+throughput and p50/p95/p99 latency:
+
+* login, me                       -- ``POST /auth/login``, ``GET /auth/me``
+* list_first, list_deep           -- first page, and a page deep into the list (large ``skip``)
+* list_filtered, list_search      -- status + priority filter, full-text search
+* stats                           -- ``GET /todos/stats``
+* create, update, delete          -- single-item writes
+* attachment_create/read          -- items carrying a large attachment
+
+Each dataset runs in its own interpreter, either in-process through
+``TestClient`` (``--mode inprocess``) or over HTTP against a uvicorn server
+started on the seeded database (``--mode uvicorn``).
+
+The response, count and compressed-response caches are disabled by default so
+that every request does the real work; ``--cache`` keeps them on, in which case
+repeated requests mostly measure cache hits.
+
+Results can be saved with ``--json``. With ``--baseline`` the run fails
+(exit code 1) when a scenario's latency percentile regresses by more than
+``--tolerance`` against the stored results; ``--update-baseline`` rewrites the
+baseline from this run. Absolute timings are only comparable on the same host:
+record the baseline on the machine that runs the gate (e.g. from the target
+branch, just before measuring the change). When the baseline comes from another
+host, or with ``--relative``, each scenario is compared after dividing out the
+median slowdown across all scenarios, so only scenarios that got slower
+relative to the rest are reported.
+
+Usage (from the backend directory)::
+
+    python benchmarks/api.py [--datasets small,medium] [--mode inprocess|uvicorn]
+                             [--requests 200] [--concurrency 1] [--seed 42] [--cache]
+                             [--json results.json] [--baseline baseline.json]
+                             [--tolerance 0.5] [--metric p95] [--relative] [--update-baseline]
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import datagen
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATASETS = {
+    "small": {"users": 5, "todos_per_user": 200},
+    "medium": {"users": 20, "todos_per_user": 2_000},
+    "large": {"users": 50, "todos_per_user": 10_000},
+}
+SCENARIOS = (
+    "login", "me", "list_first", "list_deep", "list_filtered", "list_search", "stats",
+    "create", "update", "delete", "attachment_create", "attachment_read",
+)
+USER_PREFIX = "bench"
+PASSWORD = "benchmark-password"
+# 搜索词取自生成器的词表；FTS5 trigram 要求至少 3 个字符
+SEARCH_TERMS = tuple(word for word in datagen.WORDS if len(word) >= 3)
+FILTER_COMBINATIONS = tuple(
+    (status, priority) for status in ("TODO", "DOING", "DONE") for priority in ("LOW", "MEDIUM", "HIGH")
+)
+# 默认关闭的缓存：开着时重复的 GET 基本只测到缓存命中
+CACHE_SIZE_VARIABLES = ("RESPONSE_CACHE_MAX_ENTRIES", "COUNT_CACHE_MAX_ENTRIES", "COMPRESSED_CACHE_MAX_ENTRIES")
+ATTACHMENT_BYTES = 512 * 1024
+
+
+def seed(engine, dataset: dict, seed_value: int) -> dict:
+    # 与 datagen.py 相同的生成器；每个用户条数固定，list_deep 的偏移才有意义
+    return datagen.generate(
+        engine,
+        users=dataset["users"],
+        todos_per_user=f"fixed:{dataset['todos_per_user']}",
+        seed=seed_value,
+        prefix=USER_PREFIX,
+        password=PASSWORD,
+        progress_interval=0,
+    )
+
+
+class Scenarios:
+    # 各场景的请求构造：每次调用返回 (方法, 路径, 请求参数)，i 为请求序号
+    def __init__(self, client, users: int, todos_per_user: int, limit: int = 20):
+        self.client = client
+        self.users = users
+        self.limit = limit
+        self.deep_skip = max(0, todos_per_user - 2 * limit)
+        self.headers = []
+        self.ids = []
+        for index in range(users):
+            credentials = {"username": datagen.username(USER_PREFIX, index), "password": PASSWORD}
+            response = client.post("/auth/login", json=credentials)
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            self.headers.append(headers)
+            page = client.get("/todos/", params={"limit": 100}, headers=headers)
+            page.raise_for_status()
+            self.ids.append([todo["id"] for todo in page.json()["todos"]])
+        self.created = []
+        payload = base64.b64encode(random.Random(0).randbytes(ATTACHMENT_BYTES)).decode("ascii")
+        self.attachment = f"data:application/octet-stream;base64,{payload}"
+        self.attachment_ids = []
+
+    def _user(self, i: int):
+        return self.headers[i % self.users]
+
+    def login(self, i):
+        credentials = {"username": datagen.username(USER_PREFIX, i % self.users), "password": PASSWORD}
+        return "POST", "/auth/login", {"json": credentials}
+
+    def me(self, i):
+        return "GET", "/auth/me", {"headers": self._user(i)}
+
+    def list_first(self, i):
+        return "GET", "/todos/", {"params": {"limit": self.limit}, "headers": self._user(i)}
+
+    def list_deep(self, i):
+        return "GET", "/todos/", {"params": {"limit": self.limit, "skip": self.deep_skip}, "headers": self._user(i)}
+
+    def list_filtered(self, i):
+        status, priority = FILTER_COMBINATIONS[i % len(FILTER_COMBINATIONS)]
+        params = {"limit": self.limit, "status": status, "priority": priority}
+        return "GET", "/todos/", {"params": params, "headers": self._user(i)}
+
+    def list_search(self, i):
+        params = {"limit": self.limit, "search": SEARCH_TERMS[i % len(SEARCH_TERMS)]}
+        return "GET", "/todos/", {"params": params, "headers": self._user(i)}
+
+    def stats(self, i):
+        return "GET", "/todos/stats", {"headers": self._user(i)}
+
+    def create(self, i):
+        return "POST", "/todos/", {"json": {"title": f"bench create {i}", "tags": "bench"}, "headers": self._user(i)}
+
+    def update(self, i):
+        ids = self.ids[i % self.users]
+        body = {"status": ("TODO", "DOING", "DONE")[i % 3], "title": f"bench update {i}"}
+        return "PUT", f"/todos/{ids[i % len(ids)]}", {"json": body, "headers": self._user(i)}
+
+    def delete(self, i):
+        user, todo_id = self.created[i % len(self.created)]
+        return "DELETE", f"/todos/{todo_id}", {"headers": self.headers[user]}
+
+    def attachment_create(self, i):
+        body = {"title": f"bench attachment {i}", "type": "NOTE", "attachments": [self.attachment]}
+        return "POST", "/todos/", {"json": body, "headers": self._user(i)}
+
+    def attachment_read(self, i):
+        user, todo_id = self.attachment_ids[i % len(self.attachment_ids)]
+        return "GET", f"/todos/{todo_id}", {"headers": self.headers[user]}
+
+    def collect(self, name: str, i: int, response) -> None:
+        # 创建出的条目留给 delete / attachment_read 使用
+        if name == "create":
+            self.created.append((i % self.users, response.json()["id"]))
+        elif name == "attachment_create":
+            self.attachment_ids.append((i % self.users, response.json()["id"]))
+
+
+def _percentiles(samples: list) -> dict:
+    if len(samples) < 2:
+        value = round(samples[0] * 1000, 3) if samples else None
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": round(cuts[49] * 1000, 3), "p95_ms": round(cuts[94] * 1000, 3), "p99_ms": round(cuts[98] * 1000, 3)}
+
+
+def run_scenario(scenarios: Scenarios, name: str, requests: int, warmup: int, concurrency: int) -> dict:
+    build = getattr(scenarios, name)
+    client = scenarios.client
+    # create 的预热请求也会留下条目，delete 的请求数不会超过已创建的条目数
+    if name == "delete":
+        requests = min(requests, len(scenarios.created))
+        warmup = 0
+
+    def send(i: int):
+        method, url, kwargs = build(i)
+        started = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if response.status_code < 400:
+            scenarios.collect(name, i, response)
+        return elapsed, response.status_code < 400
+
+    for i in range(warmup):
+        send(requests + i)
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(send, range(requests)))
+    else:
+        outcomes = [send(i) for i in range(requests)]
+    wall = time.perf_counter() - started
+
+    samples = [elapsed for elapsed, ok in outcomes if ok]
+    return {
+        "requests": requests,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "throughput_rps": round(requests / wall, 1) if wall else None,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else None,
+        **_percentiles(samples),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_uvicorn():
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=dict(os.environ), stdout=sys.stderr,
+    )
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            client.get("/health").raise_for_status()
+            return server, client
+        except httpx.TransportError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.2)
+
+
+def measure_child(args) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    from app import database, migrations, models
+
+    dataset = DATASETS[args.child]
+    migrations.migrate(database.engine)
+    with database.SessionLocal() as db:
+        seeded = db.query(models.User).count() > 0
+    if not seeded:
+        summary = seed(database.engine, dataset, args.seed)
+        print(f"[{args.child}] seeded {summary['todos']} todos in {summary['elapsed_seconds']} s", file=sys.stderr)
+
+    if args.mode == "uvicorn":
+        server, client = _start_uvicorn()
+    else:
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        server, client = None, TestClient(app)
+        client.__enter__()
+    try:
+        scenarios = Scenarios(client, dataset["users"], dataset["todos_per_user"])
+        results = {}
+        selected = args.scenarios.split(",") if args.scenarios else SCENARIOS
+        for name in SCENARIOS:
+            if name in selected:
+                results[name] = run_scenario(scenarios, name, args.requests, args.warmup, args.concurrency)
+                print(f"[{args.child}] {name} done", file=sys.stderr)
+        return results
+    finally:
+        if server is None:
+            client.__exit__(None, None, None)
+        else:
+            client.close()
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def run_child(name: str, args, data_dir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(data_dir, f'{name}-{args.seed}.db')}"
+    env["ATTACHMENT_STORE_DIR"] = os.path.join(data_dir, f"{name}-{args.seed}-attachments")
+    if not args.cache:
+        for variable in CACHE_SIZE_VARIABLES:
+            env[variable] = "0"
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", name, "--mode", args.mode,
+        "--requests", str(args.requests), "--warmup", str(args.warmup),
+        "--concurrency", str(args.concurrency), "--seed", str(args.seed),
+    ]
+    if args.scenarios:
+        command += ["--scenarios", args.scenarios]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def same_host(results: dict, baseline: dict) -> bool:
+    meta = baseline.get("meta", {})
+    return all(meta.get(key) == results["meta"][key] for key in ("host", "machine", "cpus"))
+
+
+def speed_factor(results: dict, baseline: dict, metric: str) -> float:
+    # 两台机器（或同一台机器不同负载）之间的整体快慢：取所有场景耗时比值的中位数
+    ratios = [
+        current[metric] / reference[metric]
+        for dataset, scenarios in results["results"].items()
+        for name, current in scenarios.items()
+        for reference in [baseline.get("results", {}).get(dataset, {}).get(name)]
+        if reference and reference.get(metric) and current.get(metric)
+    ]
+    return statistics.median(ratios) if ratios else 1.0
+
+
+def compare(
+    results: dict, baseline: dict, metric: str, tolerance: float, min_delta_ms: float, factor: float = 1.0
+) -> list:
+    # 出错的场景直接判失败；其余只比较两边都有的 (数据集, 场景)。基线先乘以 factor 换算到本次运行的速度，
+    # 变慢超过容差且绝对差值超过 min_delta_ms 才算回归
+    regressions = []
+    for dataset, scenarios in results["results"].items():
+        for name, current in scenarios.items():
+            if current["errors"]:
+                regressions.append((dataset, name, f"{current['errors']} failed requests"))
+                continue
+            reference = baseline.get("results", {}).get(dataset, {}).get(name)
+            if reference is None or reference.get(metric) is None or current.get(metric) is None:
+                continue
+            expected = reference[metric] * factor
+            if current[metric] > expected * (1 + tolerance) and current[metric] - expected > min_delta_ms:
+                detail = f"{metric} {reference[metric]:.2f} -> {current[metric]:.2f} ms"
+                if factor != 1.0:
+                    detail += f" (expected {expected:.2f} ms after scaling by {factor:.2f})"
+                regressions.append((dataset, name, detail))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", default="small", help=f"comma-separated, from {', '.join(DATASETS)}")
+    parser.add_argument("--scenarios", help="comma-separated subset of the scenarios (default: all)")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true",
+                        help="keep the response, count and compression caches enabled (measures cache hits)")
+    parser.add_argument("--data-dir", help="keep seeded databases here and reuse them across runs")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against this results file and fail on regressions")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results to --baseline")
+    parser.add_argument("--metric", choices=("p50_ms", "p95_ms", "p99_ms"), default="p95_ms")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--relative", action="store_true",
+                        help="scale the baseline by the median slowdown even when it was recorded on this host")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_child(args)))
+        return
+
+    datasets = [name.strip() for name in args.datasets.split(",") if name.strip()]
+    unknown = set(datasets) - set(DATASETS)
+    if unknown:
+        parser.error(f"unknown datasets: {', '.join(sorted(unknown))}")
+
+    results = {
+        "meta": {
+            "mode": args.mode,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "cache": args.cache,
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+        },
+        "results": {},
+    }
+    for name in datasets:
+        if args.data_dir:
+            os.makedirs(args.data_dir, exist_ok=True)
+            results["results"][name] = run_child(name, args, args.data_dir)
+        else:
+            with tempfile.TemporaryDirectory() as data_dir:
+                results["results"][name] = run_child(name, args, data_dir)
+
+    for name, scenarios in results["results"].items():
+        dataset = DATASETS[name]
+        print(f"{name} ({dataset['users']} users x {dataset['todos_per_user']} todos, {args.mode}, "
+              f"concurrency {args.concurrency})")
+        for scenario, result in scenarios.items():
+            print(f"  {scenario:<18} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+                  f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}")
+    if args.json:
+        with open(args.json, "w") as result_file:
+            json.dump(results, result_file, indent=2)
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        mismatched = [key for key in ("mode", "requests", "concurrency", "cache")
+                      if baseline.get("meta", {}).get(key) != results["meta"][key]]
+        if mismatched:
+            print(f"warning: baseline was recorded with different settings ({', '.join(mismatched)})")
+        factor = 1.0
+        if args.relative or not same_host(results, baseline):
+            factor = speed_factor(results, baseline, args.metric)
+            reason = "--relative" if args.relative else "baseline was recorded on another host"
+            print(f"{reason}: comparing relative to the median slowdown ({factor:.2f}x)")
+        regressions = compare(results, baseline, args.metric, args.tolerance, args.min_delta_ms, factor)
+        for dataset, scenario, detail in regressions:
+            print(f"REGRESSION {dataset}/{scenario}: {detail} (tolerance {args.tolerance:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} ({args.metric}, tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
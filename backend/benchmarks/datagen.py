@@ -0,0 +1,532 @@
+"""Synthetic dataset generator.
+
+Fills ``users`` and ``todos`` in the database configured by ``DATABASE_URL``
+with realistic rows for scale testing:
+
+* every ``ItemType``, ``TaskStatus`` and ``Priority`` value
+* tags drawn from a Zipf-like distribution (a few tags on most todos, a long tail)
+* due dates around ``--anchor``, ``--overdue-rate`` of them in the past
+* markdown notes and diaries, ``--long-content-rate`` of them tens of KB long
+* optional attachments (``--attachment-rate``), stored once in the attachment
+  store and shared between todos
+
+Rows are written in batches without the ORM: ``COPY`` on PostgreSQL
+(psycopg2), a driver-level ``executemany`` on SQLite. Per-user counters and
+change sequences are kept consistent through ``stats.record_groups``, the
+same way ``POST /todos/import`` does it. On SQLite the full-text index trigger
+is dropped during the load and the index rebuilt once at the end.
+
+The number of todos per user follows ``--todos-per-user``:
+
+* ``fixed:N``
+* ``uniform:LOW:HIGH``
+* ``lognormal:MEDIAN:SIGMA``  -- most users small, some large (default ``lognormal:200:1``)
+* ``pareto:MIN:ALPHA``        -- heavy tail; ``ALPHA`` around 1.2 gives a few huge accounts
+
+The same ``--seed``, ``--anchor`` and options produce the same rows; each user
+has its own random stream, so batch size does not change the data.
+
+Usage (from the backend directory)::
+
+    python benchmarks/datagen.py --users 1000 [--todos-per-user lognormal:200:1] [--seed 42]
+                                 [--max-todos-per-user 50000] [--prefix user] [--password password123]
+                                 [--overdue-rate 0.2] [--long-content-rate 0.05]
+                                 [--attachment-rate 0] [--attachment-kb 64] [--attachment-pool 32]
+                                 [--anchor 2026-01-01] [--batch-size 5000] [--json summary.json]
+"""
+import argparse
+import base64
+import csv
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATUSES = (("TODO", 40), ("DOING", 20), ("DONE", 40))
+PRIORITIES = (("LOW", 25), ("MEDIUM", 45), ("HIGH", 22), ("URGENT", 8))
+TYPES = (("TASK", 60), ("NOTE", 25), ("DIARY", 15))
+
+# 标签按排名取 1/rank^TAG_SKEW 的权重：前几个标签覆盖大部分条目，后面是长尾
+TAG_SKEW = 1.1
+TAGS = (
+    "work", "personal", "urgent", "home", "学习", "project-x", "meeting", "reading", "health", "finance",
+    "工作", "travel", "family", "shopping", "ideas", "bug", "release", "review", "design", "research",
+    "writing", "运动", "cooking", "garden", "music", "learning", "ops", "backend", "frontend", "mobile",
+    "q1", "q2", "q3", "q4", "later", "someday", "waiting", "delegated", "errands", "car",
+    "读书笔记", "旅行", "育儿", "投资", "side-project", "conference", "hiring", "onboarding", "docs", "infra",
+)
+WORDS = (
+    "report", "meeting", "invoice", "review", "travel", "release", "budget", "draft", "call", "plan",
+    "update", "fix", "prepare", "schedule", "follow", "deploy", "clean", "book", "order", "write",
+    "整理", "准备", "会议", "周报", "预算", "发布", "复盘", "需求", "设计", "测试",
+    "采购", "报销", "学习", "阅读", "健身", "体检", "搬家", "装修", "面试", "培训",
+)
+COLUMNS = (
+    "title", "description", "status", "priority", "due_date", "tags", "type", "content",
+    "attachments", "created_at", "updated_at", "user_id", "version", "change_seq",
+)
+ATTACHMENT_TYPES = ("image/png", "application/pdf", "text/plain")
+
+
+class Distribution:
+    # 每个用户的 todo 数量分布，见模块说明
+    KINDS = {"fixed": 1, "uniform": 2, "lognormal": 2, "pareto": 2}
+
+    def __init__(self, spec: str, maximum: int):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown distribution {kind!r}, expected one of {', '.join(self.KINDS)}")
+        try:
+            self.params = [float(value) for value in params.split(":")] if params else []
+        except ValueError:
+            raise ValueError(f"invalid distribution parameters in {spec!r}") from None
+        if len(self.params) != self.KINDS[kind]:
+            raise ValueError(f"{kind} takes {self.KINDS[kind]} parameters: {spec!r}")
+        self.kind = kind
+        self.spec = spec
+        self.maximum = maximum
+
+    def sample(self, rng: random.Random) -> int:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(self.params[0], self.params[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(max(self.params[0], 1)), self.params[1])
+        else:
+            value = self.params[0] * rng.paretovariate(self.params[1])
+        return max(0, min(self.maximum, int(value)))
+
+
+def username(prefix: str, index: int) -> str:
+    return f"{prefix}{index:07d}"
+
+
+def _weighted(pairs):
+    return [value for value, _ in pairs], list(accumulate(weight for _, weight in pairs))
+
+
+def _pick(rng: random.Random, values, cum_weights):
+    return values[bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+
+_STATUS_VALUES, _STATUS_WEIGHTS = _weighted(STATUSES)
+_PRIORITY_VALUES, _PRIORITY_WEIGHTS = _weighted(PRIORITIES)
+_TYPE_VALUES, _TYPE_WEIGHTS = _weighted(TYPES)
+_TAG_WEIGHTS = list(accumulate(1 / rank ** TAG_SKEW for rank in range(1, len(TAGS) + 1)))
+_TAG_COUNTS, _TAG_COUNT_WEIGHTS = _weighted(((0, 15), (1, 35), (2, 30), (3, 15), (4, 5)))
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def _markdown_section(rng: random.Random) -> str:
+    parts = [f"## {_sentence(rng, 3)}\n",
+             " ".join(_sentence(rng, rng.randint(8, 20)) + "." for _ in range(rng.randint(2, 5))) + "\n"]
+    kind = rng.random()
+    if kind < 0.4:
+        parts.append("\n".join(f"- [{'x' if rng.random() < 0.5 else ' '}] {_sentence(rng, 4)}"
+                               for _ in range(rng.randint(2, 6))) + "\n")
+    elif kind < 0.6:
+        parts.append("```python\n" + "\n".join(
+            f"{rng.choice(WORDS[:20])}_{line} = {rng.randint(0, 999)}" for line in range(rng.randint(3, 12))
+        ) + "\n```\n")
+    elif kind < 0.75:
+        parts.append(f"> {_sentence(rng, 12)}\n")
+    return "\n".join(parts)
+
+
+def _attachment_pool(seed: int, count: int, size_kb: int) -> List[str]:
+    rng = random.Random(f"{seed}:attachments")
+    pool = []
+    for index in range(count):
+        media_type = ATTACHMENT_TYPES[index % len(ATTACHMENT_TYPES)]
+        size = max(1, int(size_kb * 1024 * rng.uniform(0.5, 1.5)))
+        payload = base64.b64encode(rng.randbytes(size)).decode("ascii")
+        pool.append(f"data:{media_type};base64,{payload}")
+    return pool
+
+
+class TodoFactory:
+    # 文本从按种子预先生成的短语和 markdown 段落中组合，逐词随机生成会让生成本身成为瓶颈
+    PHRASES = 4096
+    SECTIONS = 1024
+
+    def __init__(self, seed: int, anchor: datetime, history_days: int, overdue_rate: float,
+                 long_content_rate: float, attachment_rate: float, attachment_refs: List[str]):
+        self.anchor = anchor
+        self.history_seconds = history_days * 86400
+        self.overdue_rate = overdue_rate
+        self.long_content_rate = long_content_rate
+        self.attachment_rate = attachment_rate if attachment_refs else 0.0
+        self.attachment_refs = attachment_refs
+        self.attachment_uses = defaultdict(int)
+        rng = random.Random(f"{seed}:text")
+        self.titles = [_sentence(rng, rng.randint(2, 6)) for _ in range(self.PHRASES)]
+        self.sentences = [_sentence(rng, rng.randint(5, 25)) for _ in range(self.PHRASES)]
+        self.sections = [_markdown_section(rng) for _ in range(self.SECTIONS)]
+
+    def _markdown(self, rng: random.Random, sections: int) -> str:
+        return "\n".join(rng.choices(self.sections, k=sections))
+
+    def rows(self, rng: random.Random, user_id: int, count: int):
+        # 同一用户的创建时间单调递增，与真实数据的写入顺序一致
+        offsets = sorted(rng.random() * self.history_seconds for _ in range(count))
+        phrases = len(self.titles)
+        for index, offset in enumerate(offsets):
+            item_type = _pick(rng, _TYPE_VALUES, _TYPE_WEIGHTS)
+            status = _pick(rng, _STATUS_VALUES, _STATUS_WEIGHTS)
+            created_at = self.anchor - timedelta(seconds=self.history_seconds - offset)
+            updated_at = None
+            if status != "TODO" or rng.random() < 0.3:
+                updated_at = min(self.anchor, created_at + timedelta(seconds=rng.random() * 14 * 86400))
+
+            due_date = None
+            if item_type == "TASK" and rng.random() < 0.7:
+                if rng.random() < self.overdue_rate:
+                    due_date = self.anchor - timedelta(days=rng.uniform(0.1, 60))
+                else:
+                    due_date = self.anchor + timedelta(days=rng.uniform(0.1, 90))
+
+            if item_type == "TASK":
+                content = self.sentences[int(rng.random() * phrases)] if rng.random() < 0.3 else None
+            elif rng.random() < self.long_content_rate:
+                content = self._markdown(rng, rng.randint(40, 120))
+            else:
+                content = self._markdown(rng, rng.randint(1, 6))
+
+            tag_count = _pick(rng, _TAG_COUNTS, _TAG_COUNT_WEIGHTS)
+            tags = ",".join(dict.fromkeys(rng.choices(TAGS, cum_weights=_TAG_WEIGHTS, k=tag_count))) or None
+
+            attachments = None
+            if self.attachment_rate and rng.random() < self.attachment_rate:
+                attachments = rng.sample(self.attachment_refs, min(len(self.attachment_refs), rng.randint(1, 3)))
+                for ref in attachments:
+                    self.attachment_uses[ref] += 1
+
+            yield [
+                f"{self.titles[int(rng.random() * phrases)]} #{index + 1}",
+                self.sentences[int(rng.random() * phrases)] if rng.random() < 0.5 else None,
+                status,
+                _pick(rng, _PRIORITY_VALUES, _PRIORITY_WEIGHTS),
+                due_date,
+                tags,
+                item_type,
+                content,
+                attachments,
+                created_at,
+                updated_at,
+                user_id,
+                1 if updated_at is None else rng.randint(2, 6),
+                0,
+            ]
+
+
+def _sqlite_writer(connection):
+    # 跳过 SQLAlchemy 的逐值类型处理，按 SQLite 方言的存储格式直接交给驱动
+    def value(item):
+        if isinstance(item, datetime):
+            return item.strftime("%Y-%m-%d %H:%M:%S.%f")
+        if isinstance(item, list):
+            return json.dumps(item)
+        return item
+
+    statement = f"INSERT INTO todos ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+    def write(rows):
+        connection.exec_driver_sql(statement, [tuple(value(item) for item in row) for row in rows])
+
+    return write
+
+
+def _copy_writer(connection):
+    statement = f"COPY todos ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+    def write(rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                "" if item is None
+                else item.isoformat() if isinstance(item, datetime)
+                else json.dumps(item) if isinstance(item, list)
+                else item
+                for item in row
+            ])
+        buffer.seek(0)
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(statement, buffer)
+        finally:
+            cursor.close()
+
+    return write
+
+
+def _insert_writer(connection):
+    from sqlalchemy import insert
+
+    from app import models
+
+    def write(rows):
+        connection.execute(insert(models.Todo), [dict(zip(COLUMNS, row)) for row in rows])
+
+    return write
+
+
+def _writer_for(connection):
+    dialect = connection.dialect
+    if dialect.name == "sqlite":
+        return _sqlite_writer(connection), "executemany"
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        return _copy_writer(connection), "copy"
+    return _insert_writer(connection), "insert"
+
+
+def _drop_sqlite_search_trigger(engine) -> bool:
+    from sqlalchemy import text
+
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'todos_fts_ai'")
+        ).first()
+        if exists:
+            connection.execute(text("DROP TRIGGER todos_fts_ai"))
+    return exists is not None
+
+
+def _restore_sqlite_search_index(engine) -> None:
+    from sqlalchemy import text
+
+    from app import search
+
+    # 重新创建触发器，再对全表重建一次索引
+    search.ensure_search_index(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')"))
+
+
+class Progress:
+    def __init__(self, total: int, interval: float, out=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.out = out
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.done = 0
+
+    def update(self, rows: int, users: int, total_users: int, force: bool = False) -> None:
+        self.done += rows
+        now = time.perf_counter()
+        if self.interval <= 0 or (not force and now - self.last < self.interval):
+            return
+        self.last = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed else 0
+        eta = (self.total - self.done) / rate if rate else 0
+        percent = self.done / self.total * 100 if self.total else 100
+        print(f"users {users}/{total_users}  todos {self.done}/{self.total} ({percent:.1f}%)  "
+              f"{rate:,.0f} rows/s  eta {eta:.0f} s", file=self.out, flush=True)
+
+
+def generate(
+    engine,
+    users: int,
+    todos_per_user: str = "lognormal:200:1",
+    max_todos_per_user: int = 50_000,
+    seed: int = 42,
+    prefix: str = "user",
+    password: str = "password123",
+    anchor: Optional[datetime] = None,
+    history_days: int = 365,
+    overdue_rate: float = 0.2,
+    long_content_rate: float = 0.05,
+    attachment_rate: float = 0.0,
+    attachment_kb: int = 64,
+    attachment_pool: int = 32,
+    batch_size: int = 5000,
+    progress_interval: float = 2.0,
+    hashed_password: Optional[str] = None,
+    out=sys.stderr,
+) -> dict:
+    """Generate ``users`` users and their todos; returns a summary of what was written."""
+    from sqlalchemy import func, insert, select, update
+    from sqlalchemy.orm import Session
+
+    from app import attachments, auth, models, stats
+
+    distribution = Distribution(todos_per_user, max_todos_per_user)
+    anchor = anchor or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(seed)
+    sizes = [distribution.sample(rng) for _ in range(users)]
+    total = sum(sizes)
+    started = time.perf_counter()
+
+    with Session(engine) as db:
+        taken = db.execute(
+            select(func.count()).select_from(models.User).where(models.User.username.like(f"{prefix}%"))
+        ).scalar()
+        if taken:
+            raise ValueError(f"{taken} users named {prefix}* already exist, choose another --prefix")
+        # 所有用户共用一个密码哈希：bcrypt 每次约数十毫秒，逐个计算会成为瓶颈
+        hashed_password = hashed_password or auth.get_password_hash(password)
+        user_rows = [
+            {"username": username(prefix, index), "email": f"{username(prefix, index)}@example.com",
+             "hashed_password": hashed_password, "created_at": anchor - timedelta(days=history_days)}
+            for index in range(users)
+        ]
+        for offset in range(0, users, batch_size):
+            db.execute(insert(models.User), user_rows[offset:offset + batch_size])
+        user_ids = dict(db.execute(
+            select(models.User.username, models.User.id).where(models.User.username.like(f"{prefix}%"))
+        ).all())
+
+        attachment_refs = []
+        if attachment_rate > 0 and attachment_pool > 0:
+            for value in _attachment_pool(seed, attachment_pool, attachment_kb):
+                attachment_refs.extend(attachments.store(db, [value]))
+        db.commit()
+
+    factory = TodoFactory(seed, anchor, history_days, overdue_rate, long_content_rate, attachment_rate, attachment_refs)
+    drop_trigger = engine.dialect.name == "sqlite"
+    dropped = drop_trigger and _drop_sqlite_search_trigger(engine)
+    progress = Progress(total, progress_interval, out)
+    method = None
+    try:
+        with Session(engine) as db:
+            batch: List[list] = []
+
+            def flush() -> None:
+                nonlocal method
+                groups = defaultdict(lambda: defaultdict(int))
+                for row in batch:
+                    groups[row[11]][(row[2], row[6])] += 1
+                # 与导入相同：先按分组更新计数并取得 change_seq，再写入本批 todo
+                change_seqs = {user_id: stats.record_groups(db, user_id, user_groups)
+                               for user_id, user_groups in groups.items()}
+                for row in batch:
+                    row[13] = change_seqs[row[11]]
+                write, method = _writer_for(db.connection())
+                write(batch)
+                db.commit()
+
+            for index, size in enumerate(sizes):
+                user_id = user_ids[username(prefix, index)]
+                for row in factory.rows(random.Random(f"{seed}:{index}"), user_id, size):
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        flush()
+                        progress.update(len(batch), index + 1, users)
+                        batch = []
+            if batch:
+                flush()
+                progress.update(len(batch), users, users, force=True)
+
+            # 附件先各存一份（引用计数 1），这里补上其余的引用
+            for ref, uses in factory.attachment_uses.items():
+                if uses > 1:
+                    db.execute(
+                        update(models.AttachmentBlob)
+                        .where(models.AttachmentBlob.digest == ref[len(attachments.REF_PREFIX):])
+                        .values(ref_count=models.AttachmentBlob.ref_count + uses - 1)
+                    )
+            db.commit()
+        load_seconds = time.perf_counter() - started
+    finally:
+        if dropped:
+            _restore_sqlite_search_index(engine)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "users": users,
+        "todos": total,
+        "distribution": distribution.spec,
+        "largest_user": max(sizes, default=0),
+        "seed": seed,
+        "anchor": anchor.isoformat(),
+        "method": method,
+        "attachments": sum(factory.attachment_uses.values()),
+        "load_seconds": round(load_seconds, 2),
+        "index_seconds": round(elapsed - load_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round(total / load_seconds, 1) if load_seconds else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, required=True)
+    parser.add_argument("--todos-per-user", default="lognormal:200:1", help="size distribution, see above")
+    parser.add_argument("--max-todos-per-user", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="user", help="username prefix; must not be in use yet")
+    parser.add_argument("--password", default="password123", help="password shared by all generated users")
+    parser.add_argument("--anchor", help="reference date (YYYY-MM-DD, UTC) for due and created dates; default today")
+    parser.add_argument("--history-days", type=int, default=365, help="spread created_at over this many days")
+    parser.add_argument("--overdue-rate", type=float, default=0.2, help="share of due dates in the past")
+    parser.add_argument("--long-content-rate", type=float, default=0.05, help="share of notes/diaries with long markdown")
+    parser.add_argument("--attachment-rate", type=float, default=0.0, help="share of todos with attachments")
+    parser.add_argument("--attachment-kb", type=int, default=64, help="average attachment size")
+    parser.add_argument("--attachment-pool", type=int, default=32, help="distinct attachment blobs to share")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per transaction")
+    parser.add_argument("--progress", type=float, default=2.0, help="seconds between progress lines, 0 to disable")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from app import database, migrations
+    from app.logs import setup_logging
+
+    setup_logging()
+    try:
+        Distribution(args.todos_per_user, args.max_todos_per_user)
+    except ValueError as e:
+        parser.error(str(e))
+    anchor = None
+    if args.anchor:
+        anchor = datetime.strptime(args.anchor, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    migrations.migrate(database.engine)
+    try:
+        summary = generate(
+            database.engine,
+            users=args.users,
+            todos_per_user=args.todos_per_user,
+            max_todos_per_user=args.max_todos_per_user,
+            seed=args.seed,
+            prefix=args.prefix,
+            password=args.password,
+            anchor=anchor,
+            history_days=args.history_days,
+            overdue_rate=args.overdue_rate,
+            long_content_rate=args.long_content_rate,
+            attachment_rate=args.attachment_rate,
+            attachment_kb=args.attachment_kb,
+            attachment_pool=args.attachment_pool,
+            batch_size=args.batch_size,
+            progress_interval=args.progress,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"generated {summary['users']} users and {summary['todos']} todos ({summary['distribution']}, "
+          f"largest {summary['largest_user']}) via {summary['method']}: "
+          f"{summary['rows_per_second']:,.0f} rows/s, load {summary['load_seconds']} s, "
+          f"index {summary['index_seconds']} s")
+    if args.json:
+        with open(args.json, "w") as summary_file:
+            json.dump(summary, summary_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
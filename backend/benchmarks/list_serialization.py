@@ -0,0 +1,129 @@
+"""List page serialization benchmark.
+
+Builds the same ``GET /todos/`` page two ways from one seeded SQLite database
+and checks that both produce identical bytes:
+
+* pydantic -- ORM ``Todo`` objects validated into ``schemas.TodoListResponse``
+  and encoded the way FastAPI encodes ``response_model`` results (the read path
+  used before the ORM-free rewrite)
+* rows     -- column rows turned into dicts by ``projections.to_dict`` and
+  encoded with ``serialization.dumps`` (the current read path)
+
+Usage (from the backend directory)::
+
+    python benchmarks/list_serialization.py [--todos 2000] [--limit 100] [--rounds 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(engine, models, count: int) -> None:
+    from sqlalchemy import insert
+
+    with engine.begin() as connection:
+        connection.execute(insert(models.User), [{"username": "bench", "email": "bench@example.com", "hashed_password": "x"}])
+        connection.execute(insert(models.Todo), [
+            {
+                "title": f"待办 {index}",
+                "description": f"description {index}",
+                "content": "正文 content " * 20,
+                "tags": "work,bench",
+                "user_id": 1,
+            }
+            for index in range(count)
+        ])
+
+
+def pydantic_page(db, models, schemas, projections, selected, limit: int) -> bytes:
+    from sqlalchemy.orm import load_only
+
+    query = db.query(models.Todo).filter(models.Todo.user_id == 1)
+    if selected != projections.FULL_FIELDS:
+        query = query.options(load_only(*[getattr(models.Todo, field) for field in selected if field in projections.FULL_FIELDS]))
+    if "preview" in selected:
+        query = query.add_columns(projections.preview_column())
+    rows = query.order_by(models.Todo.created_at.desc(), models.Todo.id.desc()).limit(limit).all()
+
+    items = []
+    for row in rows:
+        todo = row if selected == projections.FULL_FIELDS else row.Todo
+        if selected == projections.FULL_FIELDS:
+            items.append(schemas.TodoListItem.model_validate(todo))
+        else:
+            items.append(schemas.TodoListItem(**{
+                field: row.preview if field == "preview" else getattr(todo, field) for field in selected
+            }))
+    response = schemas.TodoListResponse(
+        todos=items, total=None, page=1, per_page=limit, total_pages=None, next_cursor=None, highlights=None
+    )
+    content = response.model_dump(mode="json", exclude_unset=True)
+    # Starlette JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def rows_page(db, models, projections, serialization, selected, limit: int) -> bytes:
+    rows = (
+        db.query(models.Todo).filter(models.Todo.user_id == 1)
+        .with_entities(*projections.columns(selected))
+        .order_by(models.Todo.created_at.desc(), models.Todo.id.desc())
+        .limit(limit).all()
+    )
+    return serialization.dumps({
+        "todos": [projections.to_dict(row, selected) for row in rows],
+        "total": None,
+        "page": 1,
+        "per_page": limit,
+        "total_pages": None,
+        "next_cursor": None,
+        "highlights": None,
+    })
+
+
+def timed(func, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    database_dir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(database_dir, 'bench.db')}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+    from app import database, migrations, models, projections, schemas, serialization
+
+    migrations.migrate(database.engine)
+    seed(database.engine, models, args.todos)
+
+    print(f"{args.limit} items per page, median of {args.rounds} rounds (json backend: "
+          f"{'orjson' if serialization.orjson else 'stdlib'})")
+    for name, selected in (("summary", projections.SUMMARY_FIELDS), ("full", projections.FULL_FIELDS)):
+        with database.SessionLocal() as db:
+            legacy = pydantic_page(db, models, schemas, projections, selected, args.limit)
+            current = rows_page(db, models, projections, serialization, selected, args.limit)
+            if legacy != current:
+                sys.exit(f"{name}: serialized output differs")
+            legacy_ms = timed(lambda: pydantic_page(db, models, schemas, projections, selected, args.limit), args.rounds)
+            current_ms = timed(lambda: rows_page(db, models, projections, serialization, selected, args.limit), args.rounds)
+        print(f"  {name:<8} pydantic {legacy_ms:>8.3f} ms  rows {current_ms:>8.3f} ms  "
+              f"x{legacy_ms / current_ms:.1f}  identical ({len(current)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
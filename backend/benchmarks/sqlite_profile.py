@@ -0,0 +1,146 @@
+"""SQLite profile benchmark.
+
+Runs the same mixed workload against a fresh SQLite file once per
+``SQLITE_PROFILE`` (``default`` and ``production``), each in its own
+interpreter so the engine is configured from scratch:
+
+* writers -- threads creating todos the way ``POST /todos/`` does
+  (counter update + insert + commit)
+* readers -- threads selecting the first list page (50 rows by created_at)
+
+and reports throughput, "database is locked" errors and the p95 latency of
+each operation, plus the duration of one maintenance run for the production
+profile.
+
+Usage (from the backend directory)::
+
+    python benchmarks/sqlite_profile.py [--writers 4] [--readers 8] [--seconds 5] [--dir DIR] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ("default", "production")
+
+
+def _p95(samples: list) -> float:
+    if len(samples) < 2:
+        return round(samples[0] * 1000, 2) if samples else 0.0
+    return round(statistics.quantiles(samples, n=20)[-1] * 1000, 2)
+
+
+def measure_child(writers: int, readers: int, seconds: float) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert, select
+    from sqlalchemy.exc import OperationalError
+
+    from app import database, migrations, models, schemas, sqlite_profile, stats
+
+    migrations.migrate(database.engine)
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.User), [{"username": "bench", "email": "bench@example.com", "hashed_password": "x"}])
+        connection.execute(insert(models.Todo), [{"title": f"seed {index}", "user_id": 1} for index in range(2000)])
+
+    deadline = time.perf_counter() + seconds
+    results = {"write": [], "read": [], "write_errors": 0, "read_errors": 0}
+    lock = threading.Lock()
+
+    def write() -> None:
+        with database.SessionLocal() as db:
+            change_seq = stats.record_create(db, 1, schemas.TaskStatus.TODO, schemas.ItemType.TASK)
+            db.add(models.Todo(title="bench", user_id=1, change_seq=change_seq))
+            db.commit()
+
+    def read() -> None:
+        with database.SessionLocal() as db:
+            db.execute(
+                select(models.Todo.id, models.Todo.title, models.Todo.status, models.Todo.created_at)
+                .where(models.Todo.user_id == 1)
+                .order_by(models.Todo.created_at.desc(), models.Todo.id.desc())
+                .limit(50)
+            ).all()
+
+    def worker(kind: str, operation) -> None:
+        samples, errors = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                operation()
+                samples.append(time.perf_counter() - started)
+            except OperationalError:
+                errors += 1
+        with lock:
+            results[kind].extend(samples)
+            results[f"{kind}_errors"] += errors
+
+    threads = [threading.Thread(target=worker, args=("write", write)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=("read", read)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = {
+        "writes_per_second": round(len(results["write"]) / seconds, 1),
+        "reads_per_second": round(len(results["read"]) / seconds, 1),
+        "write_errors": results["write_errors"],
+        "read_errors": results["read_errors"],
+        "write_p95_ms": _p95(results["write"]),
+        "read_p95_ms": _p95(results["read"]),
+    }
+    if sqlite_profile.is_production():
+        summary["maintenance_ms"] = sqlite_profile.run_maintenance(database.engine)["duration_ms"]
+        summary["writer_lane"] = sqlite_profile.writer_lane.stats()
+    return summary
+
+
+def run_child(profile: str, args) -> dict:
+    with tempfile.TemporaryDirectory(dir=args.dir) as database_dir:
+        env = dict(os.environ)
+        env.setdefault("LOG_LEVEL", "WARNING")
+        env["SQLITE_PROFILE"] = profile
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(database_dir, 'bench.db')}"
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child",
+             "--writers", str(args.writers), "--readers", str(args.readers), "--seconds", str(args.seconds)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--dir", help="create the database files here (use a real disk, not tmpfs)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_child(args.writers, args.readers, args.seconds)))
+        return
+
+    results = {profile: run_child(profile, args) for profile in PROFILES}
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g} s")
+    for profile, result in results.items():
+        print(f"  {profile:<10} writes/s {result['writes_per_second']:>8.1f}  reads/s {result['reads_per_second']:>8.1f}  "
+              f"write p95 {result['write_p95_ms']:>7.2f} ms  read p95 {result['read_p95_ms']:>7.2f} ms  "
+              f"locked errors {result['write_errors'] + result['read_errors']}")
+    if "maintenance_ms" in results["production"]:
+        print(f"  maintenance run {results['production']['maintenance_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, "w") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
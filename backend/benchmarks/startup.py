@@ -0,0 +1,127 @@
+"""Startup-time benchmark.
+
+Every run starts a fresh interpreter and measures:
+
+* import_ms         -- ``import app.main``
+* startup_ms        -- running the lifespan startup (migrations)
+* first_health_ms   -- first ``GET /health``
+* first_register_ms -- first ``POST /auth/register`` (includes hasher initialization)
+* first_login_ms    -- first ``POST /auth/login``
+* first_list_ms     -- first ``GET /todos/``
+
+Each run is measured against an empty database ("cold") and again against the
+already migrated database ("warm").
+
+Usage (from the backend directory)::
+
+    python benchmarks/startup.py [--runs 5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS = ("import_ms", "startup_ms", "first_health_ms", "first_register_ms", "first_login_ms", "first_list_ms")
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def measure_child(username: str) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    result = {}
+
+    start = time.perf_counter()
+    from app.main import app
+    result["import_ms"] = _elapsed_ms(start)
+
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    start = time.perf_counter()
+    client.__enter__()
+    result["startup_ms"] = _elapsed_ms(start)
+    try:
+        start = time.perf_counter()
+        client.get("/health").raise_for_status()
+        result["first_health_ms"] = _elapsed_ms(start)
+
+        credentials = {"username": username, "password": "benchmark-password"}
+        start = time.perf_counter()
+        client.post("/auth/register", json={**credentials, "email": f"{username}@example.com"}).raise_for_status()
+        result["first_register_ms"] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        response = client.post("/auth/login", json=credentials)
+        response.raise_for_status()
+        result["first_login_ms"] = _elapsed_ms(start)
+
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        start = time.perf_counter()
+        client.get("/todos/", headers=headers).raise_for_status()
+        result["first_list_ms"] = _elapsed_ms(start)
+    finally:
+        client.__exit__(None, None, None)
+    return result
+
+
+def run_child(database_dir: str, username: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(database_dir, 'startup.db')}"
+    env["ATTACHMENT_STORE_DIR"] = os.path.join(database_dir, "attachments")
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", username],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list) -> dict:
+    summary = {}
+    for metric in METRICS:
+        values = [sample[metric] for sample in samples]
+        summary[metric] = {
+            "median": round(statistics.median(values), 2),
+            "min": min(values),
+            "max": max(values),
+        }
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_child(args.child)))
+        return
+
+    cold, warm = [], []
+    for run in range(args.runs):
+        with tempfile.TemporaryDirectory() as database_dir:
+            cold.append(run_child(database_dir, f"cold{run}"))
+            warm.append(run_child(database_dir, f"warm{run}"))
+
+    summary = {"runs": args.runs, "cold": summarize(cold), "warm": summarize(warm)}
+    for phase in ("cold", "warm"):
+        print(f"{phase}:")
+        for metric in METRICS:
+            stats = summary[phase][metric]
+            print(f"  {metric:<18} median {stats['median']:>8.2f}  min {stats['min']:>8.2f}  max {stats['max']:>8.2f}")
+    if args.json:
+        with open(args.json, "w") as result_file:
+            json.dump(summary, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import itertools
+import os
+import sys
+import tempfile
+
+# 应用在导入时读取配置，必须在导入 app 之前指向临时数据库和附件目录
+_DATA_DIR = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DATA_DIR, 'test.db')}")
+os.environ.setdefault("ATTACHMENT_STORE_DIR", os.path.join(_DATA_DIR, "attachments"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.main import app
+
+_usernames = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+def register(client, username=None, password="secret123"):
+    # 注册并登录一个新用户，返回 (用户名, 认证头)
+    username = username or f"user{next(_usernames)}"
+    response = client.post(
+        "/auth/register", json={"username": username, "email": f"{username}@example.com", "password": password}
+    )
+    assert response.status_code == 200, response.text
+    response = client.post("/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return username, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user(client):
+    return register(client)[1]
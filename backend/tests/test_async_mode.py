@@ -0,0 +1,79 @@
+import base64
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import database
+
+async_only = pytest.mark.skipif(not database.DATABASE_ASYNC, reason="runs in the DATABASE_ASYNC=true subprocess")
+
+
+@pytest.mark.skipif(database.DATABASE_ASYNC, reason="already running in async mode")
+def test_suite_passes_in_async_mode(tmp_path):
+    # 同步/异步模式在导入应用时决定，另起一个进程以 DATABASE_ASYNC=true 重跑整个测试集
+    env = {
+        **os.environ,
+        "DATABASE_ASYNC": "true",
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'async.db'}",
+        "ATTACHMENT_STORE_DIR": str(tmp_path / "attachments"),
+    }
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", tests_dir],
+        cwd=os.path.dirname(tests_dir), env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout[-4000:] + result.stderr[-4000:]
+
+
+@pytest.fixture
+def async_user(client, user):
+    assert database.AsyncSessionLocal is not None
+    return user
+
+
+@async_only
+def test_crud_round_trip(client, async_user):
+    created = client.post("/todos/", json={"title": "async todo", "priority": "HIGH"}, headers=async_user)
+    assert created.status_code == 200, created.text
+    todo_id = created.json()["id"]
+
+    updated = client.put(f"/todos/{todo_id}", json={"status": "DONE"}, headers=async_user)
+    assert updated.status_code == 200, updated.text
+    todo = client.get(f"/todos/{todo_id}", headers=async_user).json()
+    assert (todo["title"], todo["status"], todo["priority"]) == ("async todo", "DONE", "HIGH")
+
+    assert client.delete(f"/todos/{todo_id}", headers=async_user).status_code == 200
+    assert client.get(f"/todos/{todo_id}", headers=async_user).status_code == 404
+
+
+@async_only
+def test_list_round_trip(client, async_user):
+    for index in range(3):
+        client.post("/todos/", json={"title": f"listed {index}", "status": "DONE" if index else "TODO"}, headers=async_user)
+
+    page = client.get("/todos/?limit=2", headers=async_user).json()
+    assert page["total"] == 3
+    assert [todo["title"] for todo in page["todos"]] == ["listed 2", "listed 1"]
+    rest = client.get(f"/todos/?limit=2&cursor={page['next_cursor']}", headers=async_user).json()
+    assert [todo["title"] for todo in rest["todos"]] == ["listed 0"]
+
+    done = client.get("/todos/?status=DONE", headers=async_user).json()
+    assert done["total"] == 2
+    assert client.get("/todos/stats", headers=async_user).json()["total"] == 3
+
+
+@async_only
+def test_attachment_round_trip(client, async_user):
+    attachment = f"data:text/plain;base64,{base64.b64encode(b'async attachment').decode()}"
+    created = client.post("/todos/", json={"title": "with file", "attachments": [attachment]}, headers=async_user)
+    assert created.status_code == 200, created.text
+    todo_id = created.json()["id"]
+
+    assert client.get(f"/todos/{todo_id}", headers=async_user).json()["attachments"] == [attachment]
+
+    second = f"data:text/plain;base64,{base64.b64encode(b'second attachment').decode()}"
+    updated = client.put(f"/todos/{todo_id}", json={"attachments": [second, attachment]}, headers=async_user)
+    assert updated.json()["attachments"] == [second, attachment]
+    assert client.get(f"/todos/{todo_id}", headers=async_user).json()["attachments"] == [second, attachment]
@@ -0,0 +1,104 @@
+import base64
+import os
+import threading
+import uuid
+
+from sqlalchemy import event, select
+
+from app import attachments, database, models
+from app.database import SessionLocal
+
+from .conftest import register
+
+_blobs = models.AttachmentBlob.__table__
+
+
+def _ref_count(db, ref):
+    digest = ref[len(attachments.REF_PREFIX):]
+    return db.execute(select(_blobs.c.ref_count).where(_blobs.c.digest == digest)).scalar()
+
+
+def _unreferenced_blob(db, value):
+    [ref] = attachments.store(db, [value])
+    db.commit()
+    attachments.release(db, [ref])
+    db.commit()
+    return ref
+
+
+def test_store_during_garbage_collection_keeps_blob(client, db, monkeypatch):
+    # GC 删除行与删除文件之间，另一个事务重新写入同一内容：文件不能被删掉
+    value = f"attachment-{uuid.uuid4()}"
+    ref = _unreferenced_blob(db, value)
+    stored = {}
+    adding_reference = threading.Event()
+
+    def signal_reference(conn, cursor, statement, parameters, context, executemany):
+        # 写入方发出加引用的 INSERT 时通知 GC 继续；此时 GC 尚未提交，INSERT 会等它提交
+        if threading.current_thread() is stored.get("writer") and statement.startswith("INSERT INTO attachment_blobs"):
+            adding_reference.set()
+
+    def store_again():
+        with SessionLocal() as session:
+            stored["refs"] = attachments.store(session, [value])
+            session.commit()
+
+    original_remove = os.remove
+
+    def remove_while_storing(path):
+        stored["writer"] = threading.Thread(target=store_again)
+        stored["writer"].start()
+        adding_reference.wait()
+        original_remove(path)
+
+    event.listen(database.engine, "before_cursor_execute", signal_reference)
+    monkeypatch.setattr(os, "remove", remove_while_storing)
+    try:
+        attachments.collect_garbage(db)
+    finally:
+        monkeypatch.setattr(os, "remove", original_remove)
+        event.remove(database.engine, "before_cursor_execute", signal_reference)
+    stored["writer"].join()
+
+    assert stored["refs"] == [ref]
+    db.expire_all()
+    assert _ref_count(db, ref) == 1
+    assert attachments.resolve([ref]) == [value]
+
+
+def test_garbage_collection_removes_blob_left_by_rollback(client, db):
+    value = f"attachment-{uuid.uuid4()}"
+    [ref] = attachments.store(db, [value])
+    db.rollback()
+    path = attachments._blob_path(ref[len(attachments.REF_PREFIX):])
+    assert os.path.exists(path)
+
+    assert attachments.collect_garbage(db) >= 1
+    assert not os.path.exists(path)
+    assert _ref_count(db, ref) is None
+
+
+def test_garbage_collection_keeps_referenced_blobs(client, db):
+    value = f"attachment-{uuid.uuid4()}"
+    [ref] = attachments.store(db, [value])
+    db.commit()
+
+    attachments.collect_garbage(db)
+    assert _ref_count(db, ref) == 1
+    assert attachments.resolve([ref]) == [value]
+
+
+def test_client_cannot_attach_another_users_blob_by_digest(client, db):
+    _, owner = register(client)
+    _, other = register(client)
+    secret = f"data:text/plain;base64,{base64.b64encode(uuid.uuid4().bytes).decode()}"
+    client.post("/todos/", json={"title": "owner", "attachments": [secret]}, headers=owner)
+    digest, _ = attachments._encode(secret)
+    ref = attachments.REF_PREFIX + digest
+
+    # 猜到摘要的用户提交引用，只会保存这段文本本身，读不到别人的文件，也不改动其计数
+    response = client.post("/todos/", json={"title": "other", "attachments": [ref]}, headers=other)
+    assert response.json()["attachments"] == [ref]
+    todo = client.get(f"/todos/{response.json()['id']}", headers=other).json()
+    assert todo["attachments"] == [ref]
+    assert _ref_count(db, ref) == 1
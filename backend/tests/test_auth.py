@@ -0,0 +1,36 @@
+import time
+
+from sqlalchemy import delete
+
+from app import auth, models
+
+from .conftest import register
+
+
+def test_old_token_rejected_after_user_is_recreated(client, db):
+    username, old_headers = register(client)
+    old_id = client.get("/auth/me", headers=old_headers).json()["id"]
+
+    # 直接删库（其他进程删除用户时本进程收不到提交事件），随后同名用户重新注册；
+    # SQLite 会复用最大的 rowid，新用户的 id 可能与旧令牌里的 uid 相同
+    db.execute(delete(models.User).where(models.User.id == old_id))
+    db.commit()
+    _, new_headers = register(client, username)
+    assert client.get("/auth/me", headers=new_headers).status_code == 200
+
+    response = client.get("/auth/me", headers=old_headers)
+    assert response.status_code == 401
+
+
+def test_user_deleted_by_another_worker_is_rejected_after_cache_ttl(client, db, monkeypatch):
+    _, headers = register(client)
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    # 另一个进程删除用户：本进程的缓存不会被清除，过期后重新查库才发现
+    db.execute(delete(models.User).where(models.User.id == user_id))
+    db.commit()
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + auth.USER_CACHE_TTL_SECONDS + 1)
+    assert client.get("/auth/me", headers=headers).status_code == 401
@@ -0,0 +1,23 @@
+from app import models, schemas, stats
+
+
+def _write_from_another_worker(db, user_id, title):
+    # 与 create_todo 相同的写入，但不经过本进程的缓存簿记，相当于另一个 worker 处理的请求
+    change_seq = stats.record_create(db, user_id, schemas.TaskStatus.TODO, schemas.ItemType.TASK)
+    db.add(models.Todo(title=title, user_id=user_id, change_seq=change_seq))
+    db.commit()
+
+
+def test_cached_list_and_count_see_writes_from_other_workers(client, db, user):
+    user_id = client.get("/auth/me", headers=user).json()["id"]
+    client.post("/todos/", json={"title": "first"}, headers=user)
+    for count in ("exact", "estimated"):
+        assert client.get("/todos/", params={"count": count}, headers=user).json()["total"] == 1
+
+    _write_from_another_worker(db, user_id, "second")
+
+    for count in ("exact", "estimated"):
+        page = client.get("/todos/", params={"count": count}, headers=user).json()
+        assert page["total"] == 2
+        assert {todo["title"] for todo in page["todos"]} == {"first", "second"}
+    assert client.get("/todos/stats", headers=user).json()["total"] == 2
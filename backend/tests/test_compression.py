@@ -0,0 +1,51 @@
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import compression
+
+from .conftest import register
+
+
+def test_compressed_cache_does_not_mix_bodies_with_the_same_etag():
+    # 两个响应的 ETag 和长度都相同，内容不同：不能复用对方的压缩结果
+    def private(request):
+        body = (request.path_params["owner"] * 2000).encode()
+        return Response(body, media_type="application/json", headers={"ETag": '"todo-1-1"'})
+
+    app = compression.CompressionMiddleware(Starlette(routes=[Route("/{owner}", private)]))
+    with TestClient(app) as client:
+        for owner in ("a", "b", "a"):
+            response = client.get(f"/{owner}", headers={"Accept-Encoding": "gzip"})
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.content == (owner * 2000).encode()
+
+
+def test_users_never_receive_each_others_compressed_todo(client):
+    # 两个用户的 todo 在删除后重建时可能拿到相同的 id 和版本号
+    bodies = {}
+    for secret in ("alice-private", "bob-private"):
+        _, headers = register(client)
+        todo = client.post("/todos/", json={"title": secret, "content": secret * 200}, headers=headers).json()
+        response = client.get(f"/todos/{todo['id']}", headers={**headers, "Accept-Encoding": "gzip"})
+        assert response.headers.get("content-encoding") == "gzip"
+        bodies[secret] = response.json()
+        client.delete(f"/todos/{todo['id']}", headers=headers)
+    assert bodies["alice-private"]["title"] == "alice-private"
+    assert bodies["bob-private"]["title"] == "bob-private"
+
+
+def test_compressed_responses_carry_an_encoding_specific_etag(client, user):
+    todo = client.post("/todos/", json={"title": "large", "content": "x" * 4000}, headers=user).json()
+    identity = client.get(f"/todos/{todo['id']}", headers={**user, "Accept-Encoding": "identity"})
+    compressed = client.get(f"/todos/{todo['id']}", headers={**user, "Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+
+    # 带编码后缀的 ETag 同样可以用于条件请求
+    etag = compressed.headers["etag"]
+    response = client.get(f"/todos/{todo['id']}", headers={**user, "If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.put(f"/todos/{todo['id']}", json={"title": "renamed"}, headers={**user, "If-Match": etag})
+    assert response.status_code == 200
@@ -0,0 +1,21 @@
+def test_conditional_get_returns_not_modified_for_unchanged_todo(client, user):
+    todo_id = client.post("/todos/", json={"title": "unchanged"}, headers=user).json()["id"]
+    etag = client.get(f"/todos/{todo_id}", headers=user).headers["etag"]
+
+    response = client.get(f"/todos/{todo_id}", headers={**user, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_recreated_todo_does_not_match_old_etag(client, user):
+    todo_id = client.post("/todos/", json={"title": "first"}, headers=user).json()["id"]
+    etag = client.get(f"/todos/{todo_id}", headers=user).headers["etag"]
+    assert client.delete(f"/todos/{todo_id}", headers=user).status_code == 200
+
+    # SQLite 复用最大的 rowid，新建的 todo 拿到同一个 id，version 也同样是 1
+    recreated = client.post("/todos/", json={"title": "second"}, headers=user).json()
+    assert recreated["id"] == todo_id
+
+    response = client.get(f"/todos/{todo_id}", headers={**user, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "second"
+    assert response.headers["etag"] != etag
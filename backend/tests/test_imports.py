@@ -0,0 +1,42 @@
+import asyncio
+
+from app import imports, schemas
+
+
+def _records(text, chunk_size=7):
+    async def body():
+        data = text.encode()
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def collect():
+        return [record async for record in imports._records(body(), schemas.ImportFormat.CSV)]
+
+    return asyncio.run(collect())
+
+
+def test_csv_records_span_quoted_newlines_with_start_lines():
+    records = _records('title,description\r\nfirst,"two\nlines"\n\nsecond,"say ""hi"""\nthird,plain\n')
+    assert records == [
+        (1, ["title", "description"]),
+        (2, ["first", "two\nlines"]),
+        (5, ["second", 'say "hi"']),
+        (6, ["third", "plain"]),
+    ]
+
+
+def test_csv_import_reports_rows_after_multiline_records(client, user):
+    body = 'title,description\n"multi","a\nb\nc"\n,missing title\nlast,ok\n'
+    response = client.post("/todos/import", content=body, headers={**user, "Content-Type": "text/csv"})
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["line"] == 5
+
+
+def test_long_multiline_csv_field_is_parsed_in_one_pass():
+    # 一个字段跨越大量行：逐行重新拼接整条记录会是平方复杂度
+    lines = 10000
+    field = "\n".join(f"line {index}" for index in range(lines))
+    [header, (start, values)] = _records(f'title,content\nbig,"{field}"\n', chunk_size=65536)
+    assert header == (1, ["title", "content"])
+    assert start == 2 and values == ["big", field]
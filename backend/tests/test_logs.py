@@ -0,0 +1,35 @@
+import logging
+import queue
+import sys
+
+from app import logs
+
+
+def _prepared(*args, exc_info=None):
+    handler = logs._DroppingQueueHandler(queue.Queue())
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "user %s did %s", args, exc_info)
+    return record, handler.prepare(record)
+
+
+def test_scalar_args_are_enqueued_unformatted():
+    record, prepared = _prepared("alice", 3)
+    assert prepared is record
+    assert (prepared.msg, prepared.args) == ("user %s did %s", ("alice", 3))
+
+
+def test_mutable_args_are_snapshotted_before_enqueue():
+    items = ["a"]
+    _, prepared = _prepared("bob", items)
+    items.append("b")
+    assert prepared.args is None
+    assert prepared.getMessage() == "user bob did ['a']"
+
+
+def test_exception_is_formatted_by_the_listener_handler():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        _, prepared = _prepared("carol", 1, exc_info=sys.exc_info())
+    assert prepared.exc_info is not None and prepared.exc_text is None
+    line = logs.StructuredFormatter("text").format(prepared)
+    assert "user carol did 1" in line and "RuntimeError: boom" in line
@@ -0,0 +1,38 @@
+import fcntl
+
+import pytest
+from sqlalchemy import create_engine
+
+from app import migrations, search
+
+
+def _fts5_missing(engine):
+    raise RuntimeError("no such module: fts5")
+
+
+def test_failed_search_index_is_not_recorded_and_retried(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    monkeypatch.setattr(search, "_ensure_sqlite_index", _fts5_missing)
+    applied = migrations.migrate(engine)
+    assert 4 not in applied
+    assert migrations.pending_versions(engine) == [4]
+
+    # 之后的版本已记录，失败的迁移仍会在下次执行
+    monkeypatch.undo()
+    assert migrations.migrate(engine) == [4]
+    assert migrations.pending_versions(engine) == []
+    engine.dispose()
+
+
+def test_sqlite_migrations_hold_a_file_lock(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    path = migrations._sqlite_lock_path(engine)
+    with migrations._migration_lock(engine):
+        # 另一个进程此时拿不到锁，会等到迁移结束
+        with open(path, "a") as other:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    with open(path, "a") as other:
+        fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fcntl.flock(other, fcntl.LOCK_UN)
+    engine.dispose()
@@ -0,0 +1,15 @@
+from app import models, pagination, schemas
+
+
+def test_estimate_count_falls_back_when_binds_cannot_be_rendered(db):
+    # JSON 参数无法渲染为字面量：估算失败应返回 None，而不是抛出异常
+    query = db.query(models.Todo).filter(models.Todo.attachments == ["sha256:abc"])
+    assert pagination._estimate_count(db, query) is None
+
+
+def test_estimated_count_on_unrenderable_query_returns_exact_count(client, db, monkeypatch):
+    # SQLite 不走估算；按 PostgreSQL 的路径执行，估算失败后应回退到精确计数
+    monkeypatch.setattr(pagination, "_is_sqlite", lambda session: False)
+    query = db.query(models.Todo).filter(models.Todo.user_id == -1, models.Todo.attachments == ["sha256:abc"])
+    total = pagination.count_items(db, query, -1, ("attachments",), schemas.CountStrategy.ESTIMATED)
+    assert total == 0
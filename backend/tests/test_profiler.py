@@ -0,0 +1,81 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, event, select, text
+
+from app import profiler
+
+_items = Table("items", MetaData(), Column("id", Integer, primary_key=True), Column("value", Integer))
+
+
+@pytest.fixture
+def profiled_client(tmp_path, monkeypatch):
+    # SQL_PROFILE 在导入时读取；这里打开开关，给独立的引擎和应用装上分析器
+    monkeypatch.setattr(profiler, "SQL_PROFILE", True)
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    profiler.instrument_engine(engine)
+    _items.create(engine)
+
+    app = FastAPI()
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_items(item_id: int):
+        # 逐个查询：同一形状的语句执行多次
+        with engine.connect() as connection:
+            for offset in range(profiler.SQL_REPEAT_THRESHOLD + 1):
+                connection.execute(select(_items.c.value).where(_items.c.id == item_id + offset)).all()
+        return {}
+
+    @app.post("/items")
+    def create_items():
+        with engine.begin() as connection:
+            connection.execute(_items.insert(), [{"value": value} for value in range(50)])
+        return {}
+
+    @app.get("/ping")
+    def ping():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return {}
+
+    try:
+        yield TestClient(app)
+    finally:
+        event.remove(engine, "before_cursor_execute", profiler._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", profiler._after_cursor_execute)
+        engine.dispose()
+
+
+def _n_plus_one_warnings(caplog):
+    return [record for record in caplog.records if record.getMessage().startswith("Possible N+1")]
+
+
+def test_server_timing_header_reports_queries(profiled_client):
+    response = profiled_client.get("/ping")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=") and 'desc="1 queries"' in timing
+    assert "app;dur=" in timing
+    assert profiler.stats()["recent"][0]["queries"] == 1
+
+
+def test_repeated_statement_shape_warns_about_n_plus_one(profiled_client, caplog):
+    with caplog.at_level(logging.WARNING, logger=profiler.__name__):
+        response = profiled_client.get("/items/1")
+    repeat = profiler.SQL_REPEAT_THRESHOLD + 1
+    assert f'db-repeat;desc="{repeat}x same statement"' in response.headers["Server-Timing"]
+    [warning] = _n_plus_one_warnings(caplog)
+    assert warning.repeat == repeat
+    assert warning.route == "/items/{item_id}"
+
+
+def test_batched_insert_is_not_an_n_plus_one(profiled_client, caplog):
+    with caplog.at_level(logging.WARNING, logger=profiler.__name__):
+        response = profiled_client.post("/items")
+    assert "db-repeat" not in response.headers["Server-Timing"]
+    assert not _n_plus_one_warnings(caplog)
+    inserts = [item for item in profiler.stats()["recent"][0]["statements"] if item["statement"].startswith("INSERT")]
+    assert inserts and all(item["batched"] for item in inserts)
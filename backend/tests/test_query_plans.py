@@ -0,0 +1,164 @@
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, event, inspect, text
+
+from app import database, migrations, models, projections, schemas
+from app.database import SessionLocal, engine
+from app.routers.todos import list_page
+
+from .conftest import register
+
+# 默认只检查 SQLite 的执行计划。PostgreSQL 的索引使用只在设置 TEST_POSTGRES_URL
+# （可以写入测试数据的库）时检查，未设置时跳过，不在覆盖范围内
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+requires_postgres = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+
+
+@contextmanager
+def captured_selects(statement_engine=None):
+    # 记录请求中执行的 todos 查询，之后逐条 EXPLAIN QUERY PLAN
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM todos" in statement:
+            statements.append((statement, parameters))
+
+    # 异步模式下请求走异步引擎，语句事件在它的 sync_engine 上触发
+    request_engine = statement_engine
+    if request_engine is None:
+        request_engine = database.async_engine.sync_engine if database.DATABASE_ASYNC else engine
+    event.listen(request_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(request_engine, "before_cursor_execute", capture)
+
+
+def query_plans(client, headers, url):
+    with captured_selects() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    assert statements, f"no todos query for {url}"
+    with engine.connect() as connection:
+        return [
+            " ; ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            for statement, parameters in statements
+        ]
+
+
+@pytest.fixture
+def seeded_user(client):
+    _, headers = register(client)
+    for index in range(30):
+        response = client.post("/todos/", json={
+            "title": f"todo {index}",
+            "status": ("TODO", "DOING", "DONE")[index % 3],
+            "priority": ("LOW", "HIGH")[index % 2],
+            "type": ("TASK", "NOTE")[index % 2],
+            "due_date": "2020-01-01T00:00:00" if index % 2 else None,
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+    return headers
+
+
+@pytest.mark.parametrize("url, index", [
+    ("/todos/?limit=5", "ix_todos_user_created_due"),
+    ("/todos/?limit=5&count=none&status=TODO", "ix_todos_user_status_created"),
+    ("/todos/?limit=5&count=none&priority=HIGH", "ix_todos_user_priority_created"),
+    ("/todos/?limit=5&count=none&type=NOTE", "ix_todos_user_type_created"),
+    ("/todos/?limit=5&overdue_only=true", "ix_todos_user_created_due"),
+    ("/todos/stats", "ix_todos_user_created_due"),
+])
+def test_list_and_stats_queries_use_index_without_sort(client, seeded_user, url, index):
+    plans = query_plans(client, seeded_user, url)
+    # 页面查询用预期的索引；总数查询用任一以 user_id 开头的索引都可以
+    assert any(f"INDEX {index} " in plan for plan in plans), plans
+    for plan in plans:
+        assert "TEMP B-TREE" not in plan, plan
+        assert "SCAN todos" not in plan, plan
+
+
+def test_cursor_page_uses_index_without_sort(client, seeded_user):
+    first = client.get("/todos/?limit=5&count=none", headers=seeded_user).json()
+    plans = query_plans(client, seeded_user, f"/todos/?limit=5&count=none&cursor={first['next_cursor']}")
+    for plan in plans:
+        assert "ix_todos_user_created_due" in plan and "TEMP B-TREE" not in plan, plan
+
+
+def test_migration_replaces_old_list_indexes(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    migrations.migrate(old)
+    # 模拟迁移 8 之前的库：只有旧的两个索引
+    with old.begin() as connection:
+        connection.execute(text("DROP INDEX ix_todos_user_created_due"))
+        connection.execute(text("CREATE INDEX ix_todos_user_created ON todos (user_id, created_at, id)"))
+        connection.execute(text("CREATE INDEX ix_todos_user_due_date ON todos (user_id, due_date)"))
+        connection.execute(models.SchemaVersion.__table__.delete().where(models.SchemaVersion.version == 8))
+
+    assert migrations.migrate(old) == [8]
+    names = {index["name"] for index in inspect(old).get_indexes("todos")}
+    assert "ix_todos_user_created_due" in names
+    assert not names & {"ix_todos_user_created", "ix_todos_user_due_date"}
+
+
+@pytest.fixture(scope="module")
+def postgres_user():
+    pg = create_engine(POSTGRES_URL)
+    migrations.migrate(pg)
+    now = datetime.utcnow()
+    with SessionLocal(bind=pg) as session:
+        user = models.User(username=f"plans-{uuid.uuid4().hex[:12]}", email="plans@example.com", hashed_password="-")
+        session.add(user)
+        session.flush()
+        user_id = user.id
+        session.add_all(models.Todo(
+            title=f"todo {index}",
+            status=list(schemas.TaskStatus)[index % 3],
+            priority=list(schemas.Priority)[index % 3],
+            type=list(schemas.ItemType)[index % 3],
+            due_date=now - timedelta(days=1) if index % 2 else None,
+            created_at=now - timedelta(minutes=index),
+            user_id=user_id,
+        ) for index in range(2000))
+        session.commit()
+    with pg.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("ANALYZE todos")
+    try:
+        yield pg, user_id
+    finally:
+        with pg.begin() as connection:
+            connection.execute(delete(models.TodoCounter).where(models.TodoCounter.user_id == user_id))
+            connection.execute(delete(models.Todo).where(models.Todo.user_id == user_id))
+            connection.execute(delete(models.User).where(models.User.id == user_id))
+        pg.dispose()
+
+
+@requires_postgres
+@pytest.mark.parametrize("filters, index", [
+    (schemas.TodoFilter(), "ix_todos_user_created_due"),
+    (schemas.TodoFilter(status=schemas.TaskStatus.TODO), "ix_todos_user_status_created"),
+    (schemas.TodoFilter(priority=schemas.Priority.HIGH), "ix_todos_user_priority_created"),
+    (schemas.TodoFilter(type=schemas.ItemType.NOTE), "ix_todos_user_type_created"),
+    (schemas.TodoFilter(overdue_only=True), "ix_todos_user_created_due"),
+])
+def test_postgres_list_queries_use_index(postgres_user, filters, index):
+    pg, user_id = postgres_user
+    with captured_selects(pg) as statements:
+        with SessionLocal(bind=pg) as session:
+            list_page(
+                session, user_id, projections.parse_fields(None), 0, 5, None, schemas.CountStrategy.NONE, filters
+            )
+    assert statements
+    # 测试数据量小，关掉顺序扫描，只验证查询能用上索引
+    with pg.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        plans = [
+            json.dumps(connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar())
+            for statement, parameters in statements
+        ]
+    assert any(f'"Index Name": "{index}"' in plan for plan in plans), plans
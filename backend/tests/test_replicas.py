@@ -0,0 +1,47 @@
+import time
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app import replicas, schemas
+
+
+def test_write_cookie_keeps_reads_on_primary_in_another_worker(monkeypatch):
+    # 写请求由另一个进程处理：本进程没有写入记录，只能靠响应带回的 cookie 判断
+    writer = FastAPI()
+    writer.add_middleware(replicas.StickyWriteMiddleware)
+
+    @writer.post("/todos/")
+    def create():
+        return {}
+
+    response = TestClient(writer).post("/todos/", headers={"Authorization": "Bearer token"})
+    cookie = response.cookies.get(replicas.STICKY_COOKIE)
+    assert cookie is not None
+
+    router = replicas.ReadRouter([replicas.Replica("replica1", engine=None)])
+    token_data = schemas.TokenData(username="writer", user_id=-1)
+    assert router.pick(token_data, cookie) is None
+    assert router.primary_reads["sticky"] == 1
+    assert router.pick(token_data) is not None
+
+    # 超过粘滞时间后回到副本
+    monkeypatch.setattr(time, "time", lambda: float(cookie) + replicas.REPLICA_STICKY_SECONDS + 1)
+    assert router.pick(token_data, cookie) is not None
+
+
+def test_failed_or_anonymous_writes_set_no_cookie():
+    app = FastAPI()
+    app.add_middleware(replicas.StickyWriteMiddleware)
+
+    @app.post("/todos/")
+    def create():
+        return {}
+
+    @app.post("/fail")
+    def fail():
+        raise HTTPException(status_code=400)
+
+    client = TestClient(app)
+    assert replicas.STICKY_COOKIE not in client.post("/todos/").cookies
+    assert replicas.STICKY_COOKIE not in client.post("/fail", headers={"Authorization": "Bearer t"}).cookies
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, delete, update
+
+from app import database, models, stats
+from app.database import SessionLocal
+
+from .conftest import register
+
+
+def test_stats_on_read_only_replica_do_not_write_counters(client, db):
+    _, headers = register(client)
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    client.post("/todos/", json={"title": "counted", "status": "DONE"}, headers=headers)
+    db.execute(delete(models.TodoCounter).where(models.TodoCounter.user_id == user_id))
+    db.commit()
+
+    # 以只读方式打开同一个数据库文件，模拟副本；写入会报 attempt to write a readonly database
+    path = database.engine.url.database
+    replica = create_engine(f"sqlite:///file:{path}?mode=ro&uri=true")
+    try:
+        with SessionLocal(bind=replica) as session:
+            session.info["replica"] = "replica1"
+            result = stats.get_stats(session, user_id)
+    finally:
+        replica.dispose()
+
+    assert result.total == 1
+    assert result.done_count == 1
+    assert db.get(models.TodoCounter, user_id) is None
+
+
+def _run_reconcile(*args):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-m", "app.stats", "reconcile", *args],
+        cwd=backend_dir, env=os.environ.copy(), capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def _counters(db, user_id):
+    db.expire_all()
+    row = db.get(models.TodoCounter, user_id)
+    return None if row is None else {column: getattr(row, column) for column in stats.COUNTER_COLUMNS}
+
+
+def _expected(db, user_id):
+    counts = stats.aggregate(db, user_id)
+    return {column: counts[column] for column in stats.COUNTER_COLUMNS}
+
+
+def test_reconcile_cli_rebuilds_drifted_counters(client, db):
+    _, headers = register(client)
+    _, missing_headers = register(client)
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    missing_id = client.get("/auth/me", headers=missing_headers).json()["id"]
+    for status, item_type in (("TODO", "TASK"), ("DONE", "NOTE"), ("DOING", "DIARY")):
+        client.post("/todos/", json={"title": "counted", "status": status, "type": item_type}, headers=headers)
+    client.post("/todos/", json={"title": "counted"}, headers=missing_headers)
+
+    # 一个用户的计数被改错，另一个用户的计数行丢失
+    db.execute(
+        update(models.TodoCounter).where(models.TodoCounter.user_id == user_id).values(total=99, done_count=0)
+    )
+    db.execute(delete(models.TodoCounter).where(models.TodoCounter.user_id == missing_id))
+    db.commit()
+    corrupted = _counters(db, user_id)
+
+    _run_reconcile("--dry-run")
+    assert _counters(db, user_id) == corrupted
+    assert _counters(db, missing_id) is None
+
+    _run_reconcile()
+    assert _counters(db, user_id) == _expected(db, user_id)
+    assert _counters(db, missing_id) == _expected(db, missing_id)
+    assert _expected(db, user_id)["total"] == 3
@@ -114,6 +114,9 @@ const EntryList: React.FC<EntryListProps> = ({
   };
 
   const getPreview = (todo: Todo) => {
+    if (todo.preview) {
+      return todo.preview.length >= 100 ? todo.preview + '...' : todo.preview;
+    }
     if (todo.content) {
       return todo.content.length > 100 ? todo.content.substring(0, 100) + '...' : todo.content;
     }
@@ -4,9 +4,36 @@ interface SearchHighlightProps {
   text: string;
   searchQuery: string;
   className?: string;
+  // 后端返回的高亮区间（UTF-16 下标），提供时不再在前端做正则匹配
+  ranges?: [number, number][];
 }
 
-const SearchHighlight: React.FC<SearchHighlightProps> = ({ text, searchQuery, className = '' }) => {
+const markClassName = "bg-yellow-200 dark:bg-yellow-800/50 text-yellow-900 dark:text-yellow-100 px-0.5 rounded";
+
+const SearchHighlight: React.FC<SearchHighlightProps> = ({ text, searchQuery, className = '', ranges }) => {
+  if (ranges) {
+    const parts: React.ReactNode[] = [];
+    let cursor = 0;
+    ranges.forEach(([start, end], index) => {
+      if (start < cursor || end > text.length) {
+        return;
+      }
+      if (start > cursor) {
+        parts.push(<span key={`text-${index}`}>{text.slice(cursor, start)}</span>);
+      }
+      parts.push(
+        <mark key={`mark-${index}`} className={markClassName}>
+          {text.slice(start, end)}
+        </mark>
+      );
+      cursor = end;
+    });
+    if (cursor < text.length) {
+      parts.push(<span key="text-end">{text.slice(cursor)}</span>);
+    }
+    return <span className={className}>{parts}</span>;
+  }
+
   if (!searchQuery.trim()) {
     return <span className={className}>{text}</span>;
   }
@@ -19,10 +46,7 @@ const SearchHighlight: React.FC<SearchHighlightProps> = ({ text, searchQuery, cl
       {parts.map((part, index) => {
         const isMatch = regex.test(part);
         return isMatch ? (
-          <mark
-            key={index}
-            className="bg-yellow-200 dark:bg-yellow-800/50 text-yellow-900 dark:text-yellow-100 px-0.5 rounded"
-          >
+          <mark key={index} className={markClassName}>
             {part}
           </mark>
         ) : (
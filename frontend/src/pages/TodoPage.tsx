@@ -1,11 +1,12 @@
-﻿import React, { useState, useEffect, useCallback, Suspense } from 'react';
-import { Todo, TodoCreate, TodoUpdate, TaskStatus, Priority, FilterOptions, ItemType } from '../types';
+﻿import React, { useState, useEffect, useCallback, useRef, Suspense } from 'react';
+import { Todo, TodoCreate, TodoUpdate, TaskStatus, Priority, FilterOptions, ItemType, TodoHighlights, TodoListResponse } from '../types';
 import { todoAPI } from '../utils/api';
 import { Plus, Search, Trash2, FileText, BookOpen, CheckSquare, Menu, X, Eye, Edit3 } from 'lucide-react';
 import { useKeyboardShortcuts } from '../hooks/useKeyboardShortcuts';
 import CommandPalette from '../components/CommandPalette';
 import Badge from '../components/Badge';
 import SkeletonLoader from '../components/SkeletonLoader';
+import SearchHighlight from '../components/SearchHighlight';
 import { detectFileType, FileType, getFileTypeDisplayName, getFileTypeIcon } from '../utils/fileUtils';
 import { useNetworkStatus } from '../hooks/useNetworkStatus';
 import { getCachedTodoList, getTodoCacheTimestamp } from '../utils/offlineCache';
@@ -16,6 +17,8 @@ const MarkdownRenderer = React.lazy(() => import('../components/MarkdownRenderer
 
 const TodoPage: React.FC = () => {
   const [todos, setTodos] = useState<Todo[]>([]);
+  // 搜索时后端返回的高亮区间，按 todo id 索引
+  const [highlights, setHighlights] = useState<Record<number, TodoHighlights> | null>(null);
   const [loading, setLoading] = useState(true);
   const [selectedTodo, setSelectedTodo] = useState<Todo | undefined>();
   const [showMobileSidebar, setShowMobileSidebar] = useState(false);
@@ -57,12 +60,23 @@ const TodoPage: React.FC = () => {
     type: undefined,
   });
 
-  const [pagination, setPagination] = useState({
+  const [pagination, setPagination] = useState<{
+    page: number;
+    total: number | null;
+    totalPages: number | null;
+  }>({
     page: 1,
     total: 0,
     totalPages: 1,
   });
 
+  // 响应可能不带总数或页码，页码缺失时沿用请求的页码，总数缺失时显示为未知
+  const toPagination = (response: TodoListResponse, requestedPage: number) => ({
+    page: response.page ?? requestedPage,
+    total: response.total ?? null,
+    totalPages: response.total_pages ?? null,
+  });
+
   // 自动保存定时器
   const [autoSaveTimer, setAutoSaveTimer] = useState<number | null>(null);
 
@@ -86,11 +100,8 @@ const TodoPage: React.FC = () => {
       devLog('Total:', response.total);
 
       setTodos(response.todos);
-      setPagination({
-        page: response.page,
-        total: response.total,
-        totalPages: response.total_pages,
-      });
+      setHighlights(response.highlights ?? null);
+      setPagination(toPagination(response, page));
 
       if (isOnline) {
         setIsCacheFallback(false);
@@ -108,11 +119,8 @@ const TodoPage: React.FC = () => {
         const cached = getCachedTodoList();
         if (cached) {
           setTodos(cached.todos);
-          setPagination({
-            page: cached.page,
-            total: cached.total,
-            totalPages: cached.total_pages,
-          });
+          setHighlights(cached.highlights ?? null);
+          setPagination(toPagination(cached, page));
           setIsCacheFallback(true);
           const cachedTimestamp = getTodoCacheTimestamp();
           setLastSyncedAt(cachedTimestamp);
@@ -382,7 +390,28 @@ const TodoPage: React.FC = () => {
     }
   };
 
-  const handleEditTodo = (todo: Todo) => {
+  // 列表接口只返回摘要字段，选中条目后再加载完整内容
+  const latestSelectionRef = useRef<number | null>(null);
+
+  const handleEditTodo = async (todo: Todo) => {
+    latestSelectionRef.current = todo.id;
+    applySelectedTodo(todo);
+
+    // 移动端选择条目后自动关闭侧边栏
+    setShowMobileSidebar(false);
+
+    // 离线时 getTodo 返回缓存的完整条目，没有缓存才保留列表摘要
+    try {
+      const fullTodo = await todoAPI.getTodo(todo.id);
+      if (latestSelectionRef.current === todo.id) {
+        applySelectedTodo(fullTodo);
+      }
+    } catch (error) {
+      devError('Failed to load todo details:', error);
+    }
+  };
+
+  const applySelectedTodo = (todo: Todo) => {
     setSelectedTodo(todo);
     setFormData({
       title: todo.title,
@@ -406,9 +435,6 @@ const TodoPage: React.FC = () => {
     } else {
       setIsReadMode(false);
     }
-    
-    // 移动端选择条目后自动关闭侧边栏
-    setShowMobileSidebar(false);
   };
 
   const getTypeIcon = (type: ItemType) => {
@@ -636,7 +662,11 @@ const TodoPage: React.FC = () => {
                         <h3 className={`text-sm font-semibold truncate ${
                           todo.type === ItemType.TASK && todo.status === TaskStatus.DONE ? 'line-through text-gray-500' : 'text-gray-900'
                         }`}>
-                          {todo.title}
+                          <SearchHighlight
+                            text={todo.title}
+                            searchQuery={filters.search || ''}
+                            ranges={highlights?.[todo.id]?.title}
+                          />
                         </h3>
                         <span className="text-xs text-gray-500 flex-shrink-0 ml-2">
                           {formatTime(todo.created_at)}
@@ -667,7 +697,15 @@ const TodoPage: React.FC = () => {
                       {/* 第三行：预览 (灰更浅，单行截断) */}
                       <div className="flex items-center justify-between">
                         <p className="text-sm text-gray-500 line-clamp-1 truncate flex-1">
-                          {todo.content || todo.description || '暂无内容'}
+                          {highlights?.[todo.id]?.snippet ? (
+                            <SearchHighlight
+                              text={highlights[todo.id].snippet as string}
+                              searchQuery={filters.search || ''}
+                              ranges={highlights[todo.id].snippet_ranges}
+                            />
+                          ) : (
+                            todo.preview || todo.content || todo.description || '暂无内容'
+                          )}
                         </p>
                         <button
                           onClick={(e) => {
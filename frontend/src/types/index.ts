@@ -20,6 +20,7 @@ export interface Todo {
   type: ItemType;
   content?: string; // 用于笔记和日记的正文内容
   attachments?: string[];
+  preview?: string; // 列表摘要投影返回的正文预览（前 100 个字符）
 }
 
 export interface TodoCreate {
@@ -46,12 +47,62 @@ export interface TodoUpdate {
   attachments?: string[];
 }
 
+export interface TodoHighlights {
+  title: [number, number][];
+  tags: [number, number][];
+  description: [number, number][];
+  content: [number, number][];
+  snippet?: string | null;
+  snippet_ranges: [number, number][];
+}
+
 export interface TodoListResponse {
   todos: Todo[];
-  total: number;
-  page: number;
+  // count=none 时没有总数，游标分页时没有页码
+  total?: number | null;
+  page?: number | null;
   per_page: number;
-  total_pages: number;
+  total_pages?: number | null;
+  next_cursor?: string | null;
+  highlights?: Record<number, TodoHighlights> | null;
+}
+
+export interface TodoChangesResponse {
+  todos: Todo[];
+  deleted: number[];
+  next_cursor: string;
+  has_more: boolean;
+}
+
+export interface TodoImportError {
+  line: number;
+  error: string;
+}
+
+export interface TodoImportResponse {
+  format: 'ndjson' | 'csv';
+  inserted: number;
+  failed: number;
+  errors: TodoImportError[];
+  chunks: number;
+  elapsed_ms: number;
+  rows_per_second?: number | null;
+}
+
+export interface TodoBatchSelection {
+  ids?: number[];
+  filter?: FilterOptions;
+}
+
+export interface TodoBatchResult {
+  id?: number | null;
+  index?: number | null;
+  result: 'created' | 'updated' | 'deleted' | 'not_found';
+}
+
+export interface TodoBatchResponse {
+  results: TodoBatchResult[];
+  affected: number;
 }
 
 export interface TodoStats {
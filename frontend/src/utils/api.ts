@@ -1,6 +1,24 @@
 import axios, { AxiosHeaders } from 'axios';
-import { User, Todo, TodoCreate, TodoUpdate, TodoListResponse, TodoStats, FilterOptions } from '../types';
-import { saveTodoListCache, getCachedTodoList } from './offlineCache';
+import {
+  User,
+  Todo,
+  TodoCreate,
+  TodoUpdate,
+  TodoListResponse,
+  TodoStats,
+  FilterOptions,
+  TodoBatchSelection,
+  TodoBatchResponse,
+  TodoChangesResponse,
+  TodoImportResponse,
+} from '../types';
+import {
+  saveTodoListCache,
+  getCachedTodoList,
+  saveTodoDetailCache,
+  getCachedTodoDetail,
+  removeTodoDetailCache,
+} from './offlineCache';
 import { devLog, devError } from './devLogger';
 
 const API_BASE_URL =
@@ -8,6 +26,8 @@ const API_BASE_URL =
 
 const api = axios.create({
   baseURL: API_BASE_URL,
+  // 带上后端设置的读副本粘滞 cookie，写入后的读请求留在主库
+  withCredentials: true,
 });
 
 api.interceptors.request.use((config) => {
@@ -72,6 +92,9 @@ export const authAPI = {
   }
 };
 
+const affectedIds = (response: TodoBatchResponse): number[] =>
+  response.results.filter((item) => item.id != null).map((item) => item.id as number);
+
 export const todoAPI = {
   getTodos: async (options: FilterOptions & { skip?: number; limit?: number } = {}): Promise<TodoListResponse> => {
     const params = new URLSearchParams();
@@ -111,6 +134,33 @@ export const todoAPI = {
     return response.data;
   },
 
+  getTodoChanges: async (since?: string): Promise<TodoChangesResponse> => {
+    const response = await api.get('/todos/changes', { params: since ? { since } : {} });
+    return response.data;
+  },
+
+  exportTodos: async (
+    format: 'ndjson' | 'csv' | 'json' = 'ndjson',
+    includeAttachments = false
+  ): Promise<Blob> => {
+    const response = await api.get('/todos/export', {
+      params: { format, include_attachments: includeAttachments },
+      responseType: 'blob',
+    });
+    return response.data;
+  },
+
+  importTodos: async (file: Blob, format: 'ndjson' | 'csv'): Promise<TodoImportResponse> => {
+    if (isOffline()) {
+      throw new Error('Cannot import todos while offline.');
+    }
+    const response = await api.post('/todos/import', file, {
+      params: { format },
+      headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+    });
+    return response.data;
+  },
+
   createTodo: async (todo: TodoCreate): Promise<Todo> => {
     if (isOffline()) {
       throw new Error('Cannot create todos while offline.');
@@ -124,6 +174,7 @@ export const todoAPI = {
       throw new Error('Cannot update todos while offline.');
     }
     const response = await api.put(`/todos/${id}`, todo);
+    saveTodoDetailCache(response.data);
     return response.data;
   },
 
@@ -132,11 +183,60 @@ export const todoAPI = {
       throw new Error('Cannot delete todos while offline.');
     }
     await api.delete(`/todos/${id}`);
+    removeTodoDetailCache([id]);
   },
 
-  getTodo: async (id: number): Promise<Todo> => {
-    const response = await api.get(`/todos/${id}`);
+  createTodos: async (items: TodoCreate[]): Promise<TodoBatchResponse> => {
+    if (isOffline()) {
+      throw new Error('Cannot create todos while offline.');
+    }
+    const response = await api.post('/todos/batch', { items });
+    return response.data;
+  },
+
+  updateTodos: async (
+    selection: TodoBatchSelection,
+    changes: Omit<TodoUpdate, 'attachments'>
+  ): Promise<TodoBatchResponse> => {
+    if (isOffline()) {
+      throw new Error('Cannot update todos while offline.');
+    }
+    const response = await api.patch('/todos/batch', { ...selection, changes });
+    removeTodoDetailCache(affectedIds(response.data));
     return response.data;
+  },
+
+  deleteTodos: async (selection: TodoBatchSelection): Promise<TodoBatchResponse> => {
+    if (isOffline()) {
+      throw new Error('Cannot delete todos while offline.');
+    }
+    const response = await api.delete('/todos/batch', { data: selection });
+    removeTodoDetailCache(affectedIds(response.data));
+    return response.data;
+  },
+
+  getTodo: async (id: number): Promise<Todo> => {
+    // 离线时返回最近打开过的完整条目，列表缓存里只有摘要
+    if (isOffline()) {
+      const cached = getCachedTodoDetail(id);
+      if (cached) {
+        return cached;
+      }
+    }
+
+    try {
+      const response = await api.get(`/todos/${id}`);
+      saveTodoDetailCache(response.data);
+      return response.data;
+    } catch (error) {
+      if (isOffline()) {
+        const cached = getCachedTodoDetail(id);
+        if (cached) {
+          return cached;
+        }
+      }
+      throw error;
+    }
   }
 };
 
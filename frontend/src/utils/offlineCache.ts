@@ -1,4 +1,4 @@
-import { TodoListResponse } from '../types'
+import { Todo, TodoListResponse } from '../types'
 import { devWarn } from './devLogger'
 
 const TODO_CACHE_KEY = 'todo-app.todo-cache'
@@ -55,3 +55,79 @@ export const getTodoCacheTimestamp = (): number | null => {
   const cache = readTodoListCache()
   return cache?.timestamp ?? null
 }
+
+const TODO_DETAIL_CACHE_KEY = 'todo-app.todo-detail-cache'
+// 列表缓存只有摘要，详情单独缓存，按最近打开的顺序保留
+const MAX_CACHED_TODO_DETAILS = 50
+// 单条详情序列化后超过该长度时不缓存附件和正文，避免几条大附件占满 localStorage
+const MAX_CACHED_TODO_DETAIL_LENGTH = 64 * 1024
+
+const readTodoDetailCache = (): Todo[] => {
+  if (!isBrowser) {
+    return []
+  }
+
+  const raw = localStorage.getItem(TODO_DETAIL_CACHE_KEY)
+  if (!raw) {
+    return []
+  }
+
+  try {
+    return JSON.parse(raw) as Todo[]
+  } catch (error) {
+    devWarn('Unable to parse todo detail cache:', error)
+    localStorage.removeItem(TODO_DETAIL_CACHE_KEY)
+    return []
+  }
+}
+
+const isQuotaExceeded = (error: unknown) =>
+  error instanceof DOMException &&
+  (error.name === 'QuotaExceededError' || error.name === 'NS_ERROR_DOM_QUOTA_REACHED')
+
+const writeTodoDetailCache = (todos: Todo[]) => {
+  // 空间不足时从最久未打开的一条开始逐条淘汰，而不是整个缓存写入失败
+  const remaining = [...todos]
+  while (remaining.length > 0) {
+    try {
+      localStorage.setItem(TODO_DETAIL_CACHE_KEY, JSON.stringify(remaining))
+      return
+    } catch (error) {
+      if (!isQuotaExceeded(error)) {
+        devWarn('Unable to persist todo detail cache:', error)
+        return
+      }
+      remaining.pop()
+    }
+  }
+  devWarn('Todo detail cache does not fit in localStorage, clearing it')
+  localStorage.removeItem(TODO_DETAIL_CACHE_KEY)
+}
+
+const compactTodoDetail = (todo: Todo): Todo => {
+  if (JSON.stringify(todo).length <= MAX_CACHED_TODO_DETAIL_LENGTH) {
+    return todo
+  }
+  return { ...todo, attachments: undefined, content: undefined }
+}
+
+export const saveTodoDetailCache = (todo: Todo) => {
+  if (!isBrowser) {
+    return
+  }
+
+  const others = readTodoDetailCache().filter((cached) => cached.id !== todo.id)
+  writeTodoDetailCache([compactTodoDetail(todo), ...others].slice(0, MAX_CACHED_TODO_DETAILS))
+}
+
+export const getCachedTodoDetail = (id: number): Todo | null => {
+  return readTodoDetailCache().find((cached) => cached.id === id) ?? null
+}
+
+export const removeTodoDetailCache = (ids: number[]) => {
+  if (!isBrowser) {
+    return
+  }
+
+  writeTodoDetailCache(readTodoDetailCache().filter((cached) => !ids.includes(cached.id)))
+}